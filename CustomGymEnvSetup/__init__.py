@@ -1,9 +1,21 @@
-"""Import all the necessary modules for the sumo_rl package."""
+"""Import all the necessary modules for the sumo_rl package.
 
-from CustomGymEnvSetup.environment.env import (
-    SumoEnvironment,
-    TrafficSignal,
-)
+SumoEnvironment and TrafficSignal are imported on first access, so importing the package (or one of its
+tooling subpackages) does not load gymnasium, NumPy and SUMO's tools.
+"""
 
+__all__ = ["SumoEnvironment", "TrafficSignal"]
 
 __version__ = "1.4.3"
+
+
+def __getattr__(name):
+    if name in __all__:
+        from CustomGymEnvSetup.environment import env
+
+        return getattr(env, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + __all__)
@@ -0,0 +1,11 @@
+"""Analysis of the metrics files written by the environment and the baseline controllers."""
+
+from CustomGymEnvSetup.analysis.results import (
+    align,
+    bootstrap_ci,
+    compare,
+    load_results,
+    load_store,
+    read_result,
+    save_store,
+)
@@ -0,0 +1,4 @@
+from CustomGymEnvSetup.analysis.results import main
+
+
+main()
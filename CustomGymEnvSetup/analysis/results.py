@@ -0,0 +1,189 @@
+"""Loading and comparison of the metrics files written by SumoEnvironment.save_csv and the baseline controllers.
+
+Every metric of these files is stored as a one-element list (``[0.0]``) and each file holds one replicate
+(connection/episode) of a run. ``load_results`` reads whole directories in parallel, strips the brackets
+from the raw bytes before parsing and returns a single typed long table; the helpers below then compare
+runs on a common time grid without per-row Python code.
+
+Example:
+    python -m CustomGymEnvSetup.analysis outputs outputs_actionned outputs_pretimed --baseline default_control_17h-18h.csv
+"""
+
+import argparse
+import glob
+import io
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+
+RESULT_NAME = re.compile(r"^(?P<run>.*)_conn(?P<conn>\d+)_ep(?P<episode>\d+)\.csv$")
+
+METRICS = (
+    "agent_total_vehicles_passed",
+    "agent_total_stopped",
+    "agent_total_fuel_consumption",
+    "agent_co2_emission",
+    "agent_accumulated_waiting_time",
+)
+
+
+def read_result(path: str) -> pd.DataFrame:
+    """Reads one metrics file and returns it with float columns and its run/replicate identifiers."""
+    match = RESULT_NAME.match(os.path.basename(path))
+    if match is None:
+        raise ValueError(f"{path} is not named <run>_conn<N>_ep<N>.csv")
+    with open(path, "rb") as inf:
+        # drop the list brackets of the whole file at once (C speed), the parser then types the columns itself
+        data = inf.read().translate(None, b"[]")
+    df = pd.read_csv(io.BytesIO(data), dtype=np.float64)
+    df.insert(0, "source", os.path.basename(os.path.dirname(os.path.abspath(path))))
+    df.insert(1, "run", match["run"])
+    df.insert(2, "conn", int(match["conn"]))
+    df.insert(3, "episode", int(match["episode"]))
+    return df
+
+
+def load_results(paths: Sequence[str], jobs: Optional[int] = None) -> pd.DataFrame:
+    """Loads metrics files and directories of metrics files into one long table.
+
+    Args:
+        paths (Sequence[str]): Files or directories (all *_conn*_ep*.csv inside are read).
+        jobs (int): Number of reader threads (the CSV parser releases the GIL). Defaults to one per CPU.
+
+    Returns:
+        pd.DataFrame: columns source, run (categorical), conn, episode, step and the metrics as float64.
+    """
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            files += sorted(f for f in glob.glob(os.path.join(path, "*.csv")) if RESULT_NAME.match(os.path.basename(f)))
+        else:
+            files.append(path)
+    if not files:
+        raise ValueError(f"No result files found in {list(paths)}")
+
+    with ThreadPoolExecutor(max_workers=jobs) as executor:
+        frames = list(executor.map(read_result, files))
+    df = pd.concat(frames, ignore_index=True)
+    df["source"] = df["source"].astype("category")
+    df["run"] = df["run"].astype("category")
+    return df
+
+
+def save_store(df: pd.DataFrame, path: str):
+    """Writes the normalized table to a columnar (Parquet) store."""
+    df.to_parquet(path, index=False)
+
+
+def load_store(path: str) -> pd.DataFrame:
+    return pd.read_parquet(path)
+
+
+def align(df: pd.DataFrame, metric: str, grid: Optional[np.ndarray] = None, step: float = 5.0):
+    """Interpolates a metric of every replicate onto a common time grid.
+
+    Runs are logged at different rates (1 s for the baselines, delta_time for the agents), so they are only
+    comparable once resampled. Replicates are identified by (source, run, conn, episode).
+
+    Returns:
+        Tuple[pd.DataFrame, np.ndarray, np.ndarray]: replicate keys, time grid, values of shape (replicates, len(grid)).
+    """
+    df = df.sort_values(["source", "run", "conn", "episode", "step"], kind="stable")
+    keys = ["source", "run", "conn", "episode"]
+    codes = df.groupby(keys, observed=True, sort=False).ngroup().to_numpy()
+    steps = df["step"].to_numpy(dtype=np.float64)
+    values = df[metric].to_numpy(dtype=np.float64)
+
+    bounds = np.flatnonzero(np.diff(codes)) + 1
+    starts = np.concatenate([[0], bounds])
+    ends = np.concatenate([bounds, [len(codes)]])
+    if grid is None:
+        grid = np.arange(0.0, steps[ends - 1].min() + step / 2, step)
+
+    aligned = np.empty((len(starts), len(grid)))
+    for row, (lo, hi) in enumerate(zip(starts, ends)):
+        aligned[row] = np.interp(grid, steps[lo:hi], values[lo:hi])
+    replicates = df.iloc[starts][keys].reset_index(drop=True)
+    return replicates, grid, aligned
+
+
+def bootstrap_ci(samples: np.ndarray, n_boot: int = 2000, alpha: float = 0.05, seed: Optional[int] = 0):
+    """Percentile bootstrap confidence interval of the mean along the first axis.
+
+    All resamples are drawn in one call: samples of shape (n, ...) give (2, ...) bounds.
+    """
+    samples = np.asarray(samples, dtype=np.float64)
+    if len(samples) < 2:
+        return np.stack([samples[0], samples[0]]) if len(samples) else np.full((2,) + samples.shape[1:], np.nan)
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, len(samples), size=(n_boot, len(samples)))
+    means = samples[indices].mean(axis=1)
+    return np.percentile(means, [100 * alpha / 2, 100 * (1 - alpha / 2)], axis=0)
+
+
+def compare(
+    df: pd.DataFrame,
+    metric: str = "agent_accumulated_waiting_time",
+    baseline: Optional[str] = None,
+    step: float = 5.0,
+    percentiles: Sequence[float] = (50, 90, 99),
+    n_boot: int = 2000,
+) -> pd.DataFrame:
+    """Ranks runs on a metric.
+
+    For each run: final value (mean over replicates) with its bootstrap confidence interval, percentiles of
+    the per-interval increments over time and, if a baseline run is given, the mean time-aligned delta
+    against the baseline (negative = lower than the baseline).
+    """
+    replicates, grid, aligned = align(df, metric, step=step)
+    labels = (replicates["source"].astype(str) + "/" + replicates["run"].astype(str)).to_numpy()
+    increments = np.diff(aligned, axis=1, prepend=aligned[:, :1])
+
+    baseline_curve = None
+    if baseline is not None:
+        selected = (replicates["run"].astype(str) == baseline).to_numpy() | (labels == baseline)
+        if not selected.any():
+            raise ValueError(f"Unknown baseline run '{baseline}'")
+        baseline_curve = aligned[selected].mean(axis=0)
+
+    rows = []
+    for label in dict.fromkeys(labels):
+        selected = labels == label
+        finals = aligned[selected, -1]
+        low, high = bootstrap_ci(finals, n_boot=n_boot)
+        row = {"run": label, "replicates": int(selected.sum()), f"final_{metric}": finals.mean(), "ci_low": low, "ci_high": high}
+        for q, value in zip(percentiles, np.percentile(increments[selected], percentiles)):
+            row[f"p{q:g}_increment"] = value
+        if baseline_curve is not None:
+            row["mean_delta_vs_baseline"] = (aligned[selected] - baseline_curve).mean()
+        rows.append(row)
+    report = pd.DataFrame(rows).sort_values(f"final_{metric}", kind="stable").reset_index(drop=True)
+    report.attrs["horizon"] = float(grid[-1])
+    return report
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compare controllers from their metrics files")
+    parser.add_argument("paths", nargs="+", help="result files or directories (outputs, outputs_pretimed, ...)")
+    parser.add_argument("--metric", default="agent_accumulated_waiting_time", choices=METRICS)
+    parser.add_argument("--baseline", help="run (or source/run) the others are compared to")
+    parser.add_argument("--step", type=float, default=5.0, help="time grid resolution (s)")
+    parser.add_argument("--store", help="also write the normalized table to this Parquet file")
+    options = parser.parse_args(args=args)
+
+    df = load_results(options.paths)
+    if options.store:
+        save_store(df, options.store)
+    report = compare(df, options.metric, options.baseline, options.step)
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(f"{len(df)} rows, horizon {report.attrs['horizon']:.0f} s")
+        print(report.to_string(index=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,4 @@
+"""Caches of preprocessed SUMO inputs shared across episodes and workers."""
+
+from CustomGymEnvSetup.cache.routes import RouteCache, read_sumocfg
+from CustomGymEnvSetup.cache.network import CompiledNetwork, compile_network, load_network
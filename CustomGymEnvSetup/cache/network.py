@@ -0,0 +1,275 @@
+"""Compiled (NumPy) representation of SUMO networks.
+
+Reading ``osm.net.xml`` with sumolib builds hundreds of thousands of Python objects and takes seconds.
+``compile_network`` parses a net once and stores edges, lanes, junctions, connections, traffic light
+links and the phases of their first program as plain ``.npy`` arrays in a directory named after the digest
+of the net file; ``load_network`` memory-maps them, so later loads only cost a few file opens.
+
+SUMO itself no longer reads binary networks (the .sbx format was dropped), so the simulator side keeps
+loading the XML; this cache only serves the Python side: control.detectors, and the traffic light metadata
+SumoEnvironment reads at construction (see environment.net_metadata).
+
+Example:
+    python -m CustomGymEnvSetup.cache.network network/osm.net.xml network/osm-new.net.xml
+"""
+
+import argparse
+import gzip
+import os
+import shutil
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .routes import file_digest
+
+
+# Bump when the arrays below change, so stale entries are not reused.
+CACHE_VERSION = "3"
+
+ARRAYS = (
+    "junction_ids",
+    "junction_x",
+    "junction_y",
+    "junction_types",
+    "edge_ids",
+    "edge_from",
+    "edge_to",
+    "edge_priority",
+    "edge_internal",
+    "edge_first_lane",
+    "edge_num_lanes",
+    "lane_ids",
+    "lane_edge",
+    "lane_index",
+    "lane_speed",
+    "lane_length",
+    "lane_allow",
+    "lane_disallow",
+    "lane_end_x",
+    "lane_end_y",
+    "conn_from_lane",
+    "conn_to_lane",
+    "conn_via_lane",
+    "conn_tl",
+    "conn_link_index",
+    "conn_dir",
+    "conn_state",
+    "tl_ids",
+    "tl_program_ids",
+    "tl_phase_tl",
+    "tl_phase_duration",
+    "tl_phase_state",
+)
+
+
+def _open(net_file: str):
+    return gzip.open(net_file, "rb") if net_file.endswith(".gz") else open(net_file, "rb")
+
+
+def parse_network(net_file: str) -> Dict[str, np.ndarray]:
+    """Parses a .net.xml into the arrays listed in ARRAYS (single streaming pass)."""
+    junctions: Dict[str, int] = {}
+    junction_x: List[float] = []
+    junction_y: List[float] = []
+    junction_types: List[str] = []
+    edges: Dict[str, int] = {}
+    edge_from: List[str] = []
+    edge_to: List[str] = []
+    edge_priority: List[int] = []
+    edge_internal: List[bool] = []
+    edge_first_lane: List[int] = []
+    edge_num_lanes: List[int] = []
+    lanes: Dict[str, int] = {}
+    lane_edge: List[int] = []
+    lane_index: List[int] = []
+    lane_speed: List[float] = []
+    lane_length: List[float] = []
+    lane_allow: List[str] = []
+    lane_disallow: List[str] = []
+    lane_end: List[Tuple[float, float]] = []
+    connections: List[tuple] = []
+    tls: Dict[str, int] = {}
+    tl_programs: Dict[int, str] = {}
+    tl_phases: List[Tuple[int, float, str]] = []
+
+    with _open(net_file) as inf:
+        for _, element in ET.iterparse(inf, events=("end",)):
+            tag = element.tag
+            if tag == "lane":
+                lanes[element.get("id")] = len(lanes)
+                lane_edge.append(len(edges))  # lanes end before their parent edge
+                lane_index.append(int(element.get("index", 0)))
+                lane_speed.append(float(element.get("speed", 0)))
+                lane_length.append(float(element.get("length", 0)))
+                lane_allow.append(element.get("allow", ""))
+                lane_disallow.append(element.get("disallow", ""))
+                x, y = element.get("shape", "0,0").split()[-1].split(",")[:2]
+                lane_end.append((float(x), float(y)))
+            elif tag == "edge":
+                num_lanes = len(element.findall("lane"))
+                edges[element.get("id")] = len(edges)
+                edge_from.append(element.get("from", ""))
+                edge_to.append(element.get("to", ""))
+                edge_priority.append(int(element.get("priority", -1)))
+                edge_internal.append(element.get("function") == "internal")
+                edge_first_lane.append(len(lanes) - num_lanes)
+                edge_num_lanes.append(num_lanes)
+                element.clear()
+            elif tag == "junction":
+                junctions[element.get("id")] = len(junctions)
+                junction_x.append(float(element.get("x", 0)))
+                junction_y.append(float(element.get("y", 0)))
+                junction_types.append(element.get("type", ""))
+                element.clear()
+            elif tag == "tlLogic":
+                tl = tls.setdefault(element.get("id"), len(tls))
+                if tl not in tl_programs:  # the first program is the one SUMO starts with
+                    tl_programs[tl] = element.get("programID", "0")
+                    for phase in element.iter("phase"):
+                        tl_phases.append((tl, float(phase.get("duration")), phase.get("state")))
+                element.clear()
+            elif tag == "connection":
+                get = element.get
+                connections.append(
+                    (
+                        f"{get('from')}_{get('fromLane')}",
+                        f"{get('to')}_{get('toLane')}",
+                        get("via"),
+                        get("tl"),
+                        int(get("linkIndex", -1)),
+                        get("dir", "s"),
+                        get("state", "M"),
+                    )
+                )
+                element.clear()
+
+    for tl in sorted({c[3] for c in connections if c[3] is not None} - tls.keys()):
+        tls[tl] = len(tls)
+
+    def junction(name):
+        return junctions.get(name, -1)
+
+    return {
+        "junction_ids": np.array(list(junctions), dtype=str),
+        "junction_x": np.array(junction_x, dtype=np.float64),
+        "junction_y": np.array(junction_y, dtype=np.float64),
+        "junction_types": np.array(junction_types, dtype=str),
+        "edge_ids": np.array(list(edges), dtype=str),
+        "edge_from": np.array([junction(j) for j in edge_from], dtype=np.int32),
+        "edge_to": np.array([junction(j) for j in edge_to], dtype=np.int32),
+        "edge_priority": np.array(edge_priority, dtype=np.int32),
+        "edge_internal": np.array(edge_internal, dtype=bool),
+        "edge_first_lane": np.array(edge_first_lane, dtype=np.int32),
+        "edge_num_lanes": np.array(edge_num_lanes, dtype=np.int32),
+        "lane_ids": np.array(list(lanes), dtype=str),
+        "lane_edge": np.array(lane_edge, dtype=np.int32),
+        "lane_index": np.array(lane_index, dtype=np.int32),
+        "lane_speed": np.array(lane_speed, dtype=np.float64),
+        "lane_length": np.array(lane_length, dtype=np.float64),
+        "lane_allow": np.array(lane_allow, dtype=str),
+        "lane_disallow": np.array(lane_disallow, dtype=str),
+        "lane_end_x": np.array([end[0] for end in lane_end], dtype=np.float64),
+        "lane_end_y": np.array([end[1] for end in lane_end], dtype=np.float64),
+        "conn_from_lane": np.array([lanes.get(c[0], -1) for c in connections], dtype=np.int32),
+        "conn_to_lane": np.array([lanes.get(c[1], -1) for c in connections], dtype=np.int32),
+        "conn_via_lane": np.array([lanes.get(c[2], -1) for c in connections], dtype=np.int32),
+        "conn_tl": np.array([tls.get(c[3], -1) for c in connections], dtype=np.int32),
+        "conn_link_index": np.array([c[4] for c in connections], dtype=np.int32),
+        "conn_dir": np.array([c[5] for c in connections], dtype="S1"),
+        "conn_state": np.array([c[6] for c in connections], dtype="S1"),
+        "tl_ids": np.array(list(tls), dtype=str),
+        "tl_program_ids": np.array([tl_programs.get(tl, "") for tl in range(len(tls))], dtype=str),
+        "tl_phase_tl": np.array([p[0] for p in tl_phases], dtype=np.int32),
+        "tl_phase_duration": np.array([p[1] for p in tl_phases], dtype=np.float64),
+        "tl_phase_state": np.array([p[2] for p in tl_phases], dtype=str),
+    }
+
+
+class CompiledNetwork:
+    """Memory-mapped arrays of a compiled network (see ARRAYS for the available attributes).
+
+    Connections are stored as parallel ``conn_*`` arrays indexing into the lane table, -1 meaning "none".
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        for name in ARRAYS:
+            setattr(self, name, np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r"))
+        self._edge_lookup: Optional[Dict[str, int]] = None
+        self._lane_lookup: Optional[Dict[str, int]] = None
+
+    def edge_index(self, edge_id: str) -> int:
+        if self._edge_lookup is None:
+            self._edge_lookup = {e: i for i, e in enumerate(self.edge_ids.tolist())}
+        return self._edge_lookup[edge_id]
+
+    def lane_index_of(self, lane_id: str) -> int:
+        if self._lane_lookup is None:
+            self._lane_lookup = {lane: i for i, lane in enumerate(self.lane_ids.tolist())}
+        return self._lane_lookup[lane_id]
+
+    def lane_allows(self, lane: int, vclass: str) -> bool:
+        """Whether vehicles of class vclass may use a lane (by index), like sumolib's Lane.allows."""
+        allow, disallow = str(self.lane_allow[lane]), str(self.lane_disallow[lane])
+        if allow:
+            return allow == "all" or vclass in allow.split()
+        return disallow != "all" and vclass not in disallow.split()
+
+    def tls_connections(self, tl_id: str) -> np.ndarray:
+        """Indices of the connections of a traffic light, in the order of the net file (like sumolib's TLS.getConnections)."""
+        tl = int(np.flatnonzero(self.tl_ids == tl_id)[0])
+        return np.flatnonzero(np.asarray(self.conn_tl) == tl)
+
+    def tls_links(self, tl_id: str):
+        """Returns (link_index, from_lane, to_lane, via_lane) arrays of a traffic light, sorted by link index."""
+        tl = int(np.flatnonzero(self.tl_ids == tl_id)[0])
+        mask = np.asarray(self.conn_tl) == tl
+        order = np.argsort(self.conn_link_index[mask], kind="stable")
+        return tuple(np.asarray(a)[mask][order] for a in (self.conn_link_index, self.conn_from_lane, self.conn_to_lane, self.conn_via_lane))
+
+    def controlled_lanes(self, tl_id: str) -> List[str]:
+        """Incoming lanes of a traffic light in link order without duplicates (like TrafficSignal.lanes)."""
+        _, from_lane, _, _ = self.tls_links(tl_id)
+        return list(dict.fromkeys(self.lane_ids[from_lane].tolist()))
+
+
+def compile_network(net_file: str, cache_dir: str = ".sumo_cache/networks") -> str:
+    """Compiles net_file if needed and returns the directory holding its arrays."""
+    path = os.path.join(cache_dir, file_digest([net_file], [CACHE_VERSION]))
+    if os.path.isdir(path):
+        return path
+
+    arrays = parse_network(net_file)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    os.makedirs(tmp_path, exist_ok=True)
+    try:
+        for name, array in arrays.items():
+            np.save(os.path.join(tmp_path, f"{name}.npy"), array)
+        try:
+            os.replace(tmp_path, path)
+        except OSError:
+            if not os.path.isdir(path):  # otherwise another process was faster
+                raise
+    finally:
+        shutil.rmtree(tmp_path, ignore_errors=True)
+    return path
+
+
+def load_network(net_file: str, cache_dir: str = ".sumo_cache/networks") -> CompiledNetwork:
+    """Returns the compiled version of net_file, compiling it on first use."""
+    return CompiledNetwork(compile_network(net_file, cache_dir))
+
+
+def main(args=None):
+    parser = argparse.ArgumentParser(description="Compile SUMO networks into memory-mappable arrays")
+    parser.add_argument("net_files", nargs="+", help="networks to compile")
+    parser.add_argument("--cache-dir", default=".sumo_cache/networks", help="directory receiving the compiled networks")
+    options = parser.parse_args(args=args)
+    for net_file in options.net_files:
+        print(net_file, "->", compile_network(net_file, options.cache_dir))
+
+
+if __name__ == "__main__":
+    main()
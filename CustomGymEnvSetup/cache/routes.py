@@ -0,0 +1,129 @@
+"""Content-addressed cache of routed trip files.
+
+Trip files (``<trip from=.. to=..>``) only hold origin and destination, so SUMO has to route every vehicle
+each time a simulation is loaded, i.e. at every ``reset`` of every worker. ``RouteCache`` runs ``duarouter``
+once per (network, trip files) content and stores the result under its digest; SUMO is then started with
+``--route-files <cached .rou.xml>`` which overrides the route files of the .sumocfg.
+"""
+
+import hashlib
+import os
+import re
+import subprocess
+import sys
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Sequence
+
+
+if "SUMO_HOME" in os.environ:
+    tools = os.path.join(os.environ["SUMO_HOME"], "tools")
+    if tools not in sys.path:
+        sys.path.append(tools)
+
+# Bump when the way routes are compiled changes, so stale entries are not reused.
+CACHE_VERSION = "1"
+
+DEFAULT_ROUTER_ARGS = ("--ignore-errors", "--no-step-log", "--no-warnings")
+
+
+def read_sumocfg(sumocfg: str) -> Dict[str, List[str]]:
+    """Returns the input files of a SUMO configuration as absolute paths.
+
+    Returns:
+        Dict[str, List[str]]: {'net-file': [...], 'route-files': [...], 'additional-files': [...]}
+    """
+    base = os.path.dirname(os.path.abspath(sumocfg))
+    inputs = {"net-file": [], "route-files": [], "additional-files": []}
+    root = ET.parse(sumocfg).getroot()
+    for option in inputs:
+        for element in root.iter(option):
+            value = element.get("value", "")
+            inputs[option] += [os.path.join(base, f) for f in re.split(r"[,\s]+", value) if f]
+    return inputs
+
+
+def file_digest(paths: Sequence[str], extra: Sequence[str] = ()) -> str:
+    """Returns the sha256 of the content of the given files (in order) and of the extra strings."""
+    digest = hashlib.sha256()
+    for value in extra:
+        digest.update(value.encode())
+        digest.update(b"\0")
+    for path in paths:
+        with open(path, "rb") as inf:
+            for chunk in iter(lambda: inf.read(1 << 20), b""):
+                digest.update(chunk)
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class RouteCache:
+    """Compiles trip files into route files once and reuses them across episodes, workers and runs.
+
+    Args:
+        cache_dir (str): Directory holding the compiled route files, named after the digest of their inputs.
+        router_args (Sequence[str]): Extra duarouter arguments (part of the cache key).
+        verbose (bool): Print when routes are compiled.
+    """
+
+    def __init__(self, cache_dir: str = ".sumo_cache/routes", router_args: Sequence[str] = DEFAULT_ROUTER_ARGS, verbose: bool = False):
+        import sumolib
+
+        self.cache_dir = cache_dir
+        self.router_args = list(router_args)
+        self.verbose = verbose
+        self._duarouter = sumolib.checkBinary("duarouter")
+
+    def key(self, net_file: str, route_files: Sequence[str], additional_files: Sequence[str] = ()) -> str:
+        """Returns the cache key of a (network, trip files) pair."""
+        extra = [CACHE_VERSION, str(len(route_files)), str(len(additional_files))] + self.router_args
+        return file_digest([net_file, *route_files, *additional_files], extra)
+
+    def path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.rou.xml")
+
+    def compile(self, net_file: str, route_files: Sequence[str], additional_files: Sequence[str] = ()) -> str:
+        """Returns the path of the routed file, running duarouter only if it is not cached yet."""
+        path = self.path(self.key(net_file, route_files, additional_files))
+        if os.path.exists(path):
+            return path
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        # Several workers may compile the same entry concurrently: write to a private file, then rename atomically
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        cmd = [
+            self._duarouter,
+            "-n",
+            net_file,
+            "-r",
+            ",".join(route_files),
+            "-o",
+            tmp_path,
+            "--alternatives-output",
+            os.devnull,
+        ]
+        if additional_files:
+            cmd += ["-a", ",".join(additional_files)]
+        cmd += self.router_args
+        if self.verbose:
+            print("Compiling routes:", " ".join(cmd))
+        try:
+            subprocess.run(cmd, check=True, stdout=subprocess.DEVNULL)
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return path
+
+    def compile_sumocfg(self, sumocfg: str) -> Optional[str]:
+        """Compiles the route files of a .sumocfg, returns None if it has no route files."""
+        inputs = read_sumocfg(sumocfg)
+        if not inputs["net-file"] or not inputs["route-files"]:
+            return None
+        return self.compile(inputs["net-file"][0], inputs["route-files"], inputs["additional-files"])
+
+    def sumo_args(self, sumocfg: str) -> List[str]:
+        """Returns the SUMO arguments replacing the route files of sumocfg by their cached compiled version."""
+        path = self.compile_sumocfg(sumocfg)
+        if path is None:
+            return []
+        return ["--route-files", os.path.abspath(path)]
@@ -0,0 +1,8 @@
+"""Helpers for the baseline (non-learning) traffic light controllers.
+
+Only the pacing helpers are imported here; the actuated controller (CustomGymEnvSetup.control.actuated) and
+the detector generation (CustomGymEnvSetup.control.detectors) need SUMO's tools and are imported from their
+modules.
+"""
+
+from CustomGymEnvSetup.control.pacing import RealTimePacer, add_run_options, make_pacer, sumo_command
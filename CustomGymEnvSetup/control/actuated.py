@@ -0,0 +1,246 @@
+"""Gap-based actuated traffic light control driven by lanearea (E2) detector subscriptions.
+
+Each green phase starts with ``min_green`` seconds on its countdown. Every step the countdown loses the
+elapsed time and gains ``passage_time`` seconds per vehicle that entered one of the phase's detectors;
+the phase ends when the countdown runs out or after ``max_green`` seconds, followed by ``yellow_time``
+seconds of the yellow phase that comes next in the program.
+
+Arrivals are counted without remembering vehicle ids: the interval vehicle number of an E2 detector only
+grows with vehicles entering it, so the arrivals of a step are the difference between two readings. The
+counter restarts at every detector period from the vehicles already on the detector, which are not
+arrivals and are subtracted. Vehicles that left are the arrivals minus the change of the vehicles on the
+detector. The per-step cost therefore depends on the number of detectors only.
+
+``ActuatedEngine`` controls any number of traffic lights at once: their phases, gap-out countdowns and
+max-out timers are arrays updated with a few NumPy operations per step, all detectors are read from a
+single subscription result, and TraCI commands are only sent to the traffic lights that switch.
+"""
+
+import os
+import sys
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+
+if "SUMO_HOME" in os.environ:
+    tools = os.path.join(os.environ["SUMO_HOME"], "tools")
+    if tools not in sys.path:
+        sys.path.append(tools)
+import traci
+import traci.constants as tc
+
+
+DETECTOR_VARIABLES = (tc.VAR_INTERVAL_NUMBER, tc.LAST_STEP_VEHICLE_NUMBER)
+
+
+class DetectorCounts:
+    """Entered/left vehicle counts of a set of lanearea detectors, updated from subscription results.
+
+    Args:
+        detector_ids (Sequence[str]): Lanearea detectors to follow.
+        sumo: TraCI connection (the traci module by default).
+    """
+
+    def __init__(self, detector_ids: Sequence[str], sumo=traci):
+        self.ids = list(detector_ids)
+        self.sumo = sumo
+        self._interval = np.zeros(len(self.ids), dtype=np.int64)
+        self._occupancy = np.zeros(len(self.ids), dtype=np.int64)
+        self.entered = np.zeros(len(self.ids), dtype=np.int64)
+        self.left = np.zeros(len(self.ids), dtype=np.int64)
+
+    def subscribe(self):
+        for det in self.ids:
+            self.sumo.lanearea.subscribe(det, DETECTOR_VARIABLES)
+
+    def update(self, results: Optional[Dict[str, dict]] = None):
+        """Computes the vehicles that entered and left each detector during the last step.
+
+        Args:
+            results (Dict[str, dict]): Output of lanearea.getAllSubscriptionResults(), fetched if not given.
+        """
+        if results is None:
+            results = self.sumo.lanearea.getAllSubscriptionResults()
+        interval = np.fromiter((results[det][tc.VAR_INTERVAL_NUMBER] for det in self.ids), np.int64, len(self.ids))
+        occupancy = np.fromiter((results[det][tc.LAST_STEP_VEHICLE_NUMBER] for det in self.ids), np.int64, len(self.ids))
+        # the interval counter restarts at each detector period, counting again the vehicles already on the
+        # detector: only those beyond them entered during the step
+        self.entered = np.where(interval < self._interval, np.maximum(interval - self._occupancy, 0), interval - self._interval)
+        self.left = np.maximum(self.entered - (occupancy - self._occupancy), 0)
+        self._interval = interval
+        self._occupancy = occupancy
+
+
+def phase_detectors(tls_id: str, detector_ids: Sequence[str], sumo=traci) -> Dict[int, list]:
+    """Maps each green phase of a traffic light to the detectors placed on the lanes it gives green to.
+
+    Yellow phases and phases without any green are left out.
+    """
+    lane_of = {det: sumo.lanearea.getLaneID(det) for det in detector_ids}
+    links = sumo.trafficlight.getControlledLinks(tls_id)
+    phases = sumo.trafficlight.getAllProgramLogics(tls_id)[0].phases
+    detectors = {}
+    for index, phase in enumerate(phases):
+        if "y" in phase.state or not any(s in "Gg" for s in phase.state):
+            continue
+        lanes = {link[0][0] for i, link in enumerate(links) if link and phase.state[i] in "Gg"}
+        detectors[index] = [det for det in detector_ids if lane_of[det] in lanes]
+    return detectors
+
+
+def _per_tls(value, n: int) -> np.ndarray:
+    return np.broadcast_to(np.asarray(value, dtype=np.float64), (n,)).copy()
+
+
+class ActuatedEngine:
+    """Actuated control of a set of traffic lights, updated with array operations.
+
+    Args:
+        tls_phase_detectors (Dict[str, Dict[int, Sequence[str]]]): For each traffic light, the lanearea
+            detectors extending each of its green phases (by phase index).
+        min_green (float or array): Initial countdown of a green phase (s), per traffic light or shared.
+        max_green (float or array): Maximum duration of a green phase (s).
+        passage_time (float or array): Time added to the countdown per arriving vehicle (s).
+        yellow_time (float or array): Duration of the yellow phases (s).
+        sumo: TraCI connection (the traci module by default).
+    """
+
+    def __init__(
+        self,
+        tls_phase_detectors: Dict[str, Dict[int, Sequence[str]]],
+        min_green: Union[float, Sequence[float]] = 5,
+        max_green: Union[float, Sequence[float]] = 42,
+        passage_time: Union[float, Sequence[float]] = 5,
+        yellow_time: Union[float, Sequence[float]] = 3,
+        sumo=traci,
+    ):
+        self.sumo = sumo
+        self.ids = [tls for tls, phases in tls_phase_detectors.items() if phases]
+        n = len(self.ids)
+        self.min_green = _per_tls(min_green, n)
+        self.max_green = _per_tls(max_green, n)
+        self.passage_time = _per_tls(passage_time, n)
+        self.yellow_time = _per_tls(yellow_time, n)
+
+        num_phases = [len(self.sumo.trafficlight.getAllProgramLogics(tls)[0].phases) for tls in self.ids]
+        width = max(num_phases, default=1)
+        # next_phase[i, p]: phase following p (yellow after a green), next_green[i, p]: first green phase from p on
+        self.next_phase = np.zeros((n, width), dtype=np.int64)
+        self.next_green = np.zeros((n, width), dtype=np.int64)
+        self.first_green = np.zeros(n, dtype=np.int64)
+
+        detectors: Dict[str, int] = {}
+        pair_tls, pair_phase, pair_detector = [], [], []
+        for i, tls in enumerate(self.ids):
+            greens = sorted(tls_phase_detectors[tls])
+            self.first_green[i] = greens[0]
+            for p in range(num_phases[i]):
+                self.next_phase[i, p] = (p + 1) % num_phases[i]
+                self.next_green[i, p] = min((g for g in greens if g >= p), default=greens[0])
+            for phase in greens:
+                for det in tls_phase_detectors[tls][phase]:
+                    pair_tls.append(i)
+                    pair_phase.append(phase)
+                    pair_detector.append(detectors.setdefault(det, len(detectors)))
+        self.counts = DetectorCounts(list(detectors), sumo)
+        self._pair_tls = np.array(pair_tls, dtype=np.int64)
+        self._pair_phase = np.array(pair_phase, dtype=np.int64)
+        self._pair_detector = np.array(pair_detector, dtype=np.int64)
+
+        self.phase = self.first_green.copy()
+        self.is_yellow = np.zeros(n, dtype=bool)
+        self.phase_start = np.zeros(n)
+        self.countdown = self.min_green.copy()
+
+    @classmethod
+    def from_detectors(cls, tls_ids: Optional[Sequence[str]] = None, detector_ids: Optional[Sequence[str]] = None, sumo=traci, **kwargs):
+        """Builds an engine whose green phases are extended by the detectors placed on the lanes they serve.
+
+        Args:
+            tls_ids (Sequence[str]): Traffic lights to control, all of them by default.
+            detector_ids (Sequence[str]): Candidate lanearea detectors, all detectors of the simulation by default.
+            **kwargs: Timing parameters of ActuatedEngine.
+        """
+        if tls_ids is None:
+            tls_ids = sumo.trafficlight.getIDList()
+        if detector_ids is None:
+            detector_ids = sumo.lanearea.getIDList()
+        return cls({tls: phase_detectors(tls, detector_ids, sumo) for tls in tls_ids}, sumo=sumo, **kwargs)
+
+    def subscribe(self):
+        self.counts.subscribe()
+
+    def start(self, time: float):
+        """Switches every traffic light to its first green phase (call once the detectors are subscribed)."""
+        self.phase[:] = self.first_green
+        self.is_yellow[:] = False
+        self.phase_start[:] = time
+        self.countdown[:] = self.min_green
+        self._apply(np.arange(len(self.ids)))
+
+    def _apply(self, switched: np.ndarray):
+        for i in switched.tolist():
+            tls = self.ids[i]
+            self.sumo.trafficlight.setPhase(tls, int(self.phase[i]))
+            self.sumo.trafficlight.setPhaseDuration(tls, self.yellow_time[i] if self.is_yellow[i] else self.max_green[i])
+
+    def arrivals(self) -> np.ndarray:
+        """Vehicles that entered the detectors of the current green phase of each traffic light in the last step."""
+        active = (self._pair_phase == self.phase[self._pair_tls]) & ~self.is_yellow[self._pair_tls]
+        return np.bincount(
+            self._pair_tls[active],
+            weights=self.counts.entered[self._pair_detector[active]],
+            minlength=len(self.ids),
+        )
+
+    def step(self, time: float, delta: float = 1.0, results: Optional[Dict[str, dict]] = None) -> np.ndarray:
+        """Updates all traffic lights after a simulation step.
+
+        Args:
+            time (float): Current simulation time.
+            delta (float): Length of the step that was just simulated.
+            results (Dict[str, dict]): lanearea subscription results of this step, fetched if not given.
+
+        Returns:
+            np.ndarray: Indices of the traffic lights that switched phase.
+        """
+        self.counts.update(results)
+        elapsed = time - self.phase_start
+        green = ~self.is_yellow
+
+        countdown = np.maximum(self.countdown - delta, 0.0) + self.passage_time * self.arrivals()
+        self.countdown = np.where(green, countdown, self.countdown)
+        gap_or_max_out = green & ((self.countdown <= 0) | (elapsed >= self.max_green))
+        yellow_over = self.is_yellow & (elapsed >= self.yellow_time)
+
+        rows = np.arange(len(self.ids))
+        self.phase = np.where(
+            gap_or_max_out,
+            self.next_phase[rows, self.phase],
+            np.where(yellow_over, self.next_green[rows, self.phase], self.phase),
+        )
+        switched = np.flatnonzero(gap_or_max_out | yellow_over)
+        self.is_yellow[switched] = gap_or_max_out[switched]
+        self.phase_start[switched] = time
+        self.countdown[yellow_over] = self.min_green[yellow_over]
+        self._apply(switched)
+        return switched
+
+
+def run_actuated(engine: ActuatedEngine, max_steps: int, sumo=traci, on_step=None):
+    """Runs a simulation for max_steps steps under actuated control.
+
+    Args:
+        engine (ActuatedEngine): Controlled traffic lights.
+        max_steps (int): Number of simulation steps.
+        on_step (Callable): Called after each step (once the traffic lights were updated).
+    """
+    delta = sumo.simulation.getDeltaT()
+    engine.subscribe()
+    engine.start(sumo.simulation.getTime())
+    for _ in range(max_steps):
+        sumo.simulationStep()
+        engine.step(sumo.simulation.getTime(), delta)
+        if on_step is not None:
+            on_step()
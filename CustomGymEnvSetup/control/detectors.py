@@ -0,0 +1,103 @@
+"""Generation of lanearea (E2) detectors on the approaches of every traffic light of a network.
+
+One detector is placed at the downstream end of each incoming lane controlled by a traffic light, like the
+hand-made ``e2_*`` detectors of ``single-intersection-actionned.add.xml`` (30 m long, ending a few metres
+before the stop line). The generated file is loaded as an additional file next to the network; the
+actuated controllers find the detectors of each phase from their lane (see ActuatedEngine.from_detectors).
+
+The network is read from its compiled version (CustomGymEnvSetup.cache.network), built on the first run, so
+generating detectors again for the same network does not parse the XML with sumolib.
+
+Example:
+    python -m CustomGymEnvSetup.control.detectors network/osm.net.xml -o network/osm.e2.add.xml
+"""
+
+import argparse
+import os
+from typing import List, Optional, Sequence, Tuple
+
+from ..cache.network import load_network
+
+
+def detector_layout(
+    net_file: str,
+    length: float = 30.0,
+    stop_line_gap: float = 0.5,
+    vclass: str = "passenger",
+    tls_ids: Optional[Sequence[str]] = None,
+    cache_dir: str = ".sumo_cache/networks",
+) -> List[Tuple[str, str, str, float, float]]:
+    """Returns (detector id, tls id, lane id, pos, length) of the detectors to place.
+
+    Args:
+        net_file (str): SUMO network.
+        length (float): Detector length (shortened on lanes that are not long enough).
+        stop_line_gap (float): Distance between the end of the detector and the end of the lane.
+        vclass (str): Only lanes allowing this vehicle class get a detector.
+        tls_ids (Sequence[str]): Traffic lights to equip, all of them by default.
+        cache_dir (str): Directory of the compiled networks (see load_network).
+    """
+    net = load_network(net_file, cache_dir)
+    layout = []
+    for tls in net.tl_ids.tolist():
+        if tls_ids is not None and tls not in tls_ids:
+            continue
+        lanes = dict.fromkeys(net.conn_from_lane[net.tls_connections(tls)].tolist())
+        for lane in lanes:
+            if not net.lane_allows(lane, vclass):
+                continue
+            available = max(float(net.lane_length[lane]) - stop_line_gap, 0.1)
+            det_length = min(length, available)
+            layout.append((f"e2_{tls}_{net.lane_ids[lane]}", tls, str(net.lane_ids[lane]), available - det_length, det_length))
+    return layout
+
+
+def write_detectors(path: str, layout: Sequence[Tuple[str, str, str, float, float]], period: float = 300.0, output: str = "NUL"):
+    """Writes the detectors of detector_layout as a SUMO additional file.
+
+    Args:
+        path (str): Additional file to write.
+        period (float): Aggregation period of the detectors (s).
+        output (str): Detector output file, "NUL" disables the output.
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as outf:
+        outf.write('<?xml version="1.0" encoding="UTF-8"?>\n\n')
+        outf.write(
+            '<additional xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+            'xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/additional_file.xsd">\n'
+        )
+        tls = None
+        for det_id, tls_id, lane, pos, length in layout:
+            if tls_id != tls:
+                tls = tls_id
+                outf.write(f"    <!-- {tls} -->\n")
+            outf.write(
+                f'    <laneAreaDetector id="{det_id}" lane="{lane}" pos="{pos:.2f}" length="{length:.2f}" '
+                f'period="{period:.2f}" file="{output}"/>\n'
+            )
+        outf.write("</additional>\n")
+
+
+def get_options(args=None):
+    parser = argparse.ArgumentParser(description="Place E2 detectors on the approaches of every traffic light")
+    parser.add_argument("net_file", help="SUMO network")
+    parser.add_argument("-o", "--output", required=True, help="additional file receiving the detectors")
+    parser.add_argument("--length", type=float, default=30.0, help="detector length (m)")
+    parser.add_argument("--stop-line-gap", type=float, default=0.5, help="distance between detector end and stop line (m)")
+    parser.add_argument("--period", type=float, default=300.0, help="aggregation period (s)")
+    parser.add_argument("--vclass", default="passenger", help="only equip lanes allowing this vehicle class")
+    parser.add_argument("--tls", nargs="+", help="traffic lights to equip (default: all)")
+    parser.add_argument("--detector-output", default="NUL", help="detector output file (default: none)")
+    parser.add_argument("--cache-dir", default=".sumo_cache/networks", help="directory of the compiled networks")
+    return parser.parse_args(args=args)
+
+
+def main(options):
+    layout = detector_layout(options.net_file, options.length, options.stop_line_gap, options.vclass, options.tls, options.cache_dir)
+    write_detectors(options.output, layout, options.period, options.detector_output)
+    print(f"Wrote {len(layout)} detectors for {len({tls for _, tls, _, _, _ in layout})} traffic lights to {options.output}")
+
+
+if __name__ == "__main__":
+    main(get_options())
@@ -0,0 +1,96 @@
+"""Run options shared by the baseline controllers and wall-clock pacing of a simulation.
+
+The baseline controllers run headless and as fast as possible by default. ``RealTimePacer`` is the opt-in
+alternative for demos and hardware-in-the-loop: it keeps simulated time in step with the wall clock (or a
+multiple of it). Each step waits for an absolute deadline computed from the start of the run instead of
+sleeping a fixed amount, so the time spent simulating and the sleep overshoot of the OS do not accumulate.
+"""
+
+import argparse
+import time
+from typing import List, Optional
+
+
+class RealTimePacer:
+    """Paces simulated time to the wall clock.
+
+    Args:
+        speed (float): Simulated seconds per wall-clock second (1 = real time, 2 = twice as fast).
+        max_lag (float): Wall-clock seconds the simulation may fall behind before the schedule is reset
+            (e.g. after a pause in the GUI) instead of running flat out to catch up. None never resets.
+        clock (Callable): Monotonic clock, time.perf_counter by default.
+        sleep (Callable): Sleep function, time.sleep by default.
+    """
+
+    def __init__(self, speed: float = 1.0, max_lag: Optional[float] = 1.0, clock=time.perf_counter, sleep=time.sleep):
+        if speed <= 0:
+            raise ValueError(f"speed must be positive, got {speed}")
+        self.speed = speed
+        self.max_lag = max_lag
+        self._clock = clock
+        self._sleep = sleep
+        self._wall_start = None
+        self._sim_start = 0.0
+        self.lag = 0.0  # how late the last step was, in wall-clock seconds
+        self.resyncs = 0
+
+    def start(self, sim_time: float = 0.0):
+        """Anchors the schedule: sim_time corresponds to now."""
+        self._wall_start = self._clock()
+        self._sim_start = sim_time
+        self.lag = 0.0
+
+    def wait(self, sim_time: float):
+        """Blocks until the wall-clock time at which sim_time is due.
+
+        Args:
+            sim_time (float): Simulation time (s) reached by the step that is about to be shown/applied.
+        """
+        if self._wall_start is None:
+            self.start(sim_time)
+            return
+        deadline = self._wall_start + (sim_time - self._sim_start) / self.speed
+        now = self._clock()
+        if deadline > now:
+            self._sleep(deadline - now)
+            self.lag = 0.0
+            return
+        self.lag = now - deadline
+        if self.max_lag is not None and self.lag > self.max_lag:
+            self.resyncs += 1
+            self.start(sim_time)
+
+
+def add_run_options(parser: argparse.ArgumentParser, sumocfg: str, output: str) -> argparse.ArgumentParser:
+    """Adds the options common to the baseline controllers.
+
+    Args:
+        parser (argparse.ArgumentParser): Parser of the controller script.
+        sumocfg (str): Default SUMO configuration.
+        output (str): Default metrics file prefix.
+    """
+    parser.add_argument("-c", "--sumocfg", default=sumocfg, help="SUMO configuration to run")
+    parser.add_argument("-o", "--output", default=output, help="prefix of the metrics .csv file")
+    parser.add_argument("--max-steps", type=int, default=3600, help="number of simulation steps")
+    parser.add_argument("--gui", action="store_true", default=False, help="run sumo-gui instead of headless sumo")
+    parser.add_argument("--real-time", type=float, nargs="?", const=1.0, default=None, metavar="SPEED",
+                        help="pace the simulation to the wall clock, optionally SPEED times faster")
+    parser.add_argument("--max-lag", type=float, default=1.0,
+                        help="seconds the paced simulation may fall behind before the schedule is reset")
+    parser.add_argument("-v", "--verbose", action="store_true", default=False, help="print per-step details")
+    return parser
+
+
+def sumo_command(options: argparse.Namespace) -> List[str]:
+    """Returns the SUMO command line of a controller run."""
+    import sumolib
+
+    binary = sumolib.checkBinary("sumo-gui" if options.gui else "sumo")
+    return [binary, "-c", options.sumocfg, "--no-step-log"]
+
+
+def make_pacer(options: argparse.Namespace) -> Optional[RealTimePacer]:
+    """Returns the pacer requested by the options, None when running at full speed."""
+    if options.real_time is None:
+        return None
+    return RealTimePacer(options.real_time, options.max_lag)
@@ -0,0 +1,11 @@
+"""Demand (route file) generation from observed traffic counts."""
+
+from CustomGymEnvSetup.demand.generator import (
+    REAL_SCENARIO_COUNTS,
+    DemandTable,
+    generate_scenarios,
+    generate_trips,
+    read_counts,
+    read_trips,
+    write_routes,
+)
@@ -0,0 +1,4 @@
+from CustomGymEnvSetup.demand.generator import get_options, main
+
+
+main(get_options())
@@ -0,0 +1,400 @@
+"""Vectorized demand generation for the single intersection scenarios.
+
+The real scenarios used to be produced by running ``randomTrips.py`` once per approach, rewriting the
+destinations with ``tripsModAutomate.py`` and sorting the merged file with ``sortTrip.py``. This module
+replaces that chain: observed counts are read from a spreadsheet, departures and turning movements are
+drawn in a handful of NumPy calls, and the result is written as a ready-to-load SUMO route file.
+
+Example:
+    python -m CustomGymEnvSetup.demand --scenario 17h-18h -o network_trainning/demand --days 7
+"""
+
+import argparse
+import os
+from typing import Dict, List, Optional, Union
+
+import numpy as np
+
+
+APPROACHES = ("n", "s", "e", "w")
+APPROACH_NAMES = ("north", "south", "east", "west")
+
+# Vehicles per hour counted on each approach of the real intersection,
+# see network_trainning/real-scenario/randomTrips Demand Gen File.md
+REAL_SCENARIO_COUNTS = {
+    "6h-7h": {"w": 496, "s": 67, "e": 232, "n": 94},
+    "17h-18h": {"w": 491, "s": 381, "e": 639, "n": 174},
+}
+
+# Row = approach the vehicle comes from, column = side it leaves to (same order as APPROACHES).
+# U-turns are not allowed, the three remaining exits are equally likely (as in tripsModAutomate.py).
+DEFAULT_TURN_RATIOS = np.array(
+    [
+        [0.0, 1.0, 1.0, 1.0],
+        [1.0, 0.0, 1.0, 1.0],
+        [1.0, 1.0, 0.0, 1.0],
+        [1.0, 1.0, 1.0, 0.0],
+    ]
+) / 3.0
+
+PROCESSES = ("poisson", "binomial", "uniform")
+
+ROUTES_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<routes xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    'xsi:noNamespaceSchemaLocation="http://sumo.dlr.de/xsd/routes_file.xsd">\n'
+)
+
+
+def _approach_index(name) -> int:
+    key = str(name).strip().lower()
+    if key in APPROACHES:
+        return APPROACHES.index(key)
+    if key in APPROACH_NAMES:
+        return APPROACH_NAMES.index(key)
+    raise ValueError(f"Unknown approach '{name}', expected one of {APPROACHES + APPROACH_NAMES}")
+
+
+class DemandTable:
+    """Per-approach vehicle counts over consecutive time intervals.
+
+    Args:
+        begins (Sequence[float]): Start time (s) of each interval.
+        ends (Sequence[float]): End time (s) of each interval.
+        counts (np.ndarray): Number of vehicles, shape (num_intervals, 4) in APPROACHES order.
+        turn_ratios (np.ndarray): Turning probabilities, shape (4, 4). Rows are normalized.
+    """
+
+    def __init__(self, begins, ends, counts, turn_ratios: Optional[np.ndarray] = None):
+        self.begins = np.asarray(begins, dtype=np.float64)
+        self.ends = np.asarray(ends, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.float64).reshape(len(self.begins), len(APPROACHES))
+        if np.any(self.ends <= self.begins):
+            raise ValueError("Every interval must end after it begins.")
+        if np.any(self.counts < 0):
+            raise ValueError("Vehicle counts must be non-negative.")
+
+        turn_ratios = DEFAULT_TURN_RATIOS if turn_ratios is None else np.asarray(turn_ratios, dtype=np.float64)
+        totals = turn_ratios.sum(axis=1, keepdims=True)
+        if np.any(totals <= 0):
+            raise ValueError("Every approach needs at least one allowed exit.")
+        self.turn_ratios = turn_ratios / totals
+
+    @classmethod
+    def from_counts(cls, counts: Dict[str, float], begin: float = 0, end: float = 3600, turn_ratios=None):
+        """Builds a single interval table from a {approach: count} dict (e.g. REAL_SCENARIO_COUNTS['6h-7h'])."""
+        row = np.zeros(len(APPROACHES))
+        for approach, count in counts.items():
+            row[_approach_index(approach)] = count
+        return cls([begin], [end], row[None, :], turn_ratios)
+
+    @property
+    def begin(self) -> float:
+        return float(self.begins.min())
+
+    @property
+    def end(self) -> float:
+        return float(self.ends.max())
+
+    def rates(self, step_length: float = 1.0):
+        """Returns the step start times and the expected number of departures per step and approach.
+
+        Returns:
+            Tuple[np.ndarray, np.ndarray]: times of shape (num_steps,), expected counts of shape (num_steps, 4).
+        """
+        times = np.arange(self.begin, self.end, step_length)
+        interval = np.searchsorted(self.begins, times, side="right") - 1
+        inside = (interval >= 0) & (times < self.ends[np.clip(interval, 0, None)])
+        per_second = self.counts / (self.ends - self.begins)[:, None]
+        expected = np.where(inside[:, None], per_second[np.clip(interval, 0, None)], 0.0) * step_length
+        return times, expected
+
+
+def read_counts(path: str, sheet_name: Union[str, int] = 0, turns_sheet: Optional[Union[str, int]] = None) -> DemandTable:
+    """Reads observed counts from a spreadsheet (xlsx/ods/csv).
+
+    Two layouts are accepted:
+
+    - wide: one row per interval with columns ``begin``, ``end`` and one column per approach
+      (``north``/``south``/``east``/``west`` or ``n``/``s``/``e``/``w``);
+    - long: one row per interval and approach with columns ``begin``, ``end``, ``approach``, ``count``.
+
+    When ``begin``/``end`` are missing, rows are taken as consecutive one-hour intervals.
+    The optional ``turns_sheet`` holds a 4x4 table of turning ratios indexed by approach (rows: from, columns: to).
+    """
+    import pandas as pd
+
+    if str(path).lower().endswith(".csv"):
+        df = pd.read_csv(path)
+    else:
+        df = pd.read_excel(path, sheet_name=sheet_name)
+    df = df.rename(columns=lambda c: str(c).strip().lower()).dropna(how="all")
+
+    if "approach" in df.columns:
+        if "begin" not in df.columns:
+            raise ValueError("The long layout needs 'begin' and 'end' columns.")
+        df = df.assign(approach=[APPROACHES[_approach_index(a)] for a in df["approach"]])
+        df = df.pivot_table(index=["begin", "end"], columns="approach", values="count", aggfunc="sum").reset_index()
+
+    counts = np.zeros((len(df), len(APPROACHES)))
+    found = False
+    for column in df.columns:
+        try:
+            index = _approach_index(column)
+        except ValueError:
+            continue
+        counts[:, index] = df[column].fillna(0).to_numpy(dtype=np.float64)
+        found = True
+    if not found:
+        raise ValueError(f"No approach columns found in {path}, got {list(df.columns)}")
+
+    if "begin" in df.columns:
+        begins = df["begin"].to_numpy(dtype=np.float64)
+        ends = df["end"].to_numpy(dtype=np.float64) if "end" in df.columns else begins + 3600
+    else:
+        begins = np.arange(len(df)) * 3600.0
+        ends = begins + 3600.0
+
+    turn_ratios = None
+    if turns_sheet is not None:
+        turns = pd.read_excel(path, sheet_name=turns_sheet, index_col=0)
+        turn_ratios = np.zeros((len(APPROACHES), len(APPROACHES)))
+        for origin, row in turns.iterrows():
+            for destination, value in row.items():
+                turn_ratios[_approach_index(origin), _approach_index(destination)] = value
+
+    order = np.argsort(begins, kind="stable")
+    return DemandTable(begins[order], ends[order], counts[order], turn_ratios)
+
+
+def read_trips(path: str, interval: float = 300.0, begin: Optional[float] = None, end: Optional[float] = None) -> DemandTable:
+    """Fits a DemandTable to a trip/route file: departures counted per approach and per interval.
+
+    The approach of a vehicle is given by the edge it departs from (``n_t`` -> north, ...) and the turning
+    ratios by the edge it ends on (``t_s`` -> south), for <trip> elements and for <vehicle> elements with
+    an inline <route>.
+
+    Args:
+        path (str): Trip or route file.
+        interval (float): Length (s) of the counting intervals.
+        begin (float): Start of the first interval, the first departure by default.
+        end (float): End of the last interval, the end of the interval of the last departure by default.
+    """
+    import xml.etree.ElementTree as ET
+
+    departs, origins, destinations = [], [], []
+    for _, elem in ET.iterparse(path):
+        if elem.tag == "trip":
+            edges = [elem.get("from"), elem.get("to")]
+        elif elem.tag == "vehicle" and elem.find("route") is not None:
+            edges = elem.find("route").get("edges").split()
+        else:
+            continue
+        departs.append(float(elem.get("depart")))
+        origins.append(_approach_index(edges[0].split("_")[0]))
+        destinations.append(_approach_index(edges[-1].split("_")[-1]))
+        elem.clear()
+    if not departs:
+        raise ValueError(f"No trips found in {path}")
+
+    departs = np.asarray(departs)
+    begin = np.floor(departs.min() / interval) * interval if begin is None else begin
+    end = (np.floor(departs.max() / interval) + 1) * interval if end is None else end
+    begins = np.arange(begin, end, interval)
+    counts = np.zeros((len(begins), len(APPROACHES)))
+    inside = (departs >= begin) & (departs < end)
+    np.add.at(counts, (((departs[inside] - begin) // interval).astype(np.int64), np.asarray(origins)[inside]), 1)
+    turns = np.zeros((len(APPROACHES), len(APPROACHES)))
+    np.add.at(turns, (origins, destinations), 1)
+    turn_ratios = np.where(turns.sum(axis=1, keepdims=True) > 0, turns, DEFAULT_TURN_RATIOS)
+    return DemandTable(begins, np.minimum(begins + interval, end), counts, turn_ratios)
+
+
+def generate_trips(
+    table: DemandTable,
+    seed: Optional[Union[int, np.random.Generator]] = None,
+    process: str = "poisson",
+    step_length: float = 1.0,
+) -> Dict[str, np.ndarray]:
+    """Draws departures and turning movements for the whole table at once.
+
+    Args:
+        table (DemandTable): Counts to reproduce.
+        seed (int or np.random.Generator): Seed of the draw, the same seed always gives the same trips.
+        process (str): 'poisson' (Poisson number of departures per step), 'binomial' (at most one departure
+            per step and approach, Bernoulli per step) or 'uniform' (evenly spaced departures like randomTrips --period).
+        step_length (float): Resolution (s) of the arrival process.
+
+    Returns:
+        Dict[str, np.ndarray]: 'depart' (s), 'origin' and 'destination' (indices into APPROACHES), sorted by depart.
+    """
+    if process not in PROCESSES:
+        raise ValueError(f"Unknown arrival process '{process}', expected one of {PROCESSES}")
+    rng = seed if isinstance(seed, np.random.Generator) else np.random.default_rng(seed)
+
+    times, expected = table.rates(step_length)
+    if process == "poisson":
+        per_step = rng.poisson(expected)
+    elif process == "binomial":
+        per_step = (rng.random(expected.shape) < np.minimum(expected, 1.0)).astype(np.int64)
+    else:
+        cumulative = np.floor(np.cumsum(expected, axis=0) + 1e-9)
+        per_step = np.diff(cumulative, axis=0, prepend=0.0).astype(np.int64)
+
+    steps, origin = np.nonzero(per_step)
+    repeats = per_step[steps, origin]
+    steps = np.repeat(steps, repeats)
+    origin = np.repeat(origin, repeats)
+
+    depart = times[steps]
+    if process != "uniform":
+        depart = depart + rng.random(len(depart)) * step_length
+
+    cumulative_turns = np.cumsum(table.turn_ratios, axis=1)
+    draws = rng.random(len(origin))
+    destination = (draws[:, None] >= cumulative_turns[origin]).sum(axis=1)
+    destination = np.minimum(destination, len(APPROACHES) - 1)
+
+    order = np.argsort(depart, kind="stable")
+    return {"depart": depart[order], "origin": origin[order], "destination": destination[order]}
+
+
+def write_routes(
+    path: str,
+    trips: Dict[str, np.ndarray],
+    prefix: str = "pas_",
+    vclass: str = "passenger",
+    from_edge: str = "{}_t",
+    to_edge: str = "t_{}",
+    as_trips: bool = False,
+    time_offset: float = 0.0,
+    vehicle_attributes: str = 'departLane="best" departSpeed="max" departPos="base"',
+) -> int:
+    """Writes trips produced by generate_trips to a SUMO route file.
+
+    On the single intersection every origin edge is directly connected to every exit edge, so complete
+    routes are written by default and SUMO does not need to route anything at load time.
+    Set ``as_trips`` to write from/to ``<trip>`` elements instead (same format as the randomTrips files).
+
+    Returns:
+        int: Number of vehicles written.
+    """
+    origin = trips["origin"]
+    destination = trips["destination"]
+    depart = trips["depart"] - time_offset
+
+    # Vehicle ids are numbered per approach, as in the files merged by hand (pas_west_0, pas_south_0, ...)
+    sequence = np.zeros(len(origin), dtype=np.int64)
+    for index in range(len(APPROACHES)):
+        mask = origin == index
+        sequence[mask] = np.arange(np.count_nonzero(mask))
+
+    vtype = f"{prefix}{vclass}"
+    names = [f"{prefix}{name}_" for name in APPROACH_NAMES]
+    sources = [from_edge.format(a) for a in APPROACHES]
+    sinks = [to_edge.format(a) for a in APPROACHES]
+
+    if as_trips:
+        lines = [
+            f'    <trip id="{names[o]}{k}" depart="{d:.2f}" from="{sources[o]}" to="{sinks[t]}" '
+            f'{vehicle_attributes} type="{vtype}"/>\n'
+            for o, t, k, d in zip(origin.tolist(), destination.tolist(), sequence.tolist(), depart.tolist())
+        ]
+    else:
+        lines = [
+            f'    <vehicle id="{names[o]}{k}" depart="{d:.2f}" {vehicle_attributes} type="{vtype}">\n'
+            f'        <route edges="{sources[o]} {sinks[t]}"/>\n'
+            "    </vehicle>\n"
+            for o, t, k, d in zip(origin.tolist(), destination.tolist(), sequence.tolist(), depart.tolist())
+        ]
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, "w", encoding="UTF-8") as outf:
+        outf.write(ROUTES_HEADER)
+        outf.write(f'    <vType id="{vtype}" vClass="{vclass}"/>\n')
+        outf.writelines(lines)
+        outf.write("</routes>\n")
+    return len(lines)
+
+
+def generate_scenarios(
+    table: DemandTable,
+    output_dir: str,
+    days: int = 1,
+    seed: int = 0,
+    process: str = "poisson",
+    hourly: bool = True,
+    **write_kwargs,
+) -> List[str]:
+    """Generates one route file per day (or per day and hour) of the table.
+
+    Each day gets its own independent random stream derived from ``seed``, so adding days never changes
+    the scenarios already generated. With ``hourly`` each hour is written to its own file starting at
+    t=0, ready for the 3600s single-intersection configurations.
+
+    Returns:
+        List[str]: Paths of the written route files.
+    """
+    paths = []
+    streams = np.random.SeedSequence(seed).spawn(days)
+    for day, stream in enumerate(streams):
+        trips = generate_trips(table, seed=np.random.default_rng(stream), process=process)
+        if not hourly:
+            path = os.path.join(output_dir, f"demand_day{day}.rou.xml")
+            write_routes(path, trips, **write_kwargs)
+            paths.append(path)
+            continue
+
+        hours = np.arange(np.floor(table.begin / 3600), np.ceil(table.end / 3600)) * 3600
+        bounds = np.searchsorted(trips["depart"], np.append(hours, np.inf))
+        for hour, lo, hi in zip(hours, bounds[:-1], bounds[1:]):
+            chunk = {key: value[lo:hi] for key, value in trips.items()}
+            path = os.path.join(output_dir, f"demand_day{day}_{int(hour // 3600):02d}h.rou.xml")
+            write_routes(path, chunk, time_offset=hour, **write_kwargs)
+            paths.append(path)
+    return paths
+
+
+def get_options(args=None):
+    parser = argparse.ArgumentParser(description="Generate route files from observed approach counts")
+    parser.add_argument("counts", nargs="?", help="spreadsheet (xlsx/ods/csv) holding per-approach counts")
+    parser.add_argument("--scenario", choices=sorted(REAL_SCENARIO_COUNTS),
+                        help="use the built-in real scenario counts instead of a spreadsheet")
+    parser.add_argument("--sheet", default=0, help="sheet holding the counts")
+    parser.add_argument("--turns-sheet", help="sheet holding the turning ratios")
+    parser.add_argument("-o", "--output-dir", default="demand", help="directory receiving the route files")
+    parser.add_argument("--days", type=int, default=1, help="number of independent days to generate")
+    parser.add_argument("--seed", type=int, default=42, help="random seed")
+    parser.add_argument("--process", choices=PROCESSES, default="poisson", help="departure process")
+    parser.add_argument("--daily", action="store_true", default=False, help="one file per day instead of per hour")
+    parser.add_argument("--trips", action="store_true", default=False, help="write <trip> elements instead of routes")
+    parser.add_argument("--prefix", default="pas_", help="prefix of the vehicle ids")
+    options = parser.parse_args(args=args)
+    if (options.counts is None) == (options.scenario is None):
+        parser.error("give either a counts spreadsheet or --scenario")
+    return options
+
+
+def main(options):
+    if options.scenario:
+        table = DemandTable.from_counts(REAL_SCENARIO_COUNTS[options.scenario])
+    else:
+        sheet = int(options.sheet) if str(options.sheet).isdigit() else options.sheet
+        table = read_counts(options.counts, sheet, options.turns_sheet)
+    paths = generate_scenarios(
+        table,
+        options.output_dir,
+        days=options.days,
+        seed=options.seed,
+        process=options.process,
+        hourly=not options.daily,
+        prefix=options.prefix,
+        as_trips=options.trips,
+    )
+    print(f"Wrote {len(paths)} route files to {options.output_dir}")
+
+
+if __name__ == "__main__":
+    main(get_options())
@@ -1,10 +1,15 @@
 """SUMO Environment for Traffic Signal Control."""
 
-from gymnasium.envs.registration import register
+from gymnasium.envs.registration import register, registry
 
 
-register(
-    id="instigo-goma-rl-v0",
-    entry_point="CustomGymEnvSetup.environment.env:SumoEnvironment",
-     kwargs={"fixed_ts": False},
-)
+ENV_ID = "instigo-goma-rl-v0"
+
+# the entry point is a string, so registering does not import the environment module; the check keeps
+# re-imports (e.g. importlib.reload in notebooks) from overriding the registration
+if ENV_ID not in registry:
+    register(
+        id=ENV_ID,
+        entry_point="CustomGymEnvSetup.environment.env:SumoEnvironment",
+        kwargs={"fixed_ts": False},
+    )
@@ -0,0 +1,135 @@
+"""Time-integrated CO2 emission and fuel consumption of the vehicles on a set of lanes.
+
+SUMO reports emissions as instantaneous rates (mg/s). The accumulator integrates them at every simulation
+step into per-lane and per-vehicle-class totals (mg): the vehicles of the lanes come from lane subscriptions,
+the rates from vehicle subscriptions (a vehicle is subscribed while it is on the lanes, its class is read
+once), and each step is added with a single NumPy scatter-add.
+
+When several steps are simulated at once (event-driven stepping), the rates of the step reached are
+applied to the whole interval, so the totals are only approximate: the ends of the jumps are phase changes
+and decisions, where the rates are not representative of the interval (about 4.5% too much CO2 and fuel on
+the 17h-18h scenario). Interpolating between the rates at both ends of the jumps does not do better.
+
+Example:
+    emissions = EmissionAccumulator()
+    emissions.start(traci, ["n_t_0", "n_t_1"])
+    for _ in range(3600):
+        traci.simulationStep()
+        emissions.accumulate()
+    emissions.total()  # (co2 mg, fuel mg)
+"""
+
+import os
+import sys
+from typing import Dict, List, Sequence, Tuple
+
+
+if "SUMO_HOME" in os.environ:
+    tools = os.path.join(os.environ["SUMO_HOME"], "tools")
+    if tools not in sys.path:
+        sys.path.append(tools)
+import numpy as np
+import traci.constants as tc
+
+
+VEHICLE_VARIABLES = [tc.VAR_CO2EMISSION, tc.VAR_FUELCONSUMPTION]
+
+
+class EmissionAccumulator:
+    """Integrated CO2 and fuel (mg) of the vehicles on some lanes, by lane and by vehicle class.
+
+    Attributes:
+        totals (np.ndarray): Shape (lanes, vehicle classes, 2), CO2 then fuel.
+        vehicle_classes (List[str]): Vehicle classes of the second dimension of totals, in order of appearance.
+    """
+
+    def __init__(self):
+        self.lanes: List[str] = []
+        self.vehicle_classes: List[str] = []
+        self.totals = np.zeros((0, 0, 2))
+        self._class_index: Dict[str, int] = {}
+        self._vehicle_class: Dict[str, int] = {}
+        self._subscribed = set()
+        self._sumo = None
+        self._time = 0.0
+        self._step_length = 1.0
+
+    def start(self, sumo, lanes: Sequence[str]):
+        """Subscribes to the vehicles of lanes in a new simulation and resets the totals."""
+        self._sumo = sumo
+        self.lanes = list(lanes)
+        self.vehicle_classes = []
+        self._class_index = {}
+        self._vehicle_class = {}
+        self._subscribed = set()
+        self.totals = np.zeros((len(self.lanes), 0, 2))
+        self._time = sumo.simulation.getTime()
+        self._step_length = sumo.simulation.getDeltaT()
+        for lane in self.lanes:
+            sumo.lane.subscribe(lane, [tc.LAST_STEP_VEHICLE_ID_LIST])
+
+    def _class_of(self, vehicle: str) -> int:
+        index = self._vehicle_class.get(vehicle)
+        if index is None:
+            vehicle_class = self._sumo.vehicle.getVehicleClass(vehicle)
+            index = self._class_index.get(vehicle_class)
+            if index is None:
+                index = self._class_index[vehicle_class] = len(self.vehicle_classes)
+                self.vehicle_classes.append(vehicle_class)
+                self.totals = np.concatenate([self.totals, np.zeros((len(self.lanes), 1, 2))], axis=1)
+            self._vehicle_class[vehicle] = index
+        return index
+
+    def accumulate(self, time: float = 0.0):
+        """Adds the emissions of the steps just simulated.
+
+        Args:
+            time (float): Simulation time reached (the target time of simulationStep), one step after the
+                previous call if not given.
+        """
+        time = time if time > self._time else self._time + self._step_length
+        elapsed, self._time = time - self._time, time
+        lane_results = self._sumo.lane.getAllSubscriptionResults()
+        on_lanes = [lane_results[lane][tc.LAST_STEP_VEHICLE_ID_LIST] for lane in self.lanes]
+        present = set()
+        for vehicles in on_lanes:
+            present.update(vehicles)
+        rates = self._sumo.vehicle.getAllSubscriptionResults()
+        for vehicle in self._subscribed - present:
+            if vehicle in rates:  # left the lanes but not the simulation
+                self._sumo.vehicle.unsubscribe(vehicle)
+        for vehicle in present - self._subscribed:
+            self._sumo.vehicle.subscribe(vehicle, VEHICLE_VARIABLES)
+        self._subscribed = present
+        if not present:
+            return
+
+        rates = self._sumo.vehicle.getAllSubscriptionResults()
+        lane_index = np.repeat(np.arange(len(self.lanes)), [len(vehicles) for vehicles in on_lanes])
+        vehicles = [vehicle for lane_vehicles in on_lanes for vehicle in lane_vehicles]
+        class_index = np.fromiter((self._class_of(vehicle) for vehicle in vehicles), dtype=np.intp, count=len(vehicles))
+        values = np.array([[rates[vehicle][var] for var in VEHICLE_VARIABLES] for vehicle in vehicles], dtype=np.float64)
+        np.add.at(self.totals, (lane_index, class_index), values * elapsed)
+
+    def total(self) -> Tuple[float, float]:
+        """Returns the CO2 (mg) and fuel (mg) of all lanes and vehicle classes."""
+        co2, fuel = self.totals.sum(axis=(0, 1))
+        return float(co2), float(fuel)
+
+    def by_lane(self) -> Dict[str, Tuple[float, float]]:
+        """Returns the CO2 and fuel (mg) of each lane."""
+        return {lane: (float(co2), float(fuel)) for lane, (co2, fuel) in zip(self.lanes, self.totals.sum(axis=1))}
+
+    def by_class(self) -> Dict[str, Tuple[float, float]]:
+        """Returns the CO2 and fuel (mg) of each vehicle class."""
+        return {name: (float(co2), float(fuel)) for name, (co2, fuel) in zip(self.vehicle_classes, self.totals.sum(axis=0))}
+
+    def get_state(self) -> dict:
+        return {"totals": self.totals.copy(), "vehicle_classes": list(self.vehicle_classes)}
+
+    def set_state(self, state: dict):
+        """Restores the totals saved by get_state (after start(), e.g. when resuming an episode)."""
+        self._time = self._sumo.simulation.getTime()
+        self.totals = state["totals"].copy()
+        self.vehicle_classes = list(state["vehicle_classes"])
+        self._class_index = {name: i for i, name in enumerate(self.vehicle_classes)}
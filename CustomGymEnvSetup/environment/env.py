@@ -1,21 +1,32 @@
 import os
+import pickle
 import sys
 from pathlib import Path
-from typing import Callable, Optional, Tuple, Union
+from typing import Callable, Dict, Optional, Sequence, Tuple, Union
 
 
+# SUMO's tools (traci, sumolib) come from SUMO_HOME if it is declared, otherwise from the installed packages
 if "SUMO_HOME" in os.environ:
     tools = os.path.join(os.environ["SUMO_HOME"], "tools")
-    sys.path.append(tools)
-else:
-    raise ImportError("Please declare the environment variable 'SUMO_HOME'")
-    
+    if tools not in sys.path:
+        sys.path.append(tools)
+
 import gymnasium as gym
 import numpy as np
-import pandas as pd
-import sumolib
-import traci
 
+try:
+    import sumolib
+    import traci
+except ImportError as e:
+    raise ImportError("Please declare the environment variable 'SUMO_HOME' or install traci and sumolib (pip install traci sumolib)") from e
+
+from ..cache.routes import RouteCache
+from .emissions import EmissionAccumulator
+from .hooks import HookRegistry
+from .net_metadata import NetworkMetadata
+from .network_metrics import NetworkMetrics
+from .signal_commands import SignalCommandBuffer
+from .signal_table import SignalStateTable
 from .traffic_signal import TrafficSignal
 
 
@@ -31,6 +42,21 @@ class SumoEnvironment(gym.Env):
 
     CONNECTION_LABEL = 0  # For traci multi-client support
 
+    # Attributes saved with the SUMO state by save_checkpoint (the traffic signal is saved whole)
+    CHECKPOINT_ATTRIBUTES = (
+        "episode",
+        "sumo_seed",
+        "metrics",
+        "vehicles",
+        "total_waiting_time",
+        "total_co2_emission",
+        "total_fuel_consumption",
+        "seen_vehicles",
+        "halted_vehicles",
+        "observation",
+        "reward",
+    )
+
     def __init__(
         self,
         sumoconfig_file: str,
@@ -46,14 +72,75 @@ class SumoEnvironment(gym.Env):
         yellow_time: int = 2,
         min_green: int = 5,
         max_green: int = 60,
-        add_system_info: bool = True,
+        add_system_info: bool = False,
         add_agent_info: bool = True,
         sumo_seed: Union[str, int] = "random",
         fixed_ts: bool = False,
         additional_sumo_cmd: Optional[str] = None,
         render_mode: Optional[str] = None,
+        route_cache_dir: Optional[str] = None,
+        network_cache_dir: Optional[str] = ".sumo_cache/networks",
+        event_driven: bool = False,
+        hold_durations: Optional[Sequence[int]] = None,
+        gamma: float = 0.99,
+        history_length: int = 0,
+        queue_ema_alpha: Optional[float] = None,
+        occupancy_grid: Optional[Tuple[float, float]] = None,
+        observation_buffers: Optional[Dict[str, np.ndarray]] = None,
+        hooks: Optional[Sequence] = None,
+        checkpointing: bool = False,
     ) -> None:
-        """Initialize the environment."""
+        """Initialize the environment.
+
+        If route_cache_dir is given, the trip files of the configuration are routed once (duarouter) and the
+        cached routes are loaded instead, so SUMO does not route every vehicle again at each reset.
+
+        The traffic light ids, lanes, lane lengths and phases the environment needs at construction are read
+        from the network compiled in network_cache_dir (see cache.network and NetworkMetadata), without
+        starting SUMO. With network_cache_dir=None, or a configuration without exactly one net file, SUMO is
+        started once to read them through TraCI.
+
+        If event_driven is True, step() advances SUMO straight to the end of the yellow phase and to the next
+        decision time (simulationStep(targetTime)) instead of one second at a time. Nothing is read or set
+        between decisions apart from the yellow to green switch, so the simulation is the same with up to
+        delta_time times fewer round trips. The CO2 and fuel totals of the incoming lanes (self.emissions,
+        total_co2_emission, total_fuel_consumption) are the exception: the rates are only read at the end of
+        each jump, so they become approximate (about 4.5% too high on the 17h-18h scenario).
+
+        If hold_durations is given (e.g. (5, 10, 20, 40)), an action selects both the next green phase and how
+        long to keep it before the next decision: action = phase * len(hold_durations) + duration index. The
+        whole span is simulated in one step() and the reward is the sum of the per-delta_time rewards over the
+        span, the reward of the k-th interval being discounted by gamma**k. info["discount"] holds the factor
+        (gamma ** number of intervals) to apply to the value of the next state.
+
+        history_length > 0 adds the last history_length densities and vehicle counts to the observation
+        ('density_history', 'nb_veh_history', oldest first), and queue_ema_alpha adds the exponentially smoothed
+        number of halting vehicles per approach ('queue_ema'). Both are kept in preallocated arrays updated in
+        place at each decision; the observation holds views of them, valid until the next step.
+
+        occupancy_grid=(cell_length, grid_length), e.g. (10, 150), adds 'occupancy' (vehicles per cell) and
+        'speed' (mean speed / speed limit per cell) grids of shape (incoming lanes, cells), the cells covering
+        the last grid_length metres before the stop line (see TrafficSignal.get_occupancy_grid).
+
+        add_system_info (off by default) adds network-wide metrics to info ('system_total_stopped',
+        'system_mean_speed', ...), read from SUMO's summary output streamed over a local socket and from edge
+        subscriptions, without per-vehicle calls (see NetworkMetrics). Reading them is cheap, but SUMO writing
+        the summary and evaluating the subscription on every edge makes an episode of the 17h-18h scenario
+        1 to 4 ms slower per decision, depending on the machine (benchmarks/bench_network_metrics.py).
+
+        observation_buffers (one array per key of the observation space, with its shape and dtype, e.g. a slice
+        of a vectorized environment buffer or arrays in shared memory) makes the environment write every
+        observation straight into these arrays and return them, instead of new arrays. They can be replaced
+        between steps with set_observation_buffers.
+
+        hooks are objects whose methods named after an event (before_step, after_sumo_step, after_observation,
+        after_reward, on_reset) are called at that event, e.g. the profiling hooks EpisodeTimer, TraciCounter
+        and ProfileWindow. More callbacks can be registered on self.hooks (see HookRegistry).
+
+        checkpointing makes SUMO keep what save_checkpoint and resume_from need (random number generators in
+        the saved states, all vehicles of the route files loaded upfront). It slows down the start of every
+        episode, so it is off unless checkpoints are taken (TrainingRun turns it on).
+        """
         assert render_mode is None or render_mode in self.metadata["render_modes"], "Invalid render mode."
         self.render_mode = render_mode
         self.virtual_display = virtual_display
@@ -71,6 +158,7 @@ class SumoEnvironment(gym.Env):
         self.begin_time = begin_time
         self.sim_max_time = begin_time + num_seconds
         self.delta_time = delta_time  # seconds on sumo at each step
+        self.event_driven = event_driven
         self.max_depart_delay = max_depart_delay  # Max wait time to insert a vehicle
         self.waiting_time_memory = waiting_time_memory  # Number of seconds to remember the waiting time of a vehicle (see https://sumo.dlr.de/pydoc/traci._vehicle.html#VehicleDomain-getAccumulatedWaitingTime)
         self.time_to_teleport = time_to_teleport
@@ -79,19 +167,47 @@ class SumoEnvironment(gym.Env):
         self.yellow_time = yellow_time
         self.sumo_seed = sumo_seed
         self.fixed_ts = fixed_ts
+        self.hold_durations = tuple(hold_durations) if hold_durations else None
+        if self.hold_durations:
+            assert min(self.hold_durations) > yellow_time, "Hold durations must be greater than yellow time."
+        self.gamma = gamma
+        self.history_length = history_length
+        self.queue_ema_alpha = queue_ema_alpha
+        self.occupancy_grid = occupancy_grid
         self.additional_sumo_cmd = additional_sumo_cmd
         self.add_system_info = add_system_info
+        # network-wide info from SUMO's summary output and edge subscriptions (see NetworkMetrics)
+        self.network_metrics = NetworkMetrics() if add_system_info else None
+        # CO2 and fuel of the vehicles on the incoming lanes, integrated at every simulation step
+        self.emissions = EmissionAccumulator()
         self.add_agent_info = add_agent_info
+        # timing state of the controlled traffic signal(s), one row each (see SignalStateTable)
+        self.signal_table = SignalStateTable(1)
+        # light states queued by the traffic signal(s), sent once per simulation step (see SignalCommandBuffer)
+        self.signal_commands = SignalCommandBuffer()
+        # callbacks of the step/reset events, empty lists unless profiling or instrumenting (see HookRegistry)
+        self.hooks = HookRegistry()
+        for hook in hooks or ():
+            self.hooks.add(hook)
         self.label = str(SumoEnvironment.CONNECTION_LABEL)
         SumoEnvironment.CONNECTION_LABEL += 1
         self.sumo = None
 
-        if LIBSUMO:
-            traci.start([sumolib.checkBinary("sumo"), "-c", self._conf])  # Start only to retrieve traffic light information
-            conn = traci
-        else:
-            traci.start([sumolib.checkBinary("sumo"), "-c", self._conf], label="init_connection" + self.label)
-            conn = traci.getConnection("init_connection" + self.label)
+        self._route_args = []
+        if route_cache_dir is not None:
+            self._route_args = RouteCache(route_cache_dir).sumo_args(self._conf)
+
+        conn = None
+        if network_cache_dir is not None:
+            conn = NetworkMetadata.from_sumocfg(self._conf, network_cache_dir, begin_time)
+        if conn is None:
+            init_cmd = [sumolib.checkBinary("sumo"), "-c", self._conf] + self._route_args
+            if LIBSUMO:
+                traci.start(init_cmd)  # Start only to retrieve traffic light information
+                conn = traci
+            else:
+                traci.start(init_cmd, label="init_connection" + self.label)
+                conn = traci.getConnection("init_connection" + self.label)
 
         self.ts_ids = list(conn.trafficlight.getIDList())
         self.ts_id = self.ts_ids[0]
@@ -109,6 +225,8 @@ class SumoEnvironment(gym.Env):
 
 
         conn.close()
+        self._observation_buffers = None
+        self.set_observation_buffers(observation_buffers)
 
         self.vehicles = dict()
         self.total_waiting_time = 0
@@ -124,12 +242,16 @@ class SumoEnvironment(gym.Env):
         self.reward = 0.0
         
         self.fixed_ts_phase_id = 0
+        self.checkpointing = checkpointing
+        self._resume_path = None
 
     def _start_simulation(self):
+        self.signal_commands.clear()
         sumo_cmd = [
             self._sumo_binary,
             "-c",
             self._conf,
+            *self._route_args,
             "--max-depart-delay",
             str(self.max_depart_delay),
             "--waiting-time-memory",
@@ -140,11 +262,18 @@ class SumoEnvironment(gym.Env):
         if self.begin_time > 0:
             sumo_cmd.append(f"-b {self.begin_time}")
 
+        if self.checkpointing:
+            # states written by save_checkpoint include the random number generators, at full precision, and all
+            # the vehicles of the route files (loaded upfront, so a resumed run draws the same vehicle parameters)
+            sumo_cmd.extend(["--save-state.rng", "--save-state.precision", "17", "--route-steps", "0"])
         if self.sumo_seed == "random":
             sumo_cmd.append("--random")
         else:
             sumo_cmd.extend(["--seed", str(self.sumo_seed)])
 
+        if self.network_metrics is not None:
+            sumo_cmd.extend(self.network_metrics.sumo_args())
+
         if self.additional_sumo_cmd is not None:
             sumo_cmd.extend(self.additional_sumo_cmd.split())
 
@@ -181,6 +310,11 @@ class SumoEnvironment(gym.Env):
 
         if seed is not None:
             self.sumo_seed = seed
+        if self._resume_path is not None:
+            observation, info = self._resume()
+            for hook in self.hooks.on_reset:
+                hook(self, observation, info)
+            return observation, info
         self._start_simulation()
 
         self.traffic_signal = TrafficSignal(
@@ -192,7 +326,11 @@ class SumoEnvironment(gym.Env):
                 self.max_green,
                 self.begin_time,
                 self.sumo,
+                self.signal_table,
             )
+        if self.network_metrics is not None:
+            self.network_metrics.start(self.sumo)
+        self.emissions.start(self.sumo, self.traffic_signal.lanes)
 
         self.vehicles = dict()
         
@@ -200,8 +338,82 @@ class SumoEnvironment(gym.Env):
         # print("+++++++++++++++++++++++= ", self._compute_observation())
         # {'density':np.array([0,0,0,0], dtype=np.float32),'nb_veh':np.array([0,0,0,0], dtype=np.int32),'phase':np.array([0,0],dtype=np.int32)}
 
-        return self._compute_observation(), self._compute_info()
+        observation, info = self._compute_observation(), self._compute_info()
+        for hook in self.hooks.on_reset:
+            hook(self, observation, info)
+        return observation, info
     
+    def save_checkpoint(self, path: str):
+        """Saves the running episode so that another environment can continue it (see resume_from).
+
+        Writes the SUMO state, random number generators included, to <path>.state.xml.gz and the state of the
+        environment and of the traffic signal to <path>.pkl.
+        """
+        if not self.checkpointing:
+            raise RuntimeError("save_checkpoint requires SumoEnvironment(checkpointing=True)")
+        self.sumo.simulation.saveState(f"{path}.state.xml.gz")
+        state = {name: getattr(self, name) for name in self.CHECKPOINT_ATTRIBUTES}
+        state["np_random"] = self.np_random.bit_generator.state
+        state["signal_state"] = self.signal_commands.state(self.ts_id)
+        state["signal_table"] = self.signal_table.get_state()
+        state["emissions"] = self.emissions.get_state()
+        state["traffic_signal"] = {k: v for k, v in vars(self.traffic_signal).items() if k not in ("env", "sumo", "_table", "_row")}
+        with open(f"{path}.pkl", "wb") as outf:
+            pickle.dump(state, outf, protocol=pickle.HIGHEST_PROTOCOL)
+
+    def resume_from(self, path: str):
+        """Makes the next reset() continue the episode saved by save_checkpoint(path) instead of starting a new one."""
+        if not self.checkpointing:
+            raise RuntimeError("resume_from requires SumoEnvironment(checkpointing=True)")
+        self._resume_path = path
+
+    def _resume(self):
+        path, self._resume_path = self._resume_path, None
+        with open(f"{path}.pkl", "rb") as inf:
+            state = pickle.load(inf)
+        self.sumo_seed = state["sumo_seed"]
+        self._start_simulation()
+        self.traffic_signal = TrafficSignal(
+            self,
+            self.ts_id,
+            self.delta_time,
+            self.yellow_time,
+            self.min_green,
+            self.max_green,
+            self.begin_time,
+            self.sumo,
+            self.signal_table,
+        )
+        self.sumo.simulation.loadState(f"{path}.state.xml.gz")
+        self.sumo.trafficlight.setRedYellowGreenState(self.ts_id, state["signal_state"])
+        self.signal_commands.record(self.ts_id, state.pop("signal_state"))
+        self.signal_table.set_state(state.pop("signal_table"))
+        self.traffic_signal.__dict__.update(state.pop("traffic_signal"))
+        if self.occupancy_grid is not None:
+            self.traffic_signal._subscribe_grid(self.traffic_signal.next_action_time)
+        if self.network_metrics is not None:
+            self.network_metrics.start(self.sumo)
+        self.emissions.start(self.sumo, self.traffic_signal.lanes)
+        self.emissions.set_state(state.pop("emissions"))
+        self.np_random.bit_generator.state = state.pop("np_random")
+        for name, value in state.items():
+            setattr(self, name, value)
+        if self._observation_buffers is not None:
+            for key, value in self.observation.items():
+                np.copyto(self._observation_buffers[key], value)
+            self.observation = self._observation_buffers
+        info = dict(self.metrics[-1]) if self.metrics else {"step": self.sim_step}
+        return self.observation, info
+
+    def set_observation_buffers(self, buffers: Optional[Dict[str, np.ndarray]]):
+        """Makes the next observations be written into buffers (see observation_buffers), None to allocate them."""
+        if buffers is not None:
+            for key, space in self.observation_space.spaces.items():
+                buffer = buffers.get(key)
+                if buffer is None or buffer.shape != space.shape or buffer.dtype != space.dtype:
+                    raise ValueError(f"The observation buffer of '{key}' must be an array of shape {space.shape} and dtype {space.dtype}")
+        self._observation_buffers = buffers
+
     @property
     def sim_step(self) -> float:
         """Return current simulation second on SUMO."""
@@ -210,10 +422,17 @@ class SumoEnvironment(gym.Env):
     def step(self, action: int):
         """Apply the action(s) and then step the simulation for delta_time seconds.
         """
+        for hook in self.hooks.before_step:
+            hook(self, action)
         # No action, follow fixed TL defined in self.phases
         if action is None:
-            for _ in range(self.delta_time):
-                self._sumo_step()
+            if self.network_metrics is not None:
+                self.network_metrics.schedule(self.sim_step + self.delta_time)
+            if self.event_driven:
+                self._sumo_step(self.sim_step + self.delta_time)
+            else:
+                for _ in range(self.delta_time):
+                    self._sumo_step()
         # if self.fixed_ts:
         #     self.traffic_signal.sumo.trafficlight.setRedYellowGreenState(
         #             self.ts_id, self.traffic_signal.all_phases[self.fixed_ts_phase_id].state
@@ -224,21 +443,36 @@ class SumoEnvironment(gym.Env):
                 
         # print(f"+++++++++++++++++++ {self.fixed_ts_phase_id}")
                 
+        elif self.hold_durations:
+            decision_time = self.sim_step
+            self._apply_action(action)
+            reward = self._run_span()
         else:
             self._apply_action(action)
             self._run_steps()
 
         observation = self._compute_observation()
-        reward = self._compute_reward()
+        for hook in self.hooks.after_observation:
+            hook(self, observation)
+        if not self.hold_durations or action is None:
+            reward = self._compute_reward()
+        for hook in self.hooks.after_reward:
+            hook(self, reward)
         dones = self._compute_done()
         terminated = False  # there are no 'terminal' states in this environment
         truncated = dones["__all__"]  # episode ends when sim_step >= max_steps
         info = self._compute_info()
+        if self.hold_durations and action is not None:
+            info["duration"] = self.sim_step - decision_time
+            info["discount"] = self.gamma ** max(1, int(info["duration"] // self.delta_time))
 
         return observation, reward, terminated, truncated, info
         # return np.array([45.0], dtype=np.float32), reward, done, info
 
     def _run_steps(self):
+        if self.event_driven:
+            self._run_to_next_event()
+            return
         time_to_act = False
         while not time_to_act:
             self._sumo_step()
@@ -247,6 +481,41 @@ class SumoEnvironment(gym.Env):
             if self.traffic_signal.time_to_act:
                 time_to_act = True
 
+    def _run_to_next_event(self):
+        """Advances SUMO from event to event (yellow end, next action) until the traffic signal has to act."""
+        while not self.traffic_signal.time_to_act:
+            self._advance(self.traffic_signal.next_action_time)
+
+    def _advance(self, until: float):
+        """Simulates up to time until (at least one step), switching from yellow to green on the way."""
+        while True:
+            now = self.sim_step
+            if self.event_driven:
+                self._sumo_step(max(min(self.traffic_signal.next_event_time(), until), now + 1))
+            else:
+                self._sumo_step()
+            self.traffic_signal.update(int(round(self.sim_step - now)))
+            if self.sim_step >= until:
+                return
+
+    def _run_span(self) -> float:
+        """Simulates until the next action (semi-MDP mode) and returns the discounted reward of the span.
+
+        The reward is sampled every delta_time seconds, as if the agent had kept its action at each decision
+        (a remainder shorter than delta_time, e.g. the yellow time added when the phase is kept, extends the
+        last interval), so a span of delta_time gives the same reward as the default mode.
+        """
+        start = self.sim_step
+        end = self.traffic_signal.next_action_time
+        intervals = max(1, int((end - start) // self.delta_time))
+        reward = 0.0
+        for interval in range(intervals):
+            until = end if interval == intervals - 1 else start + (interval + 1) * self.delta_time
+            self._advance(until)
+            reward += self.gamma**interval * self.traffic_signal.compute_reward()
+        self.reward = reward
+        return reward
+
     def _apply_action(self, action):
         """Set the next green phase for the traffic signals.
 
@@ -258,7 +527,11 @@ class SumoEnvironment(gym.Env):
         if self.traffic_signal.time_to_act:
             self.traffic_signal.old_phase = self.traffic_signal.green_phase
             # print("can act ? ",self.traffic_signal.time_to_act)
-            self.traffic_signal.set_next_phase(action)
+            phase, duration = self.traffic_signal.decode_action(action)
+            self.traffic_signal.set_next_phase(phase, duration)
+            if self.network_metrics is not None:
+                # step() returns (and reads the system info) when the traffic signal acts again
+                self.network_metrics.schedule(self.traffic_signal.next_action_time)
             
                     
     def _compute_done(self):
@@ -268,8 +541,8 @@ class SumoEnvironment(gym.Env):
 
     def _compute_info(self):
         info = {"step": self.sim_step}
-        # if self.add_system_info:
-        #     info.update(self._get_system_info())
+        if self.add_system_info:
+            info.update(self._get_system_info())
         if self.add_agent_info:
             info.update(self._get_agent_info())
         self.metrics.append(info.copy())
@@ -279,7 +552,7 @@ class SumoEnvironment(gym.Env):
         
         # print("time to act : ", self.traffic_signal.time_to_act)
         if self.traffic_signal.time_to_act:
-            self.observation = self.traffic_signal.compute_observation()
+            self.observation = self.traffic_signal.compute_observation(self._observation_buffers)
             #return self.observation.copy()
             
         # print("+++++++++++++++++++++++++++++++++++ === ",self.observation)
@@ -310,20 +583,19 @@ class SumoEnvironment(gym.Env):
         """
         return self.traffic_signal.action_space
 
-    def _sumo_step(self):
-        self.sumo.simulationStep()
+    def _sumo_step(self, target_time: float = 0.0):
+        """Performs one simulation step, or all steps up to target_time if it is given.
+
+        The light states queued by the traffic signal(s) since the last step are sent first.
+        """
+        self.signal_commands.flush(self.sumo)
+        self.sumo.simulationStep(target_time)
+        self.emissions.accumulate(target_time)
+        for hook in self.hooks.after_sumo_step:
+            hook(self)
 
     def _get_system_info(self):
-        vehicles = self.sumo.vehicle.getIDList()
-        speeds = [self.sumo.vehicle.getSpeed(vehicle) for vehicle in vehicles]
-        waiting_times = [self.sumo.vehicle.getWaitingTime(vehicle) for vehicle in vehicles]
-        return {
-            # In SUMO, a vehicle is considered halting if its speed is below 0.1 m/s
-            "system_total_stopped": sum(int(speed < 0.1) for speed in speeds),
-            "system_total_waiting_time": sum(waiting_times),
-            "system_mean_waiting_time": 0.0 if len(vehicles) == 0 else np.mean(waiting_times),
-            "system_mean_speed": 0.0 if len(vehicles) == 0 else np.mean(speeds),
-        }
+        return self.network_metrics.read(self.sim_step)
 
 
 
@@ -380,6 +652,8 @@ class SumoEnvironment(gym.Env):
         if not LIBSUMO:
             traci.switch(self.label)
         traci.close()
+        if self.network_metrics is not None:
+            self.network_metrics.close()
 
         if self.disp is not None:
             self.disp.stop()
@@ -415,6 +689,8 @@ class SumoEnvironment(gym.Env):
             episode (int): Episode number to be appended to the output file name.
         """
         if out_csv_name is not None:
+            import pandas as pd  # only needed here, it would take most of the import time of the package
+
             df = pd.DataFrame(self.metrics)
             Path(Path(out_csv_name).parent).mkdir(parents=True, exist_ok=True)
             df.to_csv(out_csv_name + f"_conn{self.label}_ep{episode}" + ".csv", index=False)
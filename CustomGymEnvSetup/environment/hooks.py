@@ -0,0 +1,298 @@
+"""Hooks called by SumoEnvironment at the main points of an episode, and built-in profiling hooks.
+
+Events and the arguments of their callbacks:
+
+- ``before_step(env, action)``: start of step(), before the action is applied;
+- ``after_sumo_step(env)``: after every simulationStep (every simulated second, or every jump in event-driven
+  stepping);
+- ``after_observation(env, observation)``: once the observation of step() is computed;
+- ``after_reward(env, reward)``: once the reward of step() is computed, last event of a step;
+- ``on_reset(env, observation, info)``: end of reset() (also when resuming a checkpoint).
+
+Each event is a plain list of callbacks on the registry, so an environment without hooks only pays for
+iterating over empty lists. Objects with methods named after events (like the built-in hooks) are registered
+with add(), which connects all of them.
+
+Example:
+    timer, counter = EpisodeTimer(), TraciCounter()
+    env = SumoEnvironment("network_trainning/single-intersection-real-scenario.sumocfg", hooks=[timer, counter])
+    env.hooks.register("after_reward", lambda env, reward: print(env.sim_step, reward))
+    env.hooks.add(ProfileWindow(start=100, steps=50, output_dir="profiles"))
+"""
+
+import cProfile
+import io
+import os
+import pstats
+import time
+from collections import Counter
+from typing import Callable, List, Optional
+
+
+EVENTS = ("before_step", "after_sumo_step", "after_observation", "after_reward", "on_reset")
+
+
+class HookRegistry:
+    """Callbacks of the environment events, one list per event (see EVENTS)."""
+
+    def __init__(self):
+        self.before_step: List[Callable] = []
+        self.after_sumo_step: List[Callable] = []
+        self.after_observation: List[Callable] = []
+        self.after_reward: List[Callable] = []
+        self.on_reset: List[Callable] = []
+
+    def register(self, event: str, callback: Callable) -> Callable:
+        """Calls callback at every event (see the module documentation for its arguments) and returns it."""
+        if event not in EVENTS:
+            raise ValueError(f"Unknown event '{event}', expected one of {EVENTS}")
+        getattr(self, event).append(callback)
+        return callback
+
+    def unregister(self, event: str, callback: Callable):
+        getattr(self, event).remove(callback)
+
+    def add(self, hook):
+        """Registers the methods of hook named after an event, or hook itself if it is a dict of event callbacks."""
+        callbacks = hook if isinstance(hook, dict) else {event: getattr(hook, event) for event in EVENTS if hasattr(hook, event)}
+        if not callbacks:
+            raise ValueError(f"{hook!r} has no method named after an event {EVENTS}")
+        for event, callback in callbacks.items():
+            self.register(event, callback)
+        return hook
+
+    def remove(self, hook):
+        """Unregisters the methods of a hook added with add()."""
+        for event in EVENTS:
+            callbacks = getattr(self, event)
+            callbacks[:] = [c for c in callbacks if getattr(c, "__self__", None) is not hook]
+
+    def __bool__(self) -> bool:
+        return any(getattr(self, event) for event in EVENTS)
+
+
+class EpisodeTimer:
+    """Wall-clock time of each part of the decision steps, summarized per episode.
+
+    A step is split into simulation (applying the action and running SUMO up to the last simulationStep),
+    observation and reward. The episode runs from the end of its reset to the end of its last step, so
+    closing it and starting the next simulation are not counted. The summary of an episode is appended to
+    ``episodes`` (and printed if verbose) at the next reset, or when summary() is called.
+    """
+
+    def __init__(self, verbose: bool = False):
+        self.verbose = verbose
+        self.episodes: List[dict] = []
+        self._clear()
+
+    def _clear(self):
+        self.steps = self.sumo_steps = 0
+        self.simulation = self.observation = self.reward = 0.0
+        self._start = self._last = self._end = time.perf_counter()
+        self._begin_time = None
+        self._sim_time = 0.0
+
+    def before_step(self, env, action):
+        self._last = self._step_start = time.perf_counter()
+
+    def after_sumo_step(self, env):
+        self.sumo_steps += 1
+        self._last = time.perf_counter()
+
+    def after_observation(self, env, observation):
+        now = time.perf_counter()
+        self.simulation += self._last - self._step_start
+        self.observation += now - self._last
+        self._last = now
+
+    def after_reward(self, env, reward):
+        now = time.perf_counter()
+        self.reward += now - self._last
+        self._end = now
+        self.steps += 1
+        self._sim_time = env.sim_step
+
+    def on_reset(self, env, observation, info):
+        if self.steps:
+            self.summary()
+        self._clear()
+        self._begin_time = info.get("step", env.sim_step)
+
+    def summary(self) -> dict:
+        """Summary of the episode so far (also appended to episodes)."""
+        wall = self._end - self._start
+        steps = max(self.steps, 1)
+        summary = {
+            "episode": len(self.episodes) + 1,
+            "steps": self.steps,
+            "sumo_steps": self.sumo_steps,
+            "wall_time": wall,
+            "simulated_time": self._sim_time - (self._begin_time or 0.0),
+            "simulation_ms_per_step": self.simulation / steps * 1e3,
+            "observation_ms_per_step": self.observation / steps * 1e3,
+            "reward_ms_per_step": self.reward / steps * 1e3,
+            "other_ms_per_step": (wall - self.simulation - self.observation - self.reward) / steps * 1e3,
+        }
+        summary["real_time_factor"] = summary["simulated_time"] / wall if wall > 0 else 0.0
+        self.episodes.append(summary)
+        if self.verbose:
+            print(
+                f"episode {summary['episode']}: {summary['steps']} steps in {wall:.2f} s "
+                f"({summary['real_time_factor']:.0f}x real time), per step: "
+                f"simulation {summary['simulation_ms_per_step']:.3f} ms, "
+                f"observation {summary['observation_ms_per_step']:.3f} ms, reward {summary['reward_ms_per_step']:.3f} ms"
+            )
+        return summary
+
+
+class TraciCounter:
+    """Counts the TraCI commands sent to SUMO, by command, per episode.
+
+    Counting starts at the end of each reset (the commands of the reset itself are not counted) and wraps
+    the command method of the connection, so it does not work with libsumo, which has no connection.
+    The counts of an episode are appended to ``episodes`` at the next reset or when summary() is called.
+    """
+
+    def __init__(self):
+        self.counts: Counter = Counter()
+        self.steps = 0
+        self.episodes: List[dict] = []
+        self._names = None
+
+    def _command_names(self):
+        if self._names is None:
+            import traci.constants as tc
+
+            self._names = {}
+            for name, value in vars(tc).items():
+                if name.startswith("CMD_") and isinstance(value, int):
+                    self._names.setdefault(value, name[4:].lower())
+        return self._names
+
+    def on_reset(self, env, observation, info):
+        if self.steps:
+            self.summary()
+        self.counts = Counter()
+        self.steps = 0
+        connection = env.sumo
+        if not hasattr(connection, "_sendCmd"):
+            raise RuntimeError("TraciCounter needs a TraCI connection (it does not support libsumo)")
+        send = type(connection)._sendCmd
+        names = self._command_names()
+        counts = self.counts
+
+        def counting_send(cmdID, *args, **kwargs):
+            counts[names.get(cmdID, hex(cmdID))] += 1
+            return send(connection, cmdID, *args, **kwargs)
+
+        connection._sendCmd = counting_send
+
+    def after_reward(self, env, reward):
+        self.steps += 1
+
+    def summary(self) -> dict:
+        """Counts of the episode so far (also appended to episodes)."""
+        total = sum(self.counts.values())
+        summary = {
+            "episode": len(self.episodes) + 1,
+            "steps": self.steps,
+            "commands": total,
+            "commands_per_step": total / max(self.steps, 1),
+            "by_command": dict(self.counts.most_common()),
+        }
+        self.episodes.append(summary)
+        return summary
+
+
+class ProfileWindow:
+    """Profiles windows of decision steps with cProfile or pyinstrument.
+
+    Profiling covers steps [start, start + steps), counted over all episodes, then every ``every`` steps if
+    given. Each window is written to output_dir (``window_<first step>.prof`` for cProfile, readable with
+    pstats or snakeviz, ``.html`` for pyinstrument) or printed when output_dir is None.
+
+    Args:
+        start (int): First profiled step.
+        steps (int): Steps per window.
+        every (int): Steps between the starts of two windows, a single window if None.
+        profiler (str): "cProfile" or "pyinstrument" (sampling profiler, optional dependency).
+        output_dir (str): Directory of the reports.
+        interval (float): Sampling interval of pyinstrument (s).
+    """
+
+    def __init__(
+        self,
+        start: int = 0,
+        steps: int = 100,
+        every: Optional[int] = None,
+        profiler: str = "cProfile",
+        output_dir: Optional[str] = None,
+        interval: float = 0.001,
+    ):
+        if profiler not in ("cProfile", "pyinstrument"):
+            raise ValueError(f"Unknown profiler '{profiler}', expected 'cProfile' or 'pyinstrument'")
+        self.start = start
+        self.steps = steps
+        self.every = every
+        self.profiler = profiler
+        self.output_dir = output_dir
+        self.interval = interval
+        self.reports: List[str] = []
+        self._step = 0
+        self._first = None
+        self._profiler = None
+
+    def _in_window(self, step: int) -> bool:
+        if step < self.start:
+            return False
+        offset = step - self.start
+        if self.every is None:
+            return offset < self.steps
+        return offset % self.every < self.steps
+
+    def before_step(self, env, action):
+        if self._profiler is None and self._in_window(self._step):
+            self._first = self._step
+            if self.profiler == "cProfile":
+                self._profiler = cProfile.Profile()
+                self._profiler.enable()
+            else:
+                try:
+                    from pyinstrument import Profiler
+                except ImportError as e:
+                    raise ImportError("ProfileWindow(profiler='pyinstrument') requires pyinstrument (pip install pyinstrument)") from e
+                self._profiler = Profiler(interval=self.interval)
+                self._profiler.start()
+
+    def after_reward(self, env, reward):
+        self._step += 1
+        if self._profiler is not None and not self._in_window(self._step):
+            self.stop()
+
+    def stop(self):
+        """Ends the current window (if any) and writes its report."""
+        if self._profiler is None:
+            return
+        profiler, self._profiler = self._profiler, None
+        name = f"window_{self._first:07d}"
+        if self.profiler == "cProfile":
+            profiler.disable()
+            if self.output_dir is not None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                path = os.path.join(self.output_dir, name + ".prof")
+                profiler.dump_stats(path)
+                self.reports.append(path)
+            else:
+                stream = io.StringIO()
+                pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(25)
+                print(stream.getvalue())
+        else:
+            profiler.stop()
+            if self.output_dir is not None:
+                os.makedirs(self.output_dir, exist_ok=True)
+                path = os.path.join(self.output_dir, name + ".html")
+                with open(path, "w") as outf:
+                    outf.write(profiler.output_html())
+                self.reports.append(path)
+            else:
+                print(profiler.output_text(unicode=True))
@@ -0,0 +1,129 @@
+"""Read-only, TraCI-like view of a compiled network (see CustomGymEnvSetup.cache.network).
+
+SumoEnvironment builds a TrafficSignal at construction only to know its lanes, lane lengths, phases and the
+observation/action spaces. Starting SUMO for that (loading the routes and connecting TraCI) takes more than
+a second per environment; NetworkMetadata answers the few TraCI getters the TrafficSignal constructor uses
+from the memory-mapped arrays of the compiled network instead, and ignores its setters and subscriptions.
+
+Example:
+    conn = NetworkMetadata(load_network("network_trainning/single-intersection.net.xml"))
+    conn.trafficlight.getIDList()  # ['t']
+    conn.lane.getLength("n_t_0")
+"""
+
+import os
+import sys
+from types import SimpleNamespace
+from typing import List, Optional, Tuple
+
+
+if "SUMO_HOME" in os.environ:
+    tools = os.path.join(os.environ["SUMO_HOME"], "tools")
+    if tools not in sys.path:
+        sys.path.append(tools)
+import numpy as np
+import traci
+
+from ..cache.network import CompiledNetwork, load_network
+from ..cache.routes import read_sumocfg
+
+
+class _TrafficLights:
+    Phase = traci.trafficlight.Phase
+    Logic = traci.trafficlight.Logic
+
+    def __init__(self, net: CompiledNetwork):
+        self._net = net
+
+    def getIDList(self) -> List[str]:
+        """Traffic lights with a program, sorted like SUMO's list."""
+        programs = self._net.tl_program_ids.tolist()
+        return sorted(tl for tl, program in zip(self._net.tl_ids.tolist(), programs) if program)
+
+    def getControlledLanes(self, tl_id: str) -> List[str]:
+        _, from_lane, _, _ = self._net.tls_links(tl_id)
+        return self._net.lane_ids[from_lane].tolist()
+
+    def getControlledLinks(self, tl_id: str) -> List[List[Tuple[str, str, str]]]:
+        _, from_lane, to_lane, via_lane = self._net.tls_links(tl_id)
+        lane_ids = self._net.lane_ids
+        return [
+            [(str(lane_ids[f]), str(lane_ids[t]), str(lane_ids[v]) if v >= 0 else "")]
+            for f, t, v in zip(from_lane.tolist(), to_lane.tolist(), via_lane.tolist())
+        ]
+
+    def getAllProgramLogics(self, tl_id: str):
+        tl = int(np.flatnonzero(self._net.tl_ids == tl_id)[0])
+        mask = np.asarray(self._net.tl_phase_tl) == tl
+        phases = [
+            self.Phase(duration, state)
+            for duration, state in zip(self._net.tl_phase_duration[mask].tolist(), self._net.tl_phase_state[mask].tolist())
+        ]
+        return [self.Logic(str(self._net.tl_program_ids[tl]), 0, 0, phases)]
+
+    def setProgramLogic(self, tl_id: str, logic):
+        pass
+
+    def setRedYellowGreenState(self, tl_id: str, state: str):
+        pass
+
+
+class _Lanes:
+    def __init__(self, net: CompiledNetwork):
+        self._net = net
+
+    def getLength(self, lane_id: str) -> float:
+        return float(self._net.lane_length[self._net.lane_index_of(lane_id)])
+
+    def getMaxSpeed(self, lane_id: str) -> float:
+        return float(self._net.lane_speed[self._net.lane_index_of(lane_id)])
+
+    def getEdgeID(self, lane_id: str) -> str:
+        return str(self._net.edge_ids[self._net.lane_edge[self._net.lane_index_of(lane_id)]])
+
+    def getShape(self, lane_id: str) -> List[Tuple[float, float]]:
+        """Only the last point of the shape (the stop line end) is kept in the compiled network."""
+        lane = self._net.lane_index_of(lane_id)
+        return [(float(self._net.lane_end_x[lane]), float(self._net.lane_end_y[lane]))]
+
+
+class NetworkMetadata:
+    """Stands for a TraCI connection while a TrafficSignal is built from a compiled network.
+
+    Args:
+        net (CompiledNetwork): Compiled network of the simulation.
+        begin_time (float): Time returned by simulation.getTime().
+    """
+
+    def __init__(self, net: CompiledNetwork, begin_time: float = 0.0):
+        self.net = net
+        self.trafficlight = _TrafficLights(net)
+        self.lane = _Lanes(net)
+        self.edge = SimpleNamespace(getToJunction=lambda edge_id: str(net.junction_ids[net.edge_to[net.edge_index(edge_id)]]))
+        self.junction = SimpleNamespace(getPosition=self._junction_position, subscribeContext=lambda *args, **kwargs: None)
+        self.simulation = SimpleNamespace(getTime=lambda: float(begin_time))
+
+    def _junction_position(self, junction_id: str) -> Tuple[float, float]:
+        junction = int(np.flatnonzero(self.net.junction_ids == junction_id)[0])
+        return float(self.net.junction_x[junction]), float(self.net.junction_y[junction])
+
+    @classmethod
+    def from_sumocfg(cls, sumocfg: str, cache_dir: str, begin_time: float = 0.0) -> Optional["NetworkMetadata"]:
+        """Metadata of the network of a SUMO configuration.
+
+        Returns None, so the caller reads it from SUMO, if the configuration does not name exactly one net
+        file or if its additional files may load traffic light programs (which replace those of the net).
+        """
+        inputs = read_sumocfg(sumocfg)
+        if len(inputs["net-file"]) != 1:
+            return None
+        for additional in inputs["additional-files"]:
+            if additional.endswith(".gz"):
+                return None
+            with open(additional, "rb") as inf:
+                if b"<tlLogic" in inf.read():
+                    return None
+        return cls(load_network(inputs["net-file"][0], cache_dir), begin_time)
+
+    def close(self):
+        pass
@@ -0,0 +1,174 @@
+"""Network-wide metrics from SUMO's own aggregates instead of per-vehicle TraCI calls.
+
+Two sources, both free of per-vehicle Python loops:
+
+- SUMO's summary output (one ``<step>`` element per simulation step with the running, arrived and
+  teleported vehicles and their mean speed) is written to a local socket opened by the environment and
+  parsed incrementally as it arrives;
+- a context subscription to the halting number, waiting time and emissions of every edge (internal
+  edges included), scheduled for the simulation time of the next read (schedule()) so that SUMO sends the
+  values of all edges once, with the response of that simulationStep, instead of at every step.
+
+Example:
+    metrics = NetworkMetrics()
+    traci.start(sumo_cmd + metrics.sumo_args())
+    metrics.start(traci)
+    metrics.schedule(5.0)
+    traci.simulationStep(5.0)
+    metrics.read(traci.simulation.getTime())  # {'system_total_stopped': ..., 'system_mean_speed': ...}
+"""
+
+import os
+import socket
+import sys
+import xml.parsers.expat
+from typing import Dict, List, Optional
+
+
+if "SUMO_HOME" in os.environ:
+    tools = os.path.join(os.environ["SUMO_HOME"], "tools")
+    if tools not in sys.path:
+        sys.path.append(tools)
+import traci.constants as tc
+
+
+EDGE_VARIABLES = [tc.LAST_STEP_VEHICLE_NUMBER, tc.LAST_STEP_VEHICLE_HALTING_NUMBER, tc.VAR_WAITING_TIME]
+EMISSION_VARIABLES = [tc.VAR_CO2EMISSION, tc.VAR_FUELCONSUMPTION]
+EDGE_GETTERS = {
+    tc.LAST_STEP_VEHICLE_NUMBER: "getLastStepVehicleNumber",
+    tc.LAST_STEP_VEHICLE_HALTING_NUMBER: "getLastStepHaltingNumber",
+    tc.VAR_WAITING_TIME: "getWaitingTime",
+    tc.VAR_CO2EMISSION: "getCO2Emission",
+    tc.VAR_FUELCONSUMPTION: "getFuelConsumption",
+}
+
+
+class NetworkMetrics:
+    """Network-wide metrics of a running simulation.
+
+    Args:
+        emissions (bool): Also subscribe to the CO2 emission and fuel consumption of the edges.
+        timeout (float): Seconds to wait for SUMO to connect to the summary socket or to send a step.
+    """
+
+    def __init__(self, emissions: bool = True, timeout: float = 10.0):
+        self.emissions = emissions
+        self.timeout = timeout
+        self.summary: Dict[str, str] = {}
+        self._listener: Optional[socket.socket] = None
+        self._stream: Optional[socket.socket] = None
+        self._parser = None
+        self._sumo = None
+        self._scheduled = None
+
+    def sumo_args(self) -> List[str]:
+        """Opens the summary socket of a new simulation and returns the SUMO options writing to it."""
+        self.close()
+        self._listener = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self._listener.bind(("127.0.0.1", 0))
+        self._listener.listen(1)
+        self._listener.settimeout(self.timeout)
+        return ["--summary-output", "127.0.0.1:%d" % self._listener.getsockname()[1]]
+
+    def start(self, sumo):
+        """Accepts the summary connection of the simulation started with sumo_args().
+
+        Must be called once the simulation is at its starting time (after loadState when resuming).
+        """
+        self._sumo = sumo
+        self._stream, _ = self._listener.accept()
+        self._stream.settimeout(self.timeout)
+        self._listener.close()
+        self._listener = None
+        self._parser = xml.parsers.expat.ParserCreate()
+        self._parser.StartElementHandler = self._start_element
+        self.summary = {}
+        self._begin = sumo.simulation.getTime()
+        self._step_length = sumo.simulation.getDeltaT()
+        self._variables = EDGE_VARIABLES + EMISSION_VARIABLES if self.emissions else EDGE_VARIABLES
+        self._edges = sumo.edge.getIDList()
+        # a circle around any junction with the diagonal of the network as radius holds every edge. TraCI
+        # mixes the context results of a junction, so an internal junction is preferred: the occupancy grid
+        # subscribes around the (normal) junction of the traffic signal
+        (x0, y0), (x1, y1) = sumo.simulation.getNetBoundary()
+        junctions = sumo.junction.getIDList()
+        self._junction = next((junction for junction in junctions if junction.startswith(":")), junctions[0])
+        self._radius = ((x1 - x0) ** 2 + (y1 - y0) ** 2) ** 0.5 + 1.0
+        self._scheduled = None
+
+    def schedule(self, time: float):
+        """Makes SUMO send the values of the edges with the simulation step reaching time (the next read)."""
+        if time != self._scheduled:
+            self._sumo.junction.subscribeContext(
+                self._junction, tc.CMD_GET_EDGE_VARIABLE, self._radius, self._variables, begin=time, end=time
+            )
+            self._scheduled = time
+
+    def _edge_values(self, time: float):
+        if time == self._scheduled:
+            return (self._sumo.junction.getContextSubscriptionResults(self._junction) or {}).values()
+        # not scheduled (e.g. at the start of an episode): one call per edge and variable
+        getters = [(var, getattr(self._sumo.edge, EDGE_GETTERS[var])) for var in self._variables]
+        return [{var: getter(edge) for var, getter in getters} for edge in self._edges]
+
+    def _start_element(self, name: str, attrs: Dict[str, str]):
+        if name == "step":
+            self.summary = attrs
+
+    def _receive(self, timeout: Optional[float]) -> bool:
+        """Parses the summary data received within timeout seconds (0 for what already arrived)."""
+        self._stream.settimeout(timeout)
+        received = False
+        try:
+            while True:
+                data = self._stream.recv(1 << 16)
+                if not data:  # the simulation was closed
+                    return received
+                self._parser.Parse(data, False)
+                received = True
+                self._stream.settimeout(0)
+        except (BlockingIOError, socket.timeout):
+            return received
+
+    def read(self, time: float) -> Dict[str, float]:
+        """Returns the metrics of the network at simulation time (the current time of the simulation)."""
+        # the summary <step> of the step that ended at time is written before simulationStep returns
+        last_step = time - self._step_length - 1e-6
+        self._receive(0)
+        while time > self._begin and float(self.summary.get("time", "-inf")) < last_step:
+            if not self._receive(self.timeout):
+                raise TimeoutError(f"No summary output of SUMO for time {time} after {self.timeout} s")
+
+        vehicles = stopped = 0
+        waiting_time = co2 = fuel = 0.0
+        for values in self._edge_values(time):
+            vehicles += values[tc.LAST_STEP_VEHICLE_NUMBER]
+            stopped += values[tc.LAST_STEP_VEHICLE_HALTING_NUMBER]
+            waiting_time += values[tc.VAR_WAITING_TIME]
+            if self.emissions:
+                co2 += values[tc.VAR_CO2EMISSION]
+                fuel += values[tc.VAR_FUELCONSUMPTION]
+
+        running = int(self.summary.get("running", 0))
+        info = {
+            # In SUMO, a vehicle is considered halting if its speed is below 0.1 m/s
+            "system_total_stopped": stopped,
+            "system_total_waiting_time": waiting_time,
+            "system_mean_waiting_time": 0.0 if vehicles == 0 else waiting_time / vehicles,
+            "system_mean_speed": float(self.summary["meanSpeed"]) if running > 0 else 0.0,
+            "system_running": running,
+            "system_arrived": int(self.summary.get("arrived", 0)),
+            "system_teleports": int(self.summary.get("teleports", 0)),
+        }
+        if self.emissions:
+            info["system_co2_emission"] = co2  # mg/s
+            info["system_fuel_consumption"] = fuel  # mg/s
+        return info
+
+    def close(self):
+        """Closes the summary socket (the subscription ends with the simulation)."""
+        for sock in (self._stream, self._listener):
+            if sock is not None:
+                sock.close()
+        self._stream = self._listener = None
+        self._parser = None
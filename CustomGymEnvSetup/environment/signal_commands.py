@@ -0,0 +1,58 @@
+"""Buffer of the traffic light state writes of a simulation step.
+
+The traffic signals do not call trafficlight.setRedYellowGreenState themselves: they queue the state they
+want with set(), and the environment flushes the buffer just before each simulationStep. Only the last state
+queued for a signal during the step is kept, and it is only sent to SUMO when it differs from the state the
+signal already shows (e.g. the green string re-sent when a phase is kept), so a step costs at most one write
+per signal whose lights actually change.
+
+The buffer assumes it sees every state change of the signals it controls: states set directly on the
+connection must be reported with record().
+"""
+
+from typing import Dict
+
+
+class SignalCommandBuffer:
+    """Pending and current red/yellow/green states of the traffic signals of a simulation."""
+
+    def __init__(self):
+        self.pending: Dict[str, str] = {}
+        self.current: Dict[str, str] = {}
+        self.writes = 0  # states sent to SUMO
+        self.requests = 0  # states queued by the signals
+
+    def clear(self):
+        """Forgets the states of the signals (new simulation). The counters are kept."""
+        self.pending.clear()
+        self.current.clear()
+
+    def set(self, ts_id: str, state: str):
+        """Queues the state of a signal, to be sent at the next flush if it changes anything."""
+        self.requests += 1
+        self.pending[ts_id] = state
+
+    def record(self, ts_id: str, state: str):
+        """Records a state set on the signal without the buffer (it replaces any pending state)."""
+        self.pending.pop(ts_id, None)
+        self.current[ts_id] = state
+
+    def state(self, ts_id: str) -> str:
+        """State the signal will show at the next simulation step."""
+        return self.pending.get(ts_id, self.current.get(ts_id))
+
+    def flush(self, sumo):
+        """Sends the pending states that differ from the current ones to SUMO."""
+        if not self.pending:
+            return
+        for ts_id, state in self.pending.items():
+            if self.current.get(ts_id) != state:
+                sumo.trafficlight.setRedYellowGreenState(ts_id, state)
+                self.current[ts_id] = state
+                self.writes += 1
+        self.pending.clear()
+
+    @property
+    def writes_saved(self) -> int:
+        """Queued states that were not sent (unchanged or superseded within the step)."""
+        return self.requests - self.writes
@@ -0,0 +1,116 @@
+"""Struct-of-arrays state of the traffic signals of an environment.
+
+The timing state of every signal (current green phase, yellow flag, time since the last phase change, next
+action time, and the last measures used by the reward) is one NumPy column per field, one row per signal.
+The TrafficSignal rules (see TrafficSignal.update and set_next_phase) are applied to any set of rows with a
+few array operations, and each TrafficSignal reads and writes its own row through properties, so the
+per-signal code keeps working unchanged.
+"""
+
+from typing import Dict, Optional, Sequence, Union
+
+import numpy as np
+
+
+ArrayLike = Union[int, float, Sequence[float], np.ndarray]
+
+COLUMNS = {
+    "green_phase": np.int64,
+    "is_yellow": bool,
+    "time_since_last_phase_change": np.int64,
+    "next_action_time": np.float64,
+    "last_measure": np.float64,
+    "last_density": np.float64,
+    "yellow_time": np.int64,
+    "min_green": np.int64,
+}
+
+
+class SignalStateTable:
+    """Timing state of num_signals traffic signals, one NumPy column per field.
+
+    Args:
+        num_signals (int): Number of rows.
+    """
+
+    def __init__(self, num_signals: int = 1):
+        self.num_signals = num_signals
+        self.columns: Dict[str, np.ndarray] = {name: np.zeros(num_signals, dtype=dtype) for name, dtype in COLUMNS.items()}
+        for name, column in self.columns.items():
+            setattr(self, name, column)
+
+    def time_to_act(self, time: float, rows=slice(None)) -> np.ndarray:
+        """Mask of the signals that have to act at the given simulation time."""
+        return self.next_action_time[rows] == time
+
+    def update(self, elapsed: ArrayLike = 1, rows=slice(None)) -> np.ndarray:
+        """Advances the signals of rows by elapsed seconds (TrafficSignal.update).
+
+        Returns:
+            np.ndarray: Mask over rows of the signals whose yellow phase just ended (their green state has to be set).
+        """
+        self.time_since_last_phase_change[rows] += elapsed
+        yellow_over = self.is_yellow[rows] & (self.time_since_last_phase_change[rows] >= self.yellow_time[rows])
+        self.is_yellow[rows] &= ~yellow_over
+        return yellow_over
+
+    def set_next_phase(self, rows, new_phase: ArrayLike, duration: ArrayLike, time: float) -> np.ndarray:
+        """Applies the actions of the signals of rows (TrafficSignal.set_next_phase).
+
+        A signal keeps its green phase when the action asks for it or when it has not shown it for
+        yellow_time + min_green seconds yet; otherwise it turns yellow and switches to the new phase.
+
+        Args:
+            rows: Signals that act (index array, slice or mask).
+            new_phase: Requested green phase of each of them.
+            duration: Seconds until their next action.
+            time (float): Current simulation time.
+
+        Returns:
+            np.ndarray: Mask over rows of the signals that keep their phase (the others turned yellow).
+        """
+        green_phase = self.green_phase[rows]
+        new_phase = np.asarray(new_phase, dtype=np.int64)
+        keep = (green_phase == new_phase) | (self.time_since_last_phase_change[rows] < self.yellow_time[rows] + self.min_green[rows])
+        self.next_action_time[rows] = time + duration + np.where(keep, self.yellow_time[rows], 0)
+        self.green_phase[rows] = np.where(keep, green_phase, new_phase)
+        self.is_yellow[rows] |= ~keep
+        self.time_since_last_phase_change[rows] = np.where(keep, self.time_since_last_phase_change[rows], 0)
+        return keep
+
+    def get_state(self) -> Dict[str, np.ndarray]:
+        return {name: column.copy() for name, column in self.columns.items()}
+
+    def set_state(self, state: Dict[str, np.ndarray]):
+        for name, column in self.columns.items():
+            column[:] = state[name]
+
+
+def _column_property(name: str, cast):
+    def fget(self):
+        return cast(self._table.columns[name][self._row])
+
+    def fset(self, value):
+        self._table.columns[name][self._row] = value
+
+    return property(fget, fset, doc=f"Row of the '{name}' column of the signal state table.")
+
+
+class SignalStateView:
+    """Mixin giving a traffic signal attribute access to its row of a SignalStateTable.
+
+    Subclasses call _attach_state(table, row) before setting any state attribute.
+    """
+
+    green_phase = _column_property("green_phase", int)
+    is_yellow = _column_property("is_yellow", bool)
+    time_since_last_phase_change = _column_property("time_since_last_phase_change", int)
+    next_action_time = _column_property("next_action_time", float)
+    last_measure = _column_property("last_measure", float)
+    last_density = _column_property("last_density", float)
+    yellow_time = _column_property("yellow_time", int)
+    min_green = _column_property("min_green", int)
+
+    def _attach_state(self, table: Optional[SignalStateTable], row: int):
+        self._table = table if table is not None else SignalStateTable(1)
+        self._row = row
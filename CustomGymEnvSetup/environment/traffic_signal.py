@@ -1,18 +1,20 @@
 import os
 import sys
-from typing import Callable, List, Union, Tuple
+from typing import Callable, Dict, List, Optional, Union, Tuple
 
 
 if "SUMO_HOME" in os.environ:
     tools = os.path.join(os.environ["SUMO_HOME"], "tools")
-    sys.path.append(tools)
-else:
-    raise ImportError("Please declare the environment variable 'SUMO_HOME'")
+    if tools not in sys.path:
+        sys.path.append(tools)
 import numpy as np
+import traci.constants as tc
 from gymnasium import spaces
 
+from .signal_table import SignalStateTable, SignalStateView
 
-class TrafficSignal:
+
+class TrafficSignal(SignalStateView):
     """This class represents a Traffic Signal controlling an intersection.
 
     It is responsible for retrieving information and changing the traffic phase using the Traci API.
@@ -85,7 +87,10 @@ class TrafficSignal:
         max_green: int,
         begin_time: int,
         sumo,
+        state_table: Optional[SignalStateTable] = None,
+        state_row: int = 0,
     ):
+        self._attach_state(state_table, state_row)
         self.id = ts_id
         self.env = env
         self.delta_time = delta_time
@@ -124,7 +129,138 @@ class TrafficSignal:
         
         # self.observation_space = spaces.Box(low=np.array([25]), high=np.array([50]))
 
+        self._init_temporal_features()
+        self._init_occupancy_grid()
+
         self.action_space = spaces.Discrete(2)
+        if self.env.hold_durations:
+            # semi-MDP mode: each action is a (green phase, hold duration) pair
+            self.action_space = spaces.Discrete(self.num_green_phases * len(self.env.hold_durations))
+
+    def _init_temporal_features(self):
+        """Preallocates the observation history and the smoothed queues (see SumoEnvironment history_length/queue_ema_alpha).
+
+        The history of the last K densities and vehicle counts is a ring buffer stored twice in a (2K, 4) array:
+        every entry is written at rows i and i + K, so rows [i + 1, i + 1 + K) always hold the K last entries
+        from oldest to newest and the observation is a view of the buffer, without copy nor reordering.
+        """
+        self.history_length = self.env.history_length
+        self.queue_ema_alpha = self.env.queue_ema_alpha
+        observation_spaces = dict(self.observation_space.spaces)
+        if self.history_length:
+            k = self.history_length
+            self._density_history = np.zeros((2 * k, 4), dtype=np.float64)
+            self._nb_veh_history = np.zeros((2 * k, 4), dtype=np.int32)
+            self._history_index = k - 1  # row of the newest entry in the first half
+            observation_spaces["density_history"] = spaces.Box(low=0.0, high=20.0, shape=(k, 4), dtype=np.float64)
+            observation_spaces["nb_veh_history"] = spaces.Box(low=0, high=100, shape=(k, 4), dtype=np.int32)
+        if self.queue_ema_alpha is not None:
+            self._queue = np.zeros(len(self.lanes), dtype=np.float64)
+            self._approach_queue = np.zeros(4, dtype=np.float64)
+            self._queue_ema = np.zeros(4, dtype=np.float64)
+            observation_spaces["queue_ema"] = spaces.Box(low=0.0, high=100.0, shape=(4,), dtype=np.float64)
+        self.observation_space = spaces.Dict(observation_spaces)
+
+    def _update_temporal_features(self, observation: dict):
+        """Pushes the current densities/counts in the history and updates the smoothed queues, in place."""
+        if self.history_length:
+            k = self.history_length
+            i = self._history_index = (self._history_index + 1) % k
+            self._density_history[i] = self._density_history[i + k] = observation["density"]
+            self._nb_veh_history[i] = self._nb_veh_history[i + k] = observation["nb_veh"]
+            observation["density_history"] = self._density_history[i + 1 : i + 1 + k]
+            observation["nb_veh_history"] = self._nb_veh_history[i + 1 : i + 1 + k]
+        if self.queue_ema_alpha is not None:
+            for j, lane in enumerate(self.lanes):
+                self._queue[j] = self.sumo.lane.getLastStepHaltingNumber(lane)
+            queue = self._queue.reshape(-1, 2)  # lanes are paired by approach, like the vehicle counts
+            np.add(queue[:, 0], queue[:, 1], out=self._approach_queue)
+            self._approach_queue *= self.queue_ema_alpha
+            self._queue_ema *= 1.0 - self.queue_ema_alpha
+            self._queue_ema += self._approach_queue
+            observation["queue_ema"] = self._queue_ema
+
+    def _init_occupancy_grid(self):
+        """Prepares the cell occupancy/speed grid of the incoming lanes (see SumoEnvironment occupancy_grid).
+
+        The vehicles around the intersection come from a single context subscription on the junction (lane,
+        position and speed of every vehicle within reach), so the grid costs one TraCI exchange per decision
+        whatever the number of vehicles.
+        """
+        self.occupancy_grid = self.env.occupancy_grid
+        if self.occupancy_grid is None:
+            return
+        cell_length, grid_length = self.occupancy_grid
+        self.num_cells = int(np.ceil(grid_length / cell_length))
+        self._grid_lane_index = {lane: i for i, lane in enumerate(self.lanes)}
+        self._grid_lane_length = np.array([self.lanes_length[lane] for lane in self.lanes], dtype=np.float64)
+        self._grid_max_speed = np.array([self.sumo.lane.getMaxSpeed(lane) for lane in self.lanes], dtype=np.float64)
+        self._occupancy = np.zeros((len(self.lanes), self.num_cells), dtype=np.float32)
+        self._cell_speed = np.zeros((len(self.lanes), self.num_cells), dtype=np.float32)
+        self._cell_count = np.zeros((len(self.lanes), self.num_cells), dtype=np.float32)
+
+        junction = self.sumo.edge.getToJunction(self.sumo.lane.getEdgeID(self.lanes[0]))
+        self._grid_junction = junction
+        x, y = self.sumo.junction.getPosition(junction)
+        # reach every point of the grid: distance from the junction centre to the farthest cell start
+        self._grid_radius = max(
+            float(np.hypot(*np.subtract(self.sumo.lane.getShape(lane)[-1], (x, y)))) for lane in self.lanes
+        ) + grid_length
+        self._subscribe_grid(self.sumo.simulation.getTime())
+
+        observation_spaces = dict(self.observation_space.spaces)
+        observation_spaces["occupancy"] = spaces.Box(low=0.0, high=np.inf, shape=self._occupancy.shape, dtype=np.float32)
+        observation_spaces["speed"] = spaces.Box(low=0.0, high=np.inf, shape=self._cell_speed.shape, dtype=np.float32)
+        self.observation_space = spaces.Dict(observation_spaces)
+
+    def _subscribe_grid(self, time: float):
+        # Results are only needed at decision times: limiting the subscription to the next one avoids
+        # transferring the vehicles around the junction after every simulation step in between.
+        self.sumo.junction.subscribeContext(
+            self._grid_junction,
+            tc.CMD_GET_VEHICLE_VARIABLE,
+            self._grid_radius,
+            [tc.VAR_LANE_ID, tc.VAR_LANEPOSITION, tc.VAR_SPEED],
+            time,
+            time,
+        )
+
+    def get_occupancy_grid(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Returns the number of vehicles and their mean speed (relative to the lane speed limit) in each cell.
+
+        Cells are cell_length metres long and counted from the stop line, so column 0 is the cell in front of
+        the traffic light. The returned arrays are reused by the next call.
+        """
+        cell_length, grid_length = self.occupancy_grid
+        vehicles = self.sumo.junction.getContextSubscriptionResults(self._grid_junction) or {}
+        lane_index = self._grid_lane_index
+        n = len(vehicles)
+        lanes = np.fromiter((lane_index.get(v[tc.VAR_LANE_ID], -1) for v in vehicles.values()), np.int64, n)
+        positions = np.fromiter((v[tc.VAR_LANEPOSITION] for v in vehicles.values()), np.float64, n)
+        speeds = np.fromiter((v[tc.VAR_SPEED] for v in vehicles.values()), np.float64, n)
+
+        keep = lanes >= 0
+        lanes, positions, speeds = lanes[keep], positions[keep], speeds[keep]
+        distance = self._grid_lane_length[lanes] - positions
+        keep = distance < grid_length
+        lanes, cells = lanes[keep], (np.maximum(distance[keep], 0.0) // cell_length).astype(np.int64)
+        flat = lanes * self.num_cells + cells
+
+        self._cell_count.fill(0.0)
+        self._cell_speed.fill(0.0)
+        np.add.at(self._cell_count.reshape(-1), flat, 1.0)
+        np.add.at(self._cell_speed.reshape(-1), flat, speeds[keep] / self._grid_max_speed[lanes])
+        np.divide(self._cell_speed, self._cell_count, out=self._cell_speed, where=self._cell_count > 0)
+        self._occupancy[:] = self._cell_count
+        return self._occupancy, self._cell_speed
+
+    def decode_action(self, action: int) -> Tuple[int, int]:
+        """Returns the green phase and the hold duration (s) selected by an action."""
+        action = int(action)
+        if not self.env.hold_durations:
+            return action, self.delta_time
+        phase, duration = divmod(action, len(self.env.hold_durations))
+        return phase, self.env.hold_durations[duration]
 
     def _build_phases(self):
         phases = self.sumo.trafficlight.getAllProgramLogics(self.id)[0].phases
@@ -180,76 +316,59 @@ class TrafficSignal:
         logic.phases = self.all_phases
         self.sumo.trafficlight.setProgramLogic(self.id, logic)
         self.sumo.trafficlight.setRedYellowGreenState(self.id, self.all_phases[0].state)
+        self.env.signal_commands.record(self.id, self.all_phases[0].state)
 
     @property
     def time_to_act(self):
         """Returns True if the traffic signal should act in the current step."""
         return self.next_action_time == self.env.sim_step
     
-    def update(self):
+    def next_event_time(self) -> float:
+        """Returns the next simulation time at which the signal needs attention (end of yellow or next action)."""
+        if self.is_yellow:
+            yellow_end = self.env.sim_step + self.yellow_time - self.time_since_last_phase_change
+            return min(yellow_end, self.next_action_time)
+        return self.next_action_time
+
+    def update(self, elapsed: int = 1):
         """Updates the traffic signal state.
 
         If the traffic signal should act, it will set the next green phase and update the next action time.
+
+        Args:
+            elapsed (int): Seconds simulated since the last update (more than one in event-driven stepping,
+                which never jumps over the end of a yellow phase).
         """
-        self.time_since_last_phase_change += 1
-        if self.is_yellow and self.time_since_last_phase_change == self.yellow_time:
-            # self.sumo.trafficlight.setPhase(self.id, self.green_phase)
-            self.sumo.trafficlight.setRedYellowGreenState(self.id, self.green_phases[self.green_phase].state)
-            self.is_yellow = False
+        if self._table.update(elapsed, self._row):
+            self.env.signal_commands.set(self.id, self.green_phases[self.green_phase].state)
 
-    def set_next_phase(self, new_phase: int):
+    def set_next_phase(self, new_phase: int, duration: Optional[int] = None):
         """Sets what will be the next green phase and sets yellow phase if the next phase is different than the current.
 
+        The lights are queued in env.signal_commands and sent to SUMO before the next simulation step.
+
         Args:
             new_phase (int): Number between [0 ... num_green_phases]
+            duration (int): Seconds until the next action, delta_time by default.
         """
-        # print("++++++ INFOS ++++++")
-        # print(f"COUNTER : {self.time_since_last_phase_change} ")
-        # print(f"min_green + yellow : {self.yellow_time + self.min_green} ")
-        # print("")
-        # print("QQQQQQQQQQQQQQQQQQQQQQQQQ Green_phases ",self.green_phases[0].state)
-        # print("QQQQQQQQQQQQQQQQQQQQQQQQQ All_phases ",self.all_phases)
-        new_phase = int(new_phase)
-        # print("++++ Green Phase (2) : ", self.green_phase)
-        # print("++++ New phase (2) : ", self.new_phase)
-        if self.green_phase == new_phase or self.time_since_last_phase_change < self.yellow_time + self.min_green:
-            # print("++++++ SAME ++++++")
-            # print(f"Action : {new_phase} not perfomed")
-            # print("new phases ",new_phase)
-            # self.sumo.trafficlight.setPhase(self.id, self.green_phase)
-            self.sumo.trafficlight.setRedYellowGreenState(self.id, self.green_phases[self.green_phase].state)
-            self.next_action_time = self.env.sim_step + self.delta_time + self.yellow_time
+        if duration is None:
+            duration = self.delta_time
+        old_green = self.green_phase
+        if self._table.set_next_phase(self._row, int(new_phase), duration, self.env.sim_step):
+            # same phase, or min_green not reached yet: keep the green (the next action comes yellow_time later)
+            self.env.signal_commands.set(self.id, self.green_phases[self.green_phase].state)
         else:
-            # print("++++++ NOW SWITCH ++++++")
-            # self.sumo.trafficlight.setPhase(self.id, self.yellow_dict[(self.green_phase, new_phase)])  # turns yellow
-
-            # # we check if the current phase is the 'rrrrrrrrrrrr' phase
-            # # coz from this phase we don't want yellow before switching
-            # if self.green_phase == 0:
-            #     # print("++++++ DIFFERENT if zero ++++++")
-            #     # print("green phases ",self.green_phase)
-            #     # print("new phases ",new_phase)
-            #     self.green_phase = new_phase
-            #     # print("++++++ QQQQQQQ ++++++")
-            #     # print("green phases ",self.green_phase)
-            #     # print("new phases ",new_phase)
-            #     self.next_action_time = self.env.sim_step + self.delta_time
-            #     # self.is_yellow = True
-            #     self.time_since_last_phase_change = 0
-            # else:
-            #     print("++++++ DIFFERENT else++++++")
-            #     print("green phases ",self.green_phase)
-            #     print("new phases ",new_phase)
-            self.sumo.trafficlight.setRedYellowGreenState(
-                self.id, self.yellow_dict[self.green_phase]
-            )
-            self.green_phase = new_phase
-            self.next_action_time = self.env.sim_step + self.delta_time
-            self.is_yellow = True
-            self.time_since_last_phase_change = 0
-
-    def compute_observation(self):
-        """Computes the observation of the traffic signal."""
+            self.env.signal_commands.set(self.id, self.yellow_dict[old_green])
+        if self.occupancy_grid is not None:
+            self._subscribe_grid(self.next_action_time)
+
+    def compute_observation(self, out: Optional[Dict[str, np.ndarray]] = None):
+        """Computes the observation of the traffic signal.
+
+        Args:
+            out (Dict[str, np.ndarray]): Arrays to write the observation into (one per key of the observation
+                space), returned instead of new arrays.
+        """
         """Return the default observation."""
 
         phase_id = [1 if self.green_phase == i else 0 for i in range(1, self.num_green_phases+1)]  # one-hot encoding
@@ -258,12 +377,27 @@ class TrafficSignal:
         nb_veh = self.get_vehicles_count_per_lane()
         # observation = np.array(phase_id + min_green + density + veh_nb, dtype=np.float32)
         
-        observation = {
-            'density': np.array(density, dtype=np.float64),
-            'nb_veh': np.array(nb_veh, dtype=np.int32),
-            'phase': np.array(phase_id, dtype=np.int32)
-        }
-        
+        if out is None:
+            observation = {
+                'density': np.array(density, dtype=np.float64),
+                'nb_veh': np.array(nb_veh, dtype=np.int32),
+                'phase': np.array(phase_id, dtype=np.int32)
+            }
+        else:
+            observation = {'density': out['density'], 'nb_veh': out['nb_veh'], 'phase': out['phase']}
+            observation['density'][:] = density
+            observation['nb_veh'][:] = nb_veh
+            observation['phase'][:] = phase_id
+        self._update_temporal_features(observation)
+        if self.occupancy_grid is not None:
+            observation["occupancy"], observation["speed"] = self.get_occupancy_grid()
+
+        if out is not None:
+            # the temporal features and the grid are views of arrays kept by the traffic signal
+            for key, value in observation.items():
+                if value is not out[key]:
+                    np.copyto(out[key], value)
+            return out
         return observation
 
     # def get_lanes_density(self):
@@ -580,49 +714,36 @@ class TrafficSignal:
     
     
     def get_vehicle_metrics_on_lanes(self, lanes: List[str]) -> Tuple[float, float, float]:
-        """Calculates the total CO2 emission, total waiting time, and total fuel consumption of vehicles on specified lanes.
-        
+        """Updates the vehicles seen and halted on the specified lanes and the accumulated waiting time of the new ones.
+
+        The CO2 emission and fuel consumption are integrated at every simulation step by env.emissions
+        (see EmissionAccumulator); their episode totals are returned.
+
         Args:
             lanes (List[str]): List of lane IDs.
         
         Returns:
-            Tuple[float, float, float]: Total CO2 emission, total waiting time, and total fuel consumption of vehicles on specified lanes.
+            Tuple[float, float, float]: Total CO2 emission (mg), accumulated waiting time of the vehicles seen for the first time, and total fuel consumption (mg).
         """
-        total_co2_emission = 0.0  # Initialize total CO2 emission to 0
         total_waiting_time = 0.0  # Initialize total waiting time to 0
-        total_fuel_consumption = 0.0  # Initialize total fuel consumption to 0
-        seen_vehicles = set()  # Set to store seen vehicles
         
         for lane in lanes:
             veh_list = self.sumo.lane.getLastStepVehicleIDs(lane)  # Get list of vehicles on lane
             for veh in veh_list:
                 if veh not in self.env.seen_vehicles:  # Check if vehicle has not been seen before
-                    co2_emission = self.sumo.vehicle.getCO2Emission(veh)  # Get CO2 emission of vehicle
                     waiting_time = self.sumo.vehicle.getAccumulatedWaitingTime(veh)  # Get waiting time of vehicle
-                    fuel_consumption = self.sumo.vehicle.getFuelConsumption(veh)  # Get fuel consumption of vehicle
-                    total_co2_emission += co2_emission  # Add CO2 emission to total
                     total_waiting_time += waiting_time  # Add waiting time to total
-                    total_fuel_consumption += fuel_consumption  # Add fuel consumption to total
                     self.env.seen_vehicles.add(veh)  # Add vehicle to set of seen vehicles
                     
-                    # Filter out only the halted vehicles
-                    # if self.sumo.vehicle.getSpeed(veh) < 0.1:  # vehicle is halted
-                    #     self.env.halted_vehicles.add(veh)
-                    
-            # Get the list of vehicles halted on this lane
-            halted_vehicle_count = self.sumo.lane.getLastStepHaltingNumber(lane)      
-            # Get the list of vehicle IDs on this lane
-            vehicle_ids = self.sumo.lane.getLastStepVehicleIDs(lane)            
             # Filter out only the halted vehicles
-            for vehicle_id in vehicle_ids:
+            for vehicle_id in veh_list:
                 if self.sumo.vehicle.getSpeed(vehicle_id) < 0.1:  # vehicle is halted
                     self.env.halted_vehicles.add(vehicle_id)
                     
-        self.env.total_fuel_consumption += total_fuel_consumption
-        self.env.total_co2_emission += total_co2_emission
+        self.env.total_co2_emission, self.env.total_fuel_consumption = self.env.emissions.total()
         self.env.total_waiting_time += total_waiting_time
         
-        return total_co2_emission, total_waiting_time, total_fuel_consumption
+        return self.env.total_co2_emission, total_waiting_time, self.env.total_fuel_consumption
 
 
     def get_average_speed(self) -> float:
@@ -0,0 +1,3 @@
+"""Fast NumPy surrogate of the single intersection for pre-training and hyperparameter search."""
+
+from CustomGymEnvSetup.surrogate.model import SurrogateEnvironment, SurrogateIntersections
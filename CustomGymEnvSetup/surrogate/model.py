@@ -0,0 +1,298 @@
+"""NumPy queue model of the single intersection, a fast stand-in for SUMO during pre-training.
+
+Each approach (two lanes, in the TrafficSignal order north, east, south, west) is a point queue:
+
+- vehicles are generated by Poisson processes whose rates come from a DemandTable, e.g. fitted to the trip
+  file of the real scenario (demand.read_trips); like SUMO, a vehicle that finds its lanes full waits
+  outside the network until there is room;
+- a vehicle reaches the stop line ``travel_time`` seconds after entering the approach, then queues;
+- an approach that has green discharges its queue at its saturation flow, ``lost_time`` seconds after the
+  green started; yellow discharges nothing;
+- the waiting time of the approach grows by its queue length every second (vehicles leaving take away
+  their share of it).
+
+The signal follows the rules of TrafficSignal.set_next_phase and update: the same yellow_time, min_green
+and keep/switch decision times (keeping a phase lasts delta_time + yellow_time seconds), the same initial
+state (phase 1 selected while the network starts with the north/south green) and the same observation
+(density, nb_veh and the one-hot 'phase') and reward (decrease of the mean approach density).
+
+The state of ``num_envs`` independent intersections is held in arrays of shape (num_envs, ...) and every
+simulated second is a few array operations over all of them.
+"""
+
+from typing import Optional, Sequence, Union
+
+import gymnasium as gym
+import numpy as np
+from gymnasium import spaces
+
+from CustomGymEnvSetup.demand.generator import APPROACHES, DemandTable
+
+
+# TrafficSignal approach order, and the approaches served by each green phase
+APPROACH_ORDER = ("n", "e", "s", "w")
+PHASE_APPROACHES = np.array([[1, 0, 1, 0], [0, 1, 0, 1]], dtype=bool)
+MIN_GAP = 2.5  # TrafficSignal.MIN_GAP
+
+
+def observation_space() -> spaces.Dict:
+    """Observation space of TrafficSignal (default features)."""
+    return spaces.Dict({
+        "density": spaces.Box(low=np.zeros(4), high=np.full(4, 20.0), shape=(4,), dtype=np.float64),
+        "nb_veh": spaces.Box(low=np.zeros(4), high=np.full(4, 100), shape=(4,), dtype=np.int32),
+        "phase": spaces.Box(low=np.zeros(2), high=np.ones(2), shape=(2,), dtype=np.int32),
+    })
+
+
+class SurrogateIntersections:
+    """Queue model of num_envs copies of the intersection, advanced together.
+
+    Args:
+        demand (DemandTable): Arrival rates per approach over time (repeated past its end).
+        num_envs (int): Number of intersections.
+        delta_time (int): Seconds between two actions.
+        yellow_time (int): Duration of the yellow phase.
+        min_green (int): Minimum green time before a switch is accepted.
+        num_seconds (int): Length of an episode.
+        saturation_flow (float or Sequence[float]): Discharge rate of a green lane (veh/s), per approach or shared.
+        lanes (int): Lanes per approach.
+        lane_length (float): Length of the approach lanes (m).
+        vehicle_length (float): Length of the vehicles (m), used for the capacity and the density.
+        travel_time (int): Seconds from the entry of the approach to the stop line.
+        lost_time (int): Seconds of green before the queue starts to discharge.
+        demand_scale (float or np.ndarray): Multiplier of the arrival rates, per intersection or shared.
+        seed (int): Seed of the arrivals.
+    """
+
+    def __init__(
+        self,
+        demand: DemandTable,
+        num_envs: int = 1,
+        delta_time: int = 5,
+        yellow_time: int = 2,
+        min_green: int = 5,
+        num_seconds: int = 3600,
+        saturation_flow: Union[float, Sequence[float]] = 0.5,
+        lanes: int = 2,
+        lane_length: float = 139.6,
+        vehicle_length: float = 5.0,
+        travel_time: int = 10,
+        lost_time: int = 2,
+        demand_scale: Union[float, np.ndarray] = 1.0,
+        seed: Optional[int] = None,
+    ):
+        assert delta_time > yellow_time, "Time between actions must be at least greater than yellow time."
+        self.num_envs = num_envs
+        self.delta_time = delta_time
+        self.yellow_time = yellow_time
+        self.min_green = min_green
+        self.num_seconds = num_seconds
+        self.travel_time = travel_time
+        self.lost_time = lost_time
+        self.lane_capacity = lane_length / (MIN_GAP + vehicle_length)
+        self.capacity = int(lanes * self.lane_capacity)
+        self.discharge = np.broadcast_to(np.asarray(saturation_flow, dtype=np.float64) * lanes, (4,)).copy()
+        self.demand_scale = np.broadcast_to(np.asarray(demand_scale, dtype=np.float64), (num_envs,)).copy()
+        _, rates = demand.rates(1.0)
+        # expected arrivals per second, columns in APPROACH_ORDER
+        self.rates = rates[:, [APPROACHES.index(a) for a in APPROACH_ORDER]]
+        self.rng = np.random.default_rng(seed)
+
+        n = num_envs
+        self.time = np.zeros(n, dtype=np.int64)
+        self.green_phase = np.ones(n, dtype=np.int64)
+        self.served_phase = np.zeros(n, dtype=np.int64)  # phase actually shown, see _build_phases
+        self.is_yellow = np.zeros(n, dtype=bool)
+        self.time_since_last_phase_change = np.zeros(n, dtype=np.int64)
+        self.green_time = np.zeros(n, dtype=np.int64)
+        self.next_action_time = np.zeros(n, dtype=np.int64)
+        self.last_density = np.zeros(n)
+
+        self.backlog = np.zeros((n, 4), dtype=np.int64)
+        self.transit = np.zeros((n, 4, travel_time), dtype=np.int64)  # ring buffer indexed by time % travel_time
+        self.in_transit = np.zeros((n, 4), dtype=np.int64)
+        self.queue = np.zeros((n, 4), dtype=np.int64)
+        self.credit = np.zeros((n, 4))
+        self.waiting_time = np.zeros((n, 4))
+        self.vehicles_passed = np.zeros(n, dtype=np.int64)
+        self.vehicles_stopped = np.zeros(n, dtype=np.int64)
+
+    def reset(self, envs: Optional[np.ndarray] = None):
+        """Starts new episodes for the given intersections (all by default)."""
+        envs = slice(None) if envs is None else envs
+        self.time[envs] = 0
+        self.green_phase[envs] = 1
+        self.served_phase[envs] = 0
+        self.is_yellow[envs] = False
+        self.time_since_last_phase_change[envs] = 0
+        self.green_time[envs] = 0
+        self.next_action_time[envs] = 0
+        self.last_density[envs] = 0.0
+        for array in (self.backlog, self.transit, self.in_transit, self.queue, self.credit, self.waiting_time,
+                      self.vehicles_passed, self.vehicles_stopped):
+            array[envs] = 0
+
+    def set_next_phase(self, new_phase: np.ndarray, duration: Optional[np.ndarray] = None):
+        """TrafficSignal.set_next_phase for all intersections (all of them must be at their action time)."""
+        duration = self.delta_time if duration is None else duration
+        new_phase = np.asarray(new_phase, dtype=np.int64)
+        keep = (new_phase == self.green_phase) | (self.time_since_last_phase_change < self.yellow_time + self.min_green)
+        restarted = keep & (self.served_phase != self.green_phase)
+        self.served_phase[keep] = self.green_phase[keep]
+        self.green_time[restarted] = 0
+        self.credit[restarted] = 0.0
+        switch = ~keep
+        self.is_yellow |= switch
+        self.green_phase = np.where(switch, new_phase, self.green_phase)
+        self.time_since_last_phase_change[switch] = 0
+        self.next_action_time = self.time + duration + np.where(keep, self.yellow_time, 0)
+
+    def advance(self):
+        """Simulates every intersection up to its next action time."""
+        while True:
+            running = np.flatnonzero(self.time < self.next_action_time)
+            if len(running) == 0:
+                return
+            self._tick(running if len(running) < self.num_envs else slice(None))
+
+    def _tick(self, envs):
+        """One simulated second for the given intersections."""
+        time = self.time[envs]
+        rates = self.rates[time % len(self.rates)] * self.demand_scale[envs, None]
+        backlog = self.backlog[envs] + self.rng.poisson(rates)
+        queue = self.queue[envs]
+        in_transit = self.in_transit[envs]
+
+        entering = np.minimum(backlog, np.maximum(self.capacity - queue - in_transit, 0))
+        backlog -= entering
+        rows = np.arange(len(time))
+        slot = time % self.travel_time
+        transit = self.transit[envs]
+        reaching = transit[rows, :, slot]
+        transit[rows, :, slot] = entering
+        in_transit = in_transit + entering - reaching
+        queue = queue + reaching
+
+        served = PHASE_APPROACHES[self.served_phase[envs]] & ~self.is_yellow[envs, None]
+        served &= (self.green_time[envs] >= self.lost_time)[:, None]
+        credit = np.where(served, self.credit[envs] + self.discharge, 0.0)
+        leaving = np.minimum(queue, np.floor(credit).astype(np.int64))
+        credit -= leaving
+        waiting_time = self.waiting_time[envs]
+        waiting_time *= 1.0 - np.divide(leaving, queue, out=np.zeros(queue.shape), where=queue > 0)
+        queue -= leaving
+        waiting_time += queue
+
+        self.backlog[envs] = backlog
+        self.transit[envs] = transit
+        self.in_transit[envs] = in_transit
+        self.queue[envs] = queue
+        self.credit[envs] = credit
+        self.waiting_time[envs] = waiting_time
+        self.vehicles_passed[envs] += entering.sum(axis=1)
+        # vehicles that reached the stop line behind a queue they could not clear
+        self.vehicles_stopped[envs] += np.minimum(reaching, queue).sum(axis=1)
+
+        # TrafficSignal.update
+        self.time[envs] = time + 1
+        self.time_since_last_phase_change[envs] += 1
+        self.green_time[envs] += 1
+        yellow_over = np.zeros(self.num_envs, dtype=bool)
+        yellow_over[envs] = self.is_yellow[envs] & (self.time_since_last_phase_change[envs] >= self.yellow_time)
+        self.is_yellow[yellow_over] = False
+        self.served_phase[yellow_over] = self.green_phase[yellow_over]
+        self.green_time[yellow_over] = 0
+        self.credit[yellow_over] = 0.0
+
+    @property
+    def vehicles(self) -> np.ndarray:
+        """Vehicles on each approach, shape (num_envs, 4)."""
+        return self.queue + self.in_transit
+
+    def density(self) -> np.ndarray:
+        return np.minimum(self.vehicles / (self.capacity + 0.0), 1.0)
+
+    def compute_observation(self) -> dict:
+        """Observations of all intersections, arrays with a leading num_envs dimension."""
+        phase = np.zeros((self.num_envs, 2), dtype=np.int32)
+        phase[:, 0] = self.green_phase == 1  # one-hot of TrafficSignal.compute_observation
+        return {"density": self.density(), "nb_veh": self.vehicles.astype(np.int32), "phase": phase}
+
+    def compute_reward(self) -> np.ndarray:
+        """Decrease of the mean approach density since the last reward (TrafficSignal.custom_reward)."""
+        density = self.density().mean(axis=1)
+        reward = self.last_density - density
+        self.last_density = density
+        return reward
+
+    def compute_info(self) -> dict:
+        return {
+            "step": self.time.astype(np.float64),
+            "agent_total_vehicles_passed": self.vehicles_passed,
+            "agent_total_stopped": self.vehicles_stopped,
+            "queue": self.queue.sum(axis=1),
+            "waiting_time": self.waiting_time.sum(axis=1),
+        }
+
+
+class SurrogateEnvironment(gym.Env):
+    """Single intersection surrogate with the observation, action and reward of SumoEnvironment.
+
+    Args:
+        demand (DemandTable): Arrival rates, see demand.read_trips.
+        num_seconds (int): Length of an episode.
+        delta_time (int): Seconds between two actions.
+        yellow_time (int): Duration of the yellow phase.
+        min_green (int): Minimum green time before a switch is accepted.
+        **kwargs: Traffic parameters of SurrogateIntersections.
+    """
+
+    def __init__(
+        self,
+        demand: DemandTable,
+        num_seconds: int = 3600,
+        delta_time: int = 5,
+        yellow_time: int = 2,
+        min_green: int = 5,
+        **kwargs,
+    ):
+        self.model = SurrogateIntersections(
+            demand, 1, delta_time, yellow_time, min_green, num_seconds, **kwargs
+        )
+        self.observation_space = observation_space()
+        self.action_space = spaces.Discrete(2)
+
+    @classmethod
+    def from_trips(cls, path: str, interval: float = 300.0, **kwargs):
+        """Surrogate whose arrival rates are fitted to a SUMO trip/route file."""
+        from CustomGymEnvSetup.demand.generator import read_trips
+
+        return cls(read_trips(path, interval), **kwargs)
+
+    @property
+    def sim_step(self) -> float:
+        return float(self.model.time[0])
+
+    def reset(self, seed: Optional[int] = None, **kwargs):
+        super().reset(seed=seed, **kwargs)
+        if seed is not None:
+            self.model.rng = np.random.default_rng(seed)
+        self.model.reset()
+        return self._observation(), self._info()
+
+    def step(self, action: int):
+        self.model.set_next_phase(np.array([action]))
+        self.model.advance()
+        reward = float(self.model.compute_reward()[0])
+        truncated = self.sim_step >= self.model.num_seconds
+        return self._observation(), reward, False, truncated, self._info()
+
+    def _observation(self) -> dict:
+        return {key: value[0] for key, value in self.model.compute_observation().items()}
+
+    def _info(self) -> dict:
+        info = {key: value[0] for key, value in self.model.compute_info().items()}
+        info["step"] = float(info["step"])
+        info["agent_total_vehicles_passed"] = [int(info["agent_total_vehicles_passed"])]
+        info["agent_total_stopped"] = [int(info["agent_total_stopped"])]
+        return info
@@ -0,0 +1,112 @@
+"""stable-baselines3 VecEnv running thousands of surrogate intersections in one process.
+
+The whole batch is a single SurrogateIntersections: one step() applies all the actions and advances every
+intersection to its next decision with array operations, and observations and rewards come out as arrays
+of shape (num_envs, ...). Finished episodes are reset in place like in the SB3 vector envs (the last
+observation is in info["terminal_observation"]). Wrap it with VecMonitor for episode statistics.
+
+Example:
+    from stable_baselines3 import PPO
+    from stable_baselines3.common.vec_env import VecMonitor
+
+    env = VecMonitor(SurrogateVecEnv(read_trips("network_trainning/osm-17h-18h-real-scenario.passenger.trips.xml"), 1024))
+    PPO("MultiInputPolicy", env, n_steps=32, batch_size=8192).learn(10_000_000)
+"""
+
+from typing import Any, Callable, List, Optional, Sequence
+
+import numpy as np
+from gymnasium import spaces
+from stable_baselines3.common.vec_env.base_vec_env import VecEnv
+
+from CustomGymEnvSetup.demand.generator import DemandTable
+from CustomGymEnvSetup.surrogate.model import SurrogateIntersections, observation_space
+
+
+class SurrogateVecEnv(VecEnv):
+    """num_envs surrogate intersections behind the SB3 VecEnv API.
+
+    Args:
+        demand (DemandTable): Arrival rates, see demand.read_trips.
+        num_envs (int): Number of intersections.
+        reward_fn (Callable): Computes the rewards of all intersections from the SurrogateIntersections
+            after a step, shape (num_envs,). The density decrease of SumoEnvironment by default.
+        seed (int): Seed of the arrivals.
+        **kwargs: Other SurrogateIntersections arguments (num_seconds, delta_time, demand_scale, ...).
+    """
+
+    def __init__(
+        self,
+        demand: DemandTable,
+        num_envs: int,
+        reward_fn: Optional[Callable[[SurrogateIntersections], np.ndarray]] = None,
+        seed: Optional[int] = None,
+        **kwargs,
+    ):
+        self.model = SurrogateIntersections(demand, num_envs, seed=seed, **kwargs)
+        self.reward_fn = reward_fn if reward_fn is not None else SurrogateIntersections.compute_reward
+        self._actions = np.zeros(num_envs, dtype=np.int64)
+        super().__init__(num_envs, observation_space(), spaces.Discrete(2))
+
+    def reset(self):
+        self.model.reset()
+        return self.model.compute_observation()
+
+    def step_async(self, actions: np.ndarray):
+        self._actions = np.asarray(actions, dtype=np.int64).reshape(self.num_envs)
+
+    def step_wait(self):
+        model = self.model
+        model.set_next_phase(self._actions)
+        model.advance()
+        rewards = np.asarray(self.reward_fn(model), dtype=np.float32)
+        observations = model.compute_observation()
+        dones = model.time >= model.num_seconds
+
+        infos: List[dict] = [{} for _ in range(self.num_envs)]
+        done = np.flatnonzero(dones)
+        if len(done):
+            terminal = {key: value[done] for key, value in observations.items()}
+            for j, i in enumerate(done.tolist()):
+                infos[i]["terminal_observation"] = {key: value[j] for key, value in terminal.items()}
+                infos[i]["TimeLimit.truncated"] = True
+            model.reset(done)
+            for key, value in model.compute_observation().items():
+                observations[key][done] = value[done]
+        return observations, rewards, dones, infos
+
+    def seed(self, seed: Optional[int] = None) -> List[Optional[int]]:
+        self.model.rng = np.random.default_rng(seed)
+        return [seed] * self.num_envs
+
+    def close(self):
+        pass
+
+    def _indices(self, indices) -> List[int]:
+        if indices is None:
+            return list(range(self.num_envs))
+        if isinstance(indices, int):
+            return [indices]
+        return list(indices)
+
+    def get_attr(self, attr_name: str, indices=None) -> List[Any]:
+        """Per-intersection values of a SurrogateIntersections attribute (shared values are repeated)."""
+        value = getattr(self.model, attr_name)
+        per_env = isinstance(value, np.ndarray) and value.ndim > 0 and len(value) == self.num_envs
+        return [value[i] if per_env else value for i in self._indices(indices)]
+
+    def set_attr(self, attr_name: str, value: Any, indices=None):
+        current = getattr(self.model, attr_name)
+        if isinstance(current, np.ndarray) and current.ndim > 0 and len(current) == self.num_envs:
+            current[self._indices(indices)] = value
+        else:
+            setattr(self.model, attr_name, value)
+
+    def env_method(self, method_name: str, *method_args, indices=None, **method_kwargs) -> List[Any]:
+        raise NotImplementedError("The surrogate intersections have no per-environment objects")
+
+    def env_is_wrapped(self, wrapper_class, indices=None) -> List[bool]:
+        return [False] * len(self._indices(indices))
+
+    def get_images(self) -> Sequence[Optional[np.ndarray]]:
+        return [None] * self.num_envs
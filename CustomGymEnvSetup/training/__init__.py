@@ -0,0 +1,5 @@
+"""Parallel training of the traffic light policy (actor processes sharing a replay buffer with a learner)."""
+
+from CustomGymEnvSetup.training.replay import SharedReplayBuffer, SharedWeights
+from CustomGymEnvSetup.training.distributed import DQNLearner, q_values, run_actor, train, unflatten
+from CustomGymEnvSetup.training.seeding import DeterministicSeeding, episode_seed
@@ -0,0 +1,4 @@
+from CustomGymEnvSetup.training.distributed import get_options, main
+
+
+main(get_options())
@@ -0,0 +1,389 @@
+"""Off-policy (DQN) training with SUMO actor processes and a learner sharing a replay buffer.
+
+With the notebook setup (``train_freq=1``) simulation and gradient steps take turns in one process. Here
+``num_actors`` processes each run their own SumoEnvironment at full speed and append their transitions to a
+SharedReplayBuffer, while the learner (the main process) samples batches from it and trains at its own pace.
+Every ``broadcast_interval`` updates the learner publishes the online network weights in shared memory;
+the actors pick them up between two decisions and act epsilon-greedily with a NumPy forward pass, so torch
+is only needed by the learner.
+
+Each actor explores with its own epsilon (epsilon ** (1 + 7 * i / (num_actors - 1)), as in Ape-X), so the
+buffer mixes exploratory and nearly greedy experience.
+
+Example:
+    python -m CustomGymEnvSetup.training network_trainning/single-intersection-real-scenario.sumocfg \
+        --actors 4 --transitions 200000 -o Training/dqn_distributed.pt
+"""
+
+import argparse
+import copy
+import multiprocessing as mp
+import queue
+import time
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from gymnasium import spaces
+
+from CustomGymEnvSetup.training.replay import SharedReplayBuffer, SharedWeights
+
+
+def layer_sizes(obs_dim: int, hidden: Sequence[int], n_actions: int) -> List[int]:
+    return [obs_dim, *hidden, n_actions]
+
+
+def num_parameters(sizes: Sequence[int]) -> int:
+    return sum(n_in * n_out + n_out for n_in, n_out in zip(sizes[:-1], sizes[1:]))
+
+
+def unflatten(flat: np.ndarray, sizes: Sequence[int]) -> List[Tuple[np.ndarray, np.ndarray]]:
+    """Views (W of shape (in, out), b) of each layer of a flat parameter vector."""
+    layers, offset = [], 0
+    for n_in, n_out in zip(sizes[:-1], sizes[1:]):
+        weight = flat[offset : offset + n_in * n_out].reshape(n_in, n_out)
+        offset += n_in * n_out
+        layers.append((weight, flat[offset : offset + n_out]))
+        offset += n_out
+    return layers
+
+
+def q_values(layers: Sequence[Tuple[np.ndarray, np.ndarray]], obs: np.ndarray) -> np.ndarray:
+    """Forward pass of the Q-network (ReLU MLP) in NumPy."""
+    x = obs
+    for weight, bias in layers[:-1]:
+        x = np.maximum(x @ weight + bias, 0.0)
+    weight, bias = layers[-1]
+    return x @ weight + bias
+
+
+def actor_epsilons(num_actors: int, epsilon: float = 0.4, alpha: float = 7.0) -> List[float]:
+    if num_actors == 1:
+        return [epsilon]
+    return [epsilon ** (1 + alpha * i / (num_actors - 1)) for i in range(num_actors)]
+
+
+def run_actor(
+    actor_id: int,
+    env_kwargs: dict,
+    replay_spec: dict,
+    weights_spec: dict,
+    sizes: Sequence[int],
+    epsilon: float,
+    stop,
+    episodes,
+    flush_every: int = 32,
+    seed: int = 0,
+):
+    """Actor process: steps its own SumoEnvironment and feeds the shared replay buffer until stop is set.
+
+    Args:
+        actor_id (int): Index of the actor (used for its seeds and csv name).
+        env_kwargs (dict): SumoEnvironment arguments.
+        replay_spec (dict): SharedReplayBuffer.spec() of the buffer to fill.
+        weights_spec (dict): SharedWeights.spec() of the broadcast weights.
+        sizes (Sequence[int]): Layer sizes of the Q-network.
+        epsilon (float): Probability of a random action.
+        stop (mp.Event): Set by the learner at the end of training.
+        episodes (mp.Queue): Receives (actor_id, episode return) at the end of each episode.
+        flush_every (int): Transitions kept locally before being appended to the buffer.
+        seed (int): Base seed.
+    """
+    from CustomGymEnvSetup.environment.env import SumoEnvironment
+
+    env_kwargs = dict(env_kwargs)
+    if env_kwargs.get("out_csv_name"):
+        env_kwargs["out_csv_name"] = f"{env_kwargs['out_csv_name']}_actor{actor_id}"
+    env = SumoEnvironment(**env_kwargs)
+    replay = SharedReplayBuffer(**replay_spec)
+    weights = SharedWeights(**weights_spec)
+    flat = np.zeros(weights.size, dtype=np.float32)
+    layers = unflatten(flat, sizes)
+    version = -1
+    rng = np.random.default_rng(seed + actor_id)
+
+    obs_dim = sizes[0]
+    batch_obs = np.zeros((flush_every, obs_dim), dtype=np.float32)
+    batch_next = np.zeros((flush_every, obs_dim), dtype=np.float32)
+    batch_action = np.zeros(flush_every, dtype=np.int64)
+    batch_reward = np.zeros(flush_every, dtype=np.float32)
+    batch_discount = np.zeros(flush_every, dtype=np.float32)
+    pending = 0
+
+    episode = 0
+    try:
+        while not stop.is_set():
+            obs, _ = env.reset(seed=seed + 1000 * actor_id + episode)
+            obs_space = env.observation_space
+            obs = spaces.flatten(obs_space, obs)
+            episode_return, done = 0.0, False
+            while not done and not stop.is_set():
+                if weights.version != version:
+                    version = weights.read(flat)
+                if rng.random() < epsilon:
+                    action = int(rng.integers(env.action_space.n))
+                else:
+                    action = int(np.argmax(q_values(layers, obs)))
+                next_obs, reward, terminated, truncated, info = env.step(action)
+                next_obs = spaces.flatten(obs_space, next_obs)
+                done = terminated or truncated
+
+                batch_obs[pending] = obs
+                batch_next[pending] = next_obs
+                batch_action[pending] = action
+                batch_reward[pending] = reward
+                batch_discount[pending] = 0.0 if terminated else info.get("discount", env.gamma)
+                pending += 1
+                if pending == flush_every:
+                    replay.add_batch(batch_obs, batch_action, batch_reward, batch_next, batch_discount)
+                    pending = 0
+                episode_return += reward
+                obs = next_obs
+            if done:
+                episodes.put((actor_id, episode_return))
+            episode += 1
+    finally:
+        env.close()
+        replay.close()
+        weights.close()
+
+
+class DQNLearner:
+    """Double DQN updates of an MLP Q-network (torch), with a target network.
+
+    Args:
+        sizes (Sequence[int]): Layer sizes, observation size first and number of actions last.
+        learning_rate (float): Adam learning rate.
+        target_update_interval (int): Updates between two copies of the online network into the target network.
+        max_grad_norm (float): Gradient clipping.
+        device (str): Torch device.
+    """
+
+    def __init__(
+        self,
+        sizes: Sequence[int],
+        learning_rate: float = 1e-3,
+        target_update_interval: int = 500,
+        max_grad_norm: float = 10.0,
+        device: str = "cpu",
+    ):
+        import torch
+        from torch import nn
+
+        self.torch = torch
+        self.sizes = list(sizes)
+        self.device = torch.device(device)
+        layers = []
+        for i, (n_in, n_out) in enumerate(zip(self.sizes[:-1], self.sizes[1:])):
+            layers.append(nn.Linear(n_in, n_out))
+            if i < len(self.sizes) - 2:
+                layers.append(nn.ReLU())
+        self.q_net = nn.Sequential(*layers).to(self.device)
+        self.q_target = copy.deepcopy(self.q_net)
+        self.optimizer = torch.optim.Adam(self.q_net.parameters(), lr=learning_rate)
+        self.target_update_interval = target_update_interval
+        self.max_grad_norm = max_grad_norm
+        self.updates = 0
+
+    def update(self, batch: Dict[str, np.ndarray]) -> float:
+        torch = self.torch
+        obs = torch.as_tensor(batch["obs"], device=self.device)
+        next_obs = torch.as_tensor(batch["next_obs"], device=self.device)
+        action = torch.as_tensor(batch["action"], device=self.device)
+        reward = torch.as_tensor(batch["reward"], device=self.device)
+        discount = torch.as_tensor(batch["discount"], device=self.device)
+        with torch.no_grad():
+            next_action = self.q_net(next_obs).argmax(dim=1, keepdim=True)
+            next_q = self.q_target(next_obs).gather(1, next_action).squeeze(1)
+            target = reward + discount * next_q
+        q = self.q_net(obs).gather(1, action.unsqueeze(1)).squeeze(1)
+        loss = torch.nn.functional.smooth_l1_loss(q, target)
+        self.optimizer.zero_grad()
+        loss.backward()
+        torch.nn.utils.clip_grad_norm_(self.q_net.parameters(), self.max_grad_norm)
+        self.optimizer.step()
+        self.updates += 1
+        if self.updates % self.target_update_interval == 0:
+            self.q_target.load_state_dict(self.q_net.state_dict())
+        return float(loss)
+
+    def flat_weights(self) -> np.ndarray:
+        """Online network parameters in the layout of unflatten (weights transposed to (in, out))."""
+        parts = []
+        for layer in self.q_net:
+            if hasattr(layer, "weight"):
+                parts.append(layer.weight.detach().cpu().numpy().T.ravel())
+                parts.append(layer.bias.detach().cpu().numpy())
+        return np.concatenate(parts).astype(np.float32)
+
+    def save(self, path: str):
+        self.torch.save({"sizes": self.sizes, "state_dict": self.q_net.state_dict(), "updates": self.updates}, path)
+
+
+def env_dimensions(env_kwargs: dict) -> Tuple[int, int]:
+    """Flattened observation size and number of actions of the environment (starts SUMO once)."""
+    from CustomGymEnvSetup.environment.env import SumoEnvironment
+
+    env = SumoEnvironment(**{**env_kwargs, "out_csv_name": None})
+    env.reset()
+    dims = spaces.flatdim(env.observation_space), int(env.action_space.n)
+    env.close()
+    return dims
+
+
+def train(
+    env_kwargs: dict,
+    num_actors: int = 4,
+    total_transitions: int = 100000,
+    hidden: Sequence[int] = (64, 64),
+    buffer_size: int = 100000,
+    batch_size: int = 64,
+    learning_starts: int = 1000,
+    broadcast_interval: int = 50,
+    replay_ratio: Optional[float] = None,
+    epsilon: float = 0.4,
+    learning_rate: float = 1e-3,
+    target_update_interval: int = 500,
+    seed: int = 0,
+    device: str = "cpu",
+    log_interval: float = 10.0,
+) -> DQNLearner:
+    """Trains a DQN policy with num_actors SUMO actor processes feeding a shared replay buffer.
+
+    Args:
+        env_kwargs (dict): SumoEnvironment arguments used by every actor.
+        num_actors (int): Number of actor processes.
+        total_transitions (int): Training stops once the actors collected this many transitions.
+        hidden (Sequence[int]): Hidden layer sizes of the Q-network.
+        buffer_size (int): Replay buffer capacity.
+        batch_size (int): Transitions per gradient step.
+        learning_starts (int): Transitions collected before the first gradient step.
+        broadcast_interval (int): Gradient steps between two weight broadcasts to the actors.
+        replay_ratio (float): Maximum sampled/collected transitions ratio; the learner waits for the actors
+            when it is reached. None lets the learner run freely.
+        epsilon (float): Exploration of the most exploratory actor (see actor_epsilons).
+        learning_rate (float): Adam learning rate.
+        target_update_interval (int): Gradient steps between two target network updates.
+        seed (int): Base seed of the actors and of the sampling.
+        device (str): Torch device of the learner.
+        log_interval (float): Seconds between two progress lines.
+
+    Returns:
+        DQNLearner: The trained learner.
+    """
+    obs_dim, n_actions = env_dimensions(env_kwargs)
+    sizes = layer_sizes(obs_dim, hidden, n_actions)
+    learner = DQNLearner(sizes, learning_rate, target_update_interval, device=device)
+
+    ctx = mp.get_context("spawn")
+    replay = SharedReplayBuffer(buffer_size, obs_dim, ctx.Lock())
+    weights = SharedWeights(num_parameters(sizes))
+    weights.publish(learner.flat_weights())
+    stop = ctx.Event()
+    episodes = ctx.Queue()
+    actors = [
+        ctx.Process(
+            target=run_actor,
+            args=(i, env_kwargs, replay.spec(), weights.spec(), sizes, eps, stop, episodes),
+            kwargs={"seed": seed},
+            daemon=True,
+        )
+        for i, eps in enumerate(actor_epsilons(num_actors, epsilon))
+    ]
+    for actor in actors:
+        actor.start()
+
+    rng = np.random.default_rng(seed)
+    start = last_log = time.perf_counter()
+    returns: List[float] = []
+    loss = float("nan")
+    try:
+        while replay.written < total_transitions:
+            if not any(actor.is_alive() for actor in actors):
+                raise RuntimeError("All actor processes exited")
+            written = replay.written
+            if written < max(learning_starts, batch_size) or (
+                replay_ratio is not None and (learner.updates + 1) * batch_size > replay_ratio * written
+            ):
+                time.sleep(0.01)
+            else:
+                loss = learner.update(replay.sample(batch_size, rng))
+                if learner.updates % broadcast_interval == 0:
+                    weights.publish(learner.flat_weights())
+
+            now = time.perf_counter()
+            if now - last_log >= log_interval:
+                last_log = now
+                returns.extend(_drain(episodes))
+                mean_return = np.mean(returns[-10:]) if returns else float("nan")
+                print(
+                    f"{now - start:7.0f}s  transitions {written:8d} ({written / (now - start):6.1f}/s)  "
+                    f"updates {learner.updates:8d} ({learner.updates / (now - start):6.1f}/s)  "
+                    f"loss {loss:8.4f}  episodes {len(returns):4d}  mean return {mean_return:10.2f}"
+                )
+    finally:
+        stop.set()
+        for actor in actors:
+            actor.join(timeout=60)
+            if actor.is_alive():
+                actor.terminate()
+        _drain(episodes)
+        replay.close()
+        weights.close()
+    return learner
+
+
+def _drain(episodes) -> List[float]:
+    returns = []
+    while True:
+        try:
+            returns.append(episodes.get_nowait()[1])
+        except queue.Empty:
+            return returns
+
+
+def get_options(args=None):
+    parser = argparse.ArgumentParser(description="Train a DQN traffic light policy with parallel SUMO actors")
+    parser.add_argument("sumocfg", help="SUMO configuration of the environment")
+    parser.add_argument("-o", "--output", default="Training/dqn_distributed.pt", help="where to save the Q-network")
+    parser.add_argument("--actors", type=int, default=4, help="number of SUMO actor processes")
+    parser.add_argument("--transitions", type=int, default=100000, help="transitions to collect")
+    parser.add_argument("--num-seconds", type=int, default=3600, help="simulated seconds per episode")
+    parser.add_argument("--delta-time", type=int, default=5, help="seconds between two decisions")
+    parser.add_argument("--hidden", type=int, nargs="+", default=[64, 64], help="hidden layer sizes")
+    parser.add_argument("--buffer-size", type=int, default=100000, help="replay buffer capacity")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--learning-starts", type=int, default=1000)
+    parser.add_argument("--broadcast-interval", type=int, default=50, help="gradient steps between weight broadcasts")
+    parser.add_argument("--replay-ratio", type=float, default=None, help="maximum sampled/collected transitions ratio")
+    parser.add_argument("--epsilon", type=float, default=0.4)
+    parser.add_argument("--lr", type=float, default=1e-3)
+    parser.add_argument("--target-update-interval", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--device", default="cpu")
+    return parser.parse_args(args=args)
+
+
+def main(options):
+    env_kwargs = {"sumoconfig_file": options.sumocfg, "num_seconds": options.num_seconds, "delta_time": options.delta_time}
+    learner = train(
+        env_kwargs,
+        num_actors=options.actors,
+        total_transitions=options.transitions,
+        hidden=options.hidden,
+        buffer_size=options.buffer_size,
+        batch_size=options.batch_size,
+        learning_starts=options.learning_starts,
+        broadcast_interval=options.broadcast_interval,
+        replay_ratio=options.replay_ratio,
+        epsilon=options.epsilon,
+        learning_rate=options.lr,
+        target_update_interval=options.target_update_interval,
+        seed=options.seed,
+        device=options.device,
+    )
+    learner.save(options.output)
+    print(f"Saved the Q-network ({learner.updates} updates) to {options.output}")
+
+
+if __name__ == "__main__":
+    main(get_options())
@@ -0,0 +1,188 @@
+"""Evaluation of saved policies on identical seeded scenarios, all environments running side by side.
+
+Every (policy, seed) pair gets its own headless SumoEnvironment; the environments are spread over ``jobs``
+worker processes and all started before the first decision. At each decision tick the observations of the
+environments of a policy are stacked and the policy, loaded once in the main process, is called once on the
+batch; the actions are then sent to the workers, which step their environments concurrently.
+
+The final metrics of each episode (those of the metrics files, see analysis.results.METRICS) and its
+return are ranked in a table with bootstrap confidence intervals over the seeds.
+
+Example:
+    python -m CustomGymEnvSetup.training.evaluate Training/*.zip \
+        -c network_trainning/single-intersection-real-scenario.sumocfg --seeds 0 1 2 3 4
+"""
+
+import argparse
+import multiprocessing as mp
+import os
+from typing import Callable, Dict, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from CustomGymEnvSetup.analysis.results import METRICS, bootstrap_ci
+
+
+def _stack(observations: Sequence[dict]) -> Dict[str, np.ndarray]:
+    return {key: np.stack([obs[key] for obs in observations]) for key in observations[0]}
+
+
+def _env_worker(conn, env_kwargs: Sequence[dict]):
+    """Worker process owning a group of environments, stepped on request of the evaluation loop."""
+    from CustomGymEnvSetup.environment.env import SumoEnvironment
+
+    envs = [SumoEnvironment(**kwargs) for kwargs in env_kwargs]
+    try:
+        while True:
+            command, data = conn.recv()
+            if command == "reset":
+                conn.send([env.reset()[0] for env in envs])
+            elif command == "step":
+                conn.send({i: envs[i].step(action) for i, action in data.items()})
+            else:
+                break
+    finally:
+        for env in envs:
+            env.close()
+        conn.close()
+
+
+def evaluate(
+    policies: Dict[str, Callable[[Dict[str, np.ndarray]], np.ndarray]],
+    env_kwargs: dict,
+    seeds: Sequence[int] = (0, 1, 2, 3, 4),
+    jobs: Optional[int] = None,
+) -> pd.DataFrame:
+    """Runs one episode per policy and seed.
+
+    Args:
+        policies (Dict[str, Callable]): Policies by name, each mapping a batch of observations (dict of
+            arrays with a leading batch dimension) to a batch of actions.
+        env_kwargs (dict): SumoEnvironment arguments, sumo_seed excepted.
+        seeds (Sequence[int]): SUMO seeds of the scenarios, the same for every policy.
+        jobs (int): Worker processes running the environments, one per CPU by default.
+
+    Returns:
+        pd.DataFrame: One row per episode (policy, seed, return, decisions and final metrics).
+    """
+    names = list(policies)
+    runs = [(name, seed) for name in names for seed in seeds]
+    jobs = max(1, min(jobs or os.cpu_count() or 1, len(runs)))
+    # run k is the environment k // jobs of worker k % jobs
+    ctx = mp.get_context("spawn")
+    conns, workers = [], []
+    for worker in range(jobs):
+        parent, child = ctx.Pipe()
+        kwargs = [{**env_kwargs, "sumo_seed": seed} for _, seed in runs[worker::jobs]]
+        workers.append(ctx.Process(target=_env_worker, args=(child, kwargs), daemon=True))
+        workers[-1].start()
+        conns.append(parent)
+
+    try:
+        for conn in conns:
+            conn.send(("reset", None))
+        observations = [None] * len(runs)
+        for worker, conn in enumerate(conns):
+            observations[worker::jobs] = conn.recv()
+        returns = np.zeros(len(runs))
+        decisions = np.zeros(len(runs), dtype=np.int64)
+        infos: list = [{} for _ in runs]
+        active = np.ones(len(runs), dtype=bool)
+
+        while active.any():
+            actions: list = [{} for _ in conns]
+            for name in names:
+                batch = [k for k, (run_name, _) in enumerate(runs) if run_name == name and active[k]]
+                if batch:
+                    for k, action in zip(batch, np.asarray(policies[name](_stack([observations[k] for k in batch])))):
+                        actions[k % jobs][k // jobs] = int(action)
+            for conn, worker_actions in zip(conns, actions):
+                if worker_actions:
+                    conn.send(("step", worker_actions))
+            for worker, (conn, worker_actions) in enumerate(zip(conns, actions)):
+                if not worker_actions:
+                    continue
+                for i, (obs, reward, terminated, truncated, info) in conn.recv().items():
+                    k = i * jobs + worker
+                    observations[k] = obs
+                    returns[k] += reward
+                    decisions[k] += 1
+                    infos[k] = info
+                    active[k] = not (terminated or truncated)
+    finally:
+        for conn in conns:
+            try:
+                conn.send(("close", None))
+            except OSError:  # the worker already exited
+                pass
+        for process in workers:
+            process.join(timeout=60)
+
+    rows = []
+    for (name, seed), episode_return, n, info in zip(runs, returns, decisions, infos):
+        row = {"policy": name, "seed": seed, "return": episode_return, "decisions": int(n)}
+        for metric in METRICS:
+            if metric in info:
+                row[metric] = float(np.ravel(info[metric])[0])
+        rows.append(row)
+    return pd.DataFrame(rows)
+
+
+def rank(episodes: pd.DataFrame, metric: str = "agent_accumulated_waiting_time", higher_is_better: bool = False, n_boot: int = 2000) -> pd.DataFrame:
+    """Ranks the policies on the mean of a metric over the seeds, with its bootstrap confidence interval."""
+    rows = []
+    for name, group in episodes.groupby("policy", sort=False):
+        values = group.sort_values("seed")[metric].to_numpy()
+        low, high = bootstrap_ci(values, n_boot=n_boot)
+        row = {"policy": name, "episodes": len(values), metric: values.mean(), "ci_low": low, "ci_high": high}
+        for other in ["return", *METRICS]:
+            if other != metric and other in group:
+                row[other] = group[other].mean()
+        rows.append(row)
+    report = pd.DataFrame(rows).sort_values(metric, ascending=not higher_is_better, kind="stable").reset_index(drop=True)
+    report.index += 1
+    return report
+
+
+def load_policies(paths: Sequence[str], algorithm: str = "PPO", device: str = "cpu") -> Dict[str, Callable]:
+    """Loads stable-baselines3 models once, as deterministic batched policies named after their file."""
+    import stable_baselines3
+
+    algorithm = getattr(stable_baselines3, algorithm)
+    policies = {}
+    for path in paths:
+        model = algorithm.load(path, device=device)
+        policies[os.path.splitext(os.path.basename(path))[0]] = lambda obs, model=model: model.predict(obs, deterministic=True)[0]
+    return policies
+
+
+def get_options(args=None):
+    parser = argparse.ArgumentParser(description="Evaluate saved policies on identical seeded scenarios")
+    parser.add_argument("models", nargs="+", help="saved stable-baselines3 models (.zip)")
+    parser.add_argument("-c", "--sumocfg", required=True, help="SUMO configuration of the scenarios")
+    parser.add_argument("--seeds", type=int, nargs="+", default=[0, 1, 2, 3, 4], help="SUMO seeds of the scenarios")
+    parser.add_argument("--num-seconds", type=int, default=3600, help="simulated seconds per episode")
+    parser.add_argument("--delta-time", type=int, default=5, help="seconds between two decisions")
+    parser.add_argument("--algorithm", default="PPO", help="stable-baselines3 algorithm of the models")
+    parser.add_argument("--metric", default="agent_accumulated_waiting_time", choices=("return",) + METRICS)
+    parser.add_argument("--higher-is-better", action="store_true", default=False, help="rank the metric in decreasing order")
+    parser.add_argument("--jobs", type=int, default=None, help="worker processes running the environments (default: one per CPU)")
+    parser.add_argument("--episodes", help="also write the per-episode results to this .csv file")
+    return parser.parse_args(args=args)
+
+
+def main(options):
+    policies = load_policies(options.models, options.algorithm)
+    env_kwargs = {"sumoconfig_file": options.sumocfg, "num_seconds": options.num_seconds, "delta_time": options.delta_time}
+    episodes = evaluate(policies, env_kwargs, options.seeds, options.jobs)
+    if options.episodes:
+        episodes.to_csv(options.episodes, index=False)
+    report = rank(episodes, options.metric, options.higher_is_better or options.metric == "return")
+    with pd.option_context("display.max_rows", None, "display.width", 200):
+        print(f"{len(policies)} policies x {len(options.seeds)} seeds, ranked on {options.metric}")
+        print(report.to_string())
+
+
+if __name__ == "__main__":
+    main(get_options())
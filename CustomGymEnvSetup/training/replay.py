@@ -0,0 +1,145 @@
+"""Replay buffer and policy weights living in shared memory, so that actor processes and a learner process
+can exchange transitions and parameters without pickling nor pipes.
+
+Both objects are created once by the parent process and attached by name in the children (``spec()``
+returns what a child needs to attach). Only plain NumPy arrays are involved, the actors never import torch.
+"""
+
+from multiprocessing import shared_memory
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+class _SharedArrays:
+    """Named NumPy arrays packed in one shared memory block."""
+
+    def __init__(self, layout: Sequence[Tuple[str, tuple, str]], name: Optional[str] = None):
+        self.layout = [(key, tuple(shape), np.dtype(dtype).str) for key, shape, dtype in layout]
+        offsets, size = [], 0
+        for _, shape, dtype in self.layout:
+            size = -(-size // 8) * 8  # 8-byte alignment
+            offsets.append(size)
+            size += int(np.prod(shape, dtype=np.int64)) * np.dtype(dtype).itemsize
+        self._owner = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self._owner, size=max(size, 1))
+        self.arrays: Dict[str, np.ndarray] = {
+            key: np.ndarray(shape, dtype=dtype, buffer=self.shm.buf, offset=offset)
+            for (key, shape, dtype), offset in zip(self.layout, offsets)
+        }
+        if self._owner:
+            for array in self.arrays.values():
+                array.fill(0)
+
+    def close(self):
+        self.arrays = {}
+        self.shm.close()
+        if self._owner:
+            self.shm.unlink()
+
+
+class SharedReplayBuffer:
+    """Circular buffer of transitions (obs, action, reward, next_obs, discount) in shared memory.
+
+    Actors append blocks of transitions (flush_every of them, so the copies are short) and the learner
+    gathers its batches, both under the lock: the written counter only counts transitions whose copy is
+    complete, so the learner never samples reserved but unwritten slots nor rows mixing two transitions.
+
+    Args:
+        capacity (int): Number of transitions kept.
+        obs_dim (int): Size of the (flattened) observations.
+        lock: multiprocessing.Lock shared by all users of the buffer.
+        name (str): Name of an existing buffer to attach to (None creates a new one).
+    """
+
+    def __init__(self, capacity: int, obs_dim: int, lock, name: Optional[str] = None):
+        self.capacity = capacity
+        self.obs_dim = obs_dim
+        self.lock = lock
+        self._shared = _SharedArrays(
+            [
+                ("obs", (capacity, obs_dim), "float32"),
+                ("next_obs", (capacity, obs_dim), "float32"),
+                ("action", (capacity,), "int64"),
+                ("reward", (capacity,), "float32"),
+                ("discount", (capacity,), "float32"),
+                ("written", (1,), "int64"),  # total number of transitions ever added (copies complete)
+            ],
+            name,
+        )
+        self._arrays = self._shared.arrays
+
+    def spec(self) -> dict:
+        """Arguments attaching another process to this buffer: SharedReplayBuffer(**spec)."""
+        return {"capacity": self.capacity, "obs_dim": self.obs_dim, "lock": self.lock, "name": self._shared.shm.name}
+
+    @property
+    def written(self) -> int:
+        return int(self._arrays["written"][0])
+
+    def __len__(self) -> int:
+        return min(self.written, self.capacity)
+
+    def add_batch(self, obs: np.ndarray, action: np.ndarray, reward: np.ndarray, next_obs: np.ndarray, discount: np.ndarray):
+        """Appends len(action) transitions."""
+        n = len(action)
+        with self.lock:
+            start = int(self._arrays["written"][0])
+            slots = (start + np.arange(n)) % self.capacity
+            self._arrays["obs"][slots] = obs
+            self._arrays["next_obs"][slots] = next_obs
+            self._arrays["action"][slots] = action
+            self._arrays["reward"][slots] = reward
+            self._arrays["discount"][slots] = discount
+            self._arrays["written"][0] = start + n
+
+    def sample(self, batch_size: int, rng: np.random.Generator) -> Dict[str, np.ndarray]:
+        """Returns a batch of transitions (copies) drawn uniformly among the complete ones."""
+        with self.lock:
+            slots = rng.integers(0, len(self), size=batch_size)
+            return {key: self._arrays[key][slots] for key in ("obs", "action", "reward", "next_obs", "discount")}
+
+    def close(self):
+        self._shared.close()
+
+
+class SharedWeights:
+    """Flat float32 parameter vector broadcast by the learner to the actors.
+
+    A version counter guards the copy (seqlock): it is odd while the learner writes, so a reader retries
+    instead of using half-updated weights, and it lets actors skip the copy when nothing changed.
+
+    Args:
+        size (int): Number of parameters.
+        name (str): Name of an existing block to attach to (None creates a new one).
+    """
+
+    def __init__(self, size: int, name: Optional[str] = None):
+        self.size = size
+        self._shared = _SharedArrays([("version", (1,), "int64"), ("weights", (size,), "float32")], name)
+        self._version = self._shared.arrays["version"]
+        self._weights = self._shared.arrays["weights"]
+
+    def spec(self) -> dict:
+        return {"size": self.size, "name": self._shared.shm.name}
+
+    @property
+    def version(self) -> int:
+        return int(self._version[0])
+
+    def publish(self, weights: np.ndarray):
+        self._version[0] += 1
+        self._weights[:] = weights
+        self._version[0] += 1
+
+    def read(self, out: np.ndarray) -> int:
+        """Copies the latest complete weights into out and returns their version."""
+        while True:
+            before = int(self._version[0])
+            if before % 2 == 0:
+                out[:] = self._weights
+                if int(self._version[0]) == before:
+                    return before
+
+    def close(self):
+        self._shared.close()
@@ -0,0 +1,276 @@
+"""Checkpointed, resumable stable-baselines3 training runs.
+
+A run lives in a directory holding its configuration (``config.json``) and its checkpoints. Every
+``checkpoint_interval`` timesteps, at the end of a rollout, a checkpoint stores:
+
+- the model with its optimizer state (``model.zip``) and, for off-policy algorithms, the replay buffer;
+- the state of every worker environment: SUMO state with its random number generators and the
+  environment/traffic signal state (SumoEnvironment.save_checkpoint);
+- the Python, NumPy and torch random generator states.
+
+A checkpoint is written in a temporary directory renamed once complete, so a crash while saving leaves the
+previous one intact. Running the same command again resumes from the latest checkpoint: the workers continue
+their episodes from the saved SUMO states and learning continues up to the requested number of timesteps,
+so a crash only costs the timesteps since the last checkpoint.
+
+Episodes are seeded per worker with seeding.episode_seed, so the whole run is reproducible from its seed.
+
+Example:
+    python -m CustomGymEnvSetup.training.runs network_trainning/single-intersection-real-scenario.sumocfg \
+        --run-dir Training/runs/PPO_500k --timesteps 500000 --workers 4
+"""
+
+import argparse
+import functools
+import json
+import os
+import pickle
+import random
+import shutil
+from typing import Optional
+
+import numpy as np
+import torch
+from stable_baselines3 import A2C, DQN, PPO
+from stable_baselines3.common.callbacks import BaseCallback
+from stable_baselines3.common.monitor import Monitor
+from stable_baselines3.common.off_policy_algorithm import OffPolicyAlgorithm
+from stable_baselines3.common.vec_env import SubprocVecEnv
+
+from CustomGymEnvSetup.training.seeding import DeterministicSeeding
+from CustomGymEnvSetup.training.vec_env import InPlaceDummyVecEnv
+
+
+ALGORITHMS = {"PPO": PPO, "DQN": DQN, "A2C": A2C}
+CHECKPOINT_PREFIX = "step_"
+
+
+def make_env(worker: int, seed: int, env_kwargs: dict):
+    """Builds the environment of a worker (module level so that SubprocVecEnv can pickle it)."""
+    from CustomGymEnvSetup.environment.env import SumoEnvironment
+
+    return DeterministicSeeding(Monitor(SumoEnvironment(**env_kwargs)), seed, worker)
+
+
+def _rng_state() -> dict:
+    state = {"random": random.getstate(), "numpy": np.random.get_state(), "torch": torch.get_rng_state()}
+    if torch.cuda.is_available():
+        state["cuda"] = torch.cuda.get_rng_state_all()
+    return state
+
+
+def _set_rng_state(state: dict):
+    random.setstate(state["random"])
+    np.random.set_state(state["numpy"])
+    torch.set_rng_state(state["torch"])
+    if "cuda" in state and torch.cuda.is_available():
+        torch.cuda.set_rng_state_all(state["cuda"])
+
+
+class RunCheckpoint(BaseCallback):
+    """Saves a checkpoint of the run at the end of the first rollout after every interval timesteps."""
+
+    def __init__(self, run: "TrainingRun", interval: int):
+        super().__init__()
+        self.run = run
+        self.interval = interval
+        self._last = 0
+
+    def _on_training_start(self):
+        self._last = self.num_timesteps
+
+    def _on_step(self) -> bool:
+        return True
+
+    def _on_rollout_end(self):
+        if self.num_timesteps - self._last >= self.interval:
+            self._last = self.num_timesteps
+            self.run.save_checkpoint(self.model)
+
+
+class TrainingRun:
+    """A training run that checkpoints itself and resumes from its latest checkpoint.
+
+    Args:
+        run_dir (str): Directory of the run. When it already holds a run, its saved configuration is used
+            and training resumes from the latest checkpoint.
+        env_kwargs (dict): SumoEnvironment arguments of the workers.
+        algorithm (str): "PPO", "DQN" or "A2C".
+        algorithm_kwargs (dict): Arguments of the algorithm (learning rate, n_steps, ...).
+        policy (str): Policy of the algorithm.
+        num_workers (int): Number of environments (SubprocVecEnv when more than one, otherwise
+            InPlaceDummyVecEnv).
+        seed (int): Seed of the run (model initialization and episode seeds).
+        checkpoint_interval (int): Timesteps between two checkpoints.
+        keep (int): Number of checkpoints kept.
+    """
+
+    def __init__(
+        self,
+        run_dir: str,
+        env_kwargs: Optional[dict] = None,
+        algorithm: str = "PPO",
+        algorithm_kwargs: Optional[dict] = None,
+        policy: str = "MultiInputPolicy",
+        num_workers: int = 1,
+        seed: int = 0,
+        checkpoint_interval: int = 10000,
+        keep: int = 2,
+    ):
+        self.run_dir = os.path.abspath(run_dir)
+        self.checkpoint_dir = os.path.join(self.run_dir, "checkpoints")
+        config_path = os.path.join(self.run_dir, "config.json")
+        if os.path.exists(config_path):
+            with open(config_path) as inf:
+                self.config = json.load(inf)
+        else:
+            if env_kwargs is None:
+                raise ValueError(f"{self.run_dir} holds no run, env_kwargs are required to start one")
+            self.config = {
+                "env_kwargs": env_kwargs,
+                "algorithm": algorithm,
+                "algorithm_kwargs": algorithm_kwargs or {},
+                "policy": policy,
+                "num_workers": num_workers,
+                "seed": seed,
+                "checkpoint_interval": checkpoint_interval,
+                "keep": keep,
+            }
+            os.makedirs(self.run_dir, exist_ok=True)
+            with open(config_path, "w") as outf:
+                json.dump(self.config, outf, indent=2)
+
+    def _make_vec_env(self):
+        env_kwargs = dict(self.config["env_kwargs"])
+        env_fns = []
+        for worker in range(self.config["num_workers"]):
+            worker_kwargs = dict(env_kwargs, checkpointing=True)
+            if worker_kwargs.get("out_csv_name"):
+                worker_kwargs["out_csv_name"] = f"{worker_kwargs['out_csv_name']}_worker{worker}"
+            env_fns.append(functools.partial(make_env, worker, self.config["seed"], worker_kwargs))
+        if len(env_fns) == 1:
+            return InPlaceDummyVecEnv(env_fns)
+        return SubprocVecEnv(env_fns)
+
+    def latest_checkpoint(self) -> Optional[str]:
+        """Path of the most recent complete checkpoint, None if there is none."""
+        if not os.path.isdir(self.checkpoint_dir):
+            return None
+        steps = [
+            name
+            for name in os.listdir(self.checkpoint_dir)
+            # a .tmp directory is a checkpoint interrupted before its rename, even if meta.json was written
+            if name.startswith(CHECKPOINT_PREFIX)
+            and not name.endswith(".tmp")
+            and os.path.exists(os.path.join(self.checkpoint_dir, name, "meta.json"))
+        ]
+        if not steps:
+            return None
+        return os.path.join(self.checkpoint_dir, max(steps, key=lambda name: int(name[len(CHECKPOINT_PREFIX) :])))
+
+    def save_checkpoint(self, model):
+        """Writes a checkpoint of the model, the worker environments and the random generators."""
+        final = os.path.join(self.checkpoint_dir, f"{CHECKPOINT_PREFIX}{model.num_timesteps:010d}")
+        tmp = final + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        model.save(os.path.join(tmp, "model.zip"))
+        if isinstance(model, OffPolicyAlgorithm):
+            model.save_replay_buffer(os.path.join(tmp, "replay_buffer.pkl"))
+        for worker in range(model.get_env().num_envs):
+            model.get_env().env_method("save_checkpoint", os.path.join(tmp, f"env_{worker}"), indices=[worker])
+        with open(os.path.join(tmp, "rng.pkl"), "wb") as outf:
+            pickle.dump(_rng_state(), outf)
+        with open(os.path.join(tmp, "meta.json"), "w") as outf:
+            json.dump({"num_timesteps": model.num_timesteps}, outf)
+        shutil.rmtree(final, ignore_errors=True)
+        os.replace(tmp, final)
+
+        checkpoints = sorted(name for name in os.listdir(self.checkpoint_dir) if not name.endswith(".tmp"))
+        for name in checkpoints[: -self.config["keep"]]:
+            shutil.rmtree(os.path.join(self.checkpoint_dir, name), ignore_errors=True)
+
+    def _resume(self, checkpoint: str, vec_env):
+        algorithm = ALGORITHMS[self.config["algorithm"]]
+        model = algorithm.load(os.path.join(checkpoint, "model.zip"), env=vec_env)
+        if isinstance(model, OffPolicyAlgorithm):
+            model.load_replay_buffer(os.path.join(checkpoint, "replay_buffer.pkl"))
+        for worker in range(vec_env.num_envs):
+            # takes effect at the reset done by learn(), which then returns the saved observations
+            vec_env.env_method("resume_from", os.path.join(checkpoint, f"env_{worker}"), indices=[worker])
+        with open(os.path.join(checkpoint, "rng.pkl"), "rb") as inf:
+            _set_rng_state(pickle.load(inf))
+        return model
+
+    def train(self, total_timesteps: int):
+        """Trains until the model has seen total_timesteps timesteps, resuming from the latest checkpoint.
+
+        Returns:
+            The trained model, also saved as model.zip in the run directory.
+        """
+        vec_env = self._make_vec_env()
+        checkpoint = self.latest_checkpoint()
+        if checkpoint is None:
+            algorithm = ALGORITHMS[self.config["algorithm"]]
+            model = algorithm(
+                self.config["policy"],
+                vec_env,
+                seed=self.config["seed"],
+                tensorboard_log=os.path.join(self.run_dir, "logs"),
+                **self.config["algorithm_kwargs"],
+            )
+        else:
+            model = self._resume(checkpoint, vec_env)
+            print(f"Resuming {self.run_dir} from {os.path.basename(checkpoint)} ({model.num_timesteps} timesteps)")
+
+        try:
+            if model.num_timesteps < total_timesteps:
+                model.learn(
+                    total_timesteps - model.num_timesteps,
+                    callback=RunCheckpoint(self, self.config["checkpoint_interval"]),
+                    reset_num_timesteps=checkpoint is None,
+                    tb_log_name=self.config["algorithm"],
+                )
+                self.save_checkpoint(model)
+            model.save(os.path.join(self.run_dir, "model.zip"))
+        finally:
+            vec_env.close()
+        return model
+
+
+def get_options(args=None):
+    parser = argparse.ArgumentParser(description="Checkpointed training run, resumed automatically if it exists")
+    parser.add_argument("sumocfg", help="SUMO configuration of the environment")
+    parser.add_argument("--run-dir", required=True, help="directory of the run (resumed if it already holds one)")
+    parser.add_argument("--timesteps", type=int, required=True, help="total timesteps of the run")
+    parser.add_argument("--algorithm", choices=sorted(ALGORITHMS), default="PPO")
+    parser.add_argument("--workers", type=int, default=1, help="number of SUMO environments")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--checkpoint-interval", type=int, default=10000, help="timesteps between two checkpoints")
+    parser.add_argument("--keep", type=int, default=2, help="checkpoints kept")
+    parser.add_argument("--num-seconds", type=int, default=3600, help="simulated seconds per episode")
+    parser.add_argument("--delta-time", type=int, default=5, help="seconds between two decisions")
+    return parser.parse_args(args=args)
+
+
+def main(options):
+    env_kwargs = {
+        "sumoconfig_file": os.path.abspath(options.sumocfg),
+        "num_seconds": options.num_seconds,
+        "delta_time": options.delta_time,
+    }
+    run = TrainingRun(
+        options.run_dir,
+        env_kwargs,
+        algorithm=options.algorithm,
+        num_workers=options.workers,
+        seed=options.seed,
+        checkpoint_interval=options.checkpoint_interval,
+        keep=options.keep,
+    )
+    model = run.train(options.timesteps)
+    print(f"{model.num_timesteps} timesteps, model saved to {os.path.join(run.run_dir, 'model.zip')}")
+
+
+if __name__ == "__main__":
+    main(get_options())
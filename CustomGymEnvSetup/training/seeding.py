@@ -0,0 +1,43 @@
+"""Deterministic seeds for the SUMO workers of a training run.
+
+Every episode of every worker gets its own seed derived from (run seed, worker index, episode number) with a
+NumPy SeedSequence, instead of SUMO's ``--random``. A run is therefore reproducible, the workers never share
+a seed, and the seed of any episode can be recomputed after a restart without storing a generator state.
+"""
+
+from typing import Optional
+
+import gymnasium as gym
+import numpy as np
+
+
+def episode_seed(base_seed: int, worker: int, episode: int) -> int:
+    """Seed of the given episode (counted from 1) of a worker, in SUMO's accepted range."""
+    return int(np.random.SeedSequence([base_seed, worker, episode]).generate_state(1)[0] % 2**31)
+
+
+class DeterministicSeeding(gym.Wrapper):
+    """Resets a SumoEnvironment with the seeds of episode_seed.
+
+    Seeds passed to reset() (e.g. by a vector env) are ignored. The checkpoint methods of the environment
+    are forwarded, so they can be called through a vector env's env_method.
+
+    Args:
+        env (gym.Env): A SumoEnvironment, possibly wrapped.
+        base_seed (int): Seed of the run.
+        worker (int): Index of the worker running this environment.
+    """
+
+    def __init__(self, env: gym.Env, base_seed: int, worker: int = 0):
+        super().__init__(env)
+        self.base_seed = base_seed
+        self.worker = worker
+
+    def reset(self, seed: Optional[int] = None, **kwargs):
+        return self.env.reset(seed=episode_seed(self.base_seed, self.worker, self.env.unwrapped.episode + 1), **kwargs)
+
+    def save_checkpoint(self, path: str):
+        self.env.unwrapped.save_checkpoint(path)
+
+    def resume_from(self, path: str):
+        self.env.unwrapped.resume_from(path)
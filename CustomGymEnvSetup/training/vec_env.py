@@ -0,0 +1,75 @@
+"""stable-baselines3 DummyVecEnv whose SumoEnvironments write their observations in place.
+
+DummyVecEnv copies the observation returned by each environment into its buffers, then copies the buffers
+again into the observation it returns. Here every SumoEnvironment is given its row of the buffers
+(SumoEnvironment.set_observation_buffers), so the observation is written once, by the environment, and the
+buffers are returned as they are.
+
+The algorithms store the previous observation in their rollout/replay buffer after the next step, so two
+sets of buffers are used in turn: an observation returned by step() stays valid until the step after next.
+Terminal observations (info["terminal_observation"]) are copies, since the reset that follows writes into
+the same row.
+
+Example:
+    env = InPlaceDummyVecEnv([lambda: Monitor(SumoEnvironment("network_trainning/single-intersection-real-scenario.sumocfg"))])
+    PPO("MultiInputPolicy", env).learn(100_000)
+"""
+
+from copy import deepcopy
+from typing import Callable, Dict, List
+
+import gymnasium as gym
+import numpy as np
+from stable_baselines3.common.vec_env import DummyVecEnv
+
+
+class InPlaceDummyVecEnv(DummyVecEnv):
+    """DummyVecEnv of SumoEnvironments (possibly wrapped) writing their observations into its buffers.
+
+    Args:
+        env_fns (List[Callable[[], gym.Env]]): Functions building the environments.
+    """
+
+    def __init__(self, env_fns: List[Callable[[], gym.Env]]):
+        super().__init__(env_fns)
+        self._buffer_sets = [self.buf_obs, {key: np.zeros_like(buffer) for key, buffer in self.buf_obs.items()}]
+        # the views given to the environments, per buffer set and environment
+        self._views = [
+            [{key: buffers[key][env_idx] for key in self.keys} for env_idx in range(self.num_envs)] for buffers in self._buffer_sets
+        ]
+        self._current = 0
+        self._bind(0)
+
+    def _bind(self, index: int):
+        self._current = index
+        self.buf_obs = self._buffer_sets[index]
+        for env, views in zip(self.envs, self._views[index]):
+            env.unwrapped.set_observation_buffers(views)
+
+    def _save_obs(self, env_idx: int, obs: Dict[str, np.ndarray]):
+        views = self._views[self._current][env_idx]
+        for key in self.keys:
+            if obs[key] is not views[key]:  # e.g. an observation built by a wrapper
+                views[key][...] = obs[key]
+
+    def _obs_from_buf(self):
+        return dict(self.buf_obs)
+
+    def reset(self):
+        self._bind(1 - self._current)
+        return super().reset()
+
+    def step_wait(self):
+        self._bind(1 - self._current)
+        for env_idx in range(self.num_envs):
+            obs, self.buf_rews[env_idx], terminated, truncated, self.buf_infos[env_idx] = self.envs[env_idx].step(
+                self.actions[env_idx]
+            )
+            self.buf_dones[env_idx] = terminated or truncated
+            self.buf_infos[env_idx]["TimeLimit.truncated"] = truncated and not terminated
+
+            if self.buf_dones[env_idx]:
+                self.buf_infos[env_idx]["terminal_observation"] = {key: np.array(value) for key, value in obs.items()}
+                obs, self.reset_infos[env_idx] = self.envs[env_idx].reset()
+            self._save_obs(env_idx, obs)
+        return self._obs_from_buf(), np.copy(self.buf_rews), np.copy(self.buf_dones), deepcopy(self.buf_infos)
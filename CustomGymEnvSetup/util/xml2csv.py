@@ -15,10 +15,15 @@
 
 
 import collections
+import gzip
+import operator
 import os
+import shutil
 import socket
 import sys
+import xml.etree.ElementTree
 import xml.sax
+from concurrent.futures import ProcessPoolExecutor
 from optparse import OptionParser
 
 
@@ -30,6 +35,14 @@ try:
 except ImportError:
     haveLxml = False
 
+try:
+    import pyarrow.csv
+    import pyarrow.parquet
+
+    haveArrow = True
+except ImportError:
+    haveArrow = False
+
 import xsd
 
 
@@ -208,6 +221,190 @@ class CSVWriter(NestingHandler):
         NestingHandler.endElement(self, name)
 
 
+def openSource(source):
+    return gzip.open(source, "rb") if source.endswith(".gz") else open(source, "rb")
+
+
+class FastTable:
+
+    """Columns, current row and (temporary) body file of one output CSV of FastConverter."""
+
+    def __init__(self, bodyName):
+        self.columns = []
+        self.row = []
+        self.bodyName = bodyName
+        self.body = open(bodyName, "w", newline="", buffering=1 << 20)
+        self.rows = 0
+        self.widths = []  # (row count, number of columns of these rows) each time columns were added after rows
+
+
+class FastConverter:
+
+    """Converts a (possibly gzipped) XML file to CSV with a single C-accelerated iterparse pass.
+
+    Produces the same columns and rows as AttrFinder + CSVWriter without schema, except that attributes
+    first appearing on a later element of a known tag get a column too (AttrFinder only looks at the first
+    one). Columns are discovered while writing; rows written before a column appeared are padded when the
+    output is finalized.
+    For every (tag, attribute names) layout a plan mapping the attribute values onto a contiguous slice
+    of the row is computed once, so each element costs a few C calls instead of a loop over its attributes.
+    """
+
+    def __init__(self, split, separator, quotechar):
+        self.rootDepth = 1 if split else 0
+        self.separator = separator
+        self.quotechar = quotechar
+        self.tagDepths = {}  # tag -> depth of appearance
+        self.ignored = set()  # (tag, depth) found at another depth than their first appearance
+        self.plans = {}  # (root, tag, attribute names) -> (start, stop, getter) or (None, indices, None)
+
+    def accept(self, name, depth):
+        if self.tagDepths.setdefault(name, depth) == depth:
+            return True
+        if (name, depth) not in self.ignored:
+            print(f"Ignoring tag {name} at depth {depth}", file=sys.stderr)
+            self.ignored.add((name, depth))
+        return False
+
+    def plan(self, table, name, keys):
+        indices = {}
+        for a in sorted(keys):
+            if ":" in a:
+                continue
+            column = f"{name}_{a}"
+            if column not in table.columns:
+                if table.rows and (not table.widths or table.widths[-1][0] != table.rows):
+                    table.widths.append((table.rows, len(table.columns)))
+                table.columns.append(column)
+                table.row.append("")
+            indices[a] = table.columns.index(column)
+        positions = [i for i, a in enumerate(keys) if a in indices]
+        targets = sorted(indices.values())
+        if positions and targets == list(range(targets[0], targets[-1] + 1)):
+            # order the values like the (sorted) columns of the slice
+            order = sorted(positions, key=lambda i: indices[keys[i]])
+            getter = operator.itemgetter(*order) if len(order) > 1 else (lambda values, i=order[0]: (values[i],))
+            return targets[0], targets[-1] + 1, getter
+        return None, [(i, indices[keys[i]]) for i in positions], None
+
+    def convert(self, source, output):
+        """Converts source, returns the list of written CSV files."""
+        iterparse = lxml.etree.iterparse if haveLxml else xml.etree.ElementTree.iterparse
+        rootDepth = self.rootDepth
+        separator = self.separator
+        tables = {}
+        plans = self.plans
+        stack = []  # (element, table, plan) of the open elements
+        unsaved = False
+        with openSource(source) as stream:
+            for event, elem in iterparse(stream, events=("start", "end")):
+                if event == "start":
+                    depth = len(stack)  # the root element has depth 0
+                    table = plan = None
+                    if depth >= rootDepth and self.accept(elem.tag, depth):
+                        root = stack[rootDepth][0].tag if rootDepth < len(stack) else elem.tag
+                        table = tables.get(root)
+                        if table is None:
+                            table = tables[root] = FastTable(f"{output}.{len(tables)}.tmp")
+                        keys = tuple(elem.keys())
+                        key = (root, elem.tag, keys)
+                        plan = plans.get(key)
+                        if plan is None:
+                            plan = plans[key] = self.plan(table, elem.tag, keys)
+                        start, stop, getter = plan
+                        if start is not None:
+                            table.row[start:stop] = getter(elem.values())
+                            unsaved = True
+                        elif stop:
+                            values = elem.values()
+                            for i, column in stop:
+                                table.row[column] = values[i]
+                            unsaved = True
+                    stack.append((elem, table, plan))
+                    continue
+
+                _, table, plan = stack.pop()
+                if table is not None:
+                    if unsaved:
+                        if self.quotechar:
+                            q = self.quotechar
+                            table.body.write(q + (q + separator + q).join(table.row) + q + "\n")
+                        else:
+                            table.body.write(separator.join(table.row) + "\n")
+                        table.rows += 1
+                        unsaved = False
+                    start, stop, _ = plan
+                    if start is not None:
+                        table.row[start:stop] = [""] * (stop - start)
+                    else:
+                        for _, column in stop:
+                            table.row[column] = ""
+                elem.clear()
+                if stack:
+                    stack[-1][0].remove(elem)
+
+        names = outputNames(sorted(tables), source, output)
+        for root, table in tables.items():
+            self.finalize(table, names[root])
+        return list(names.values())
+
+    def finalize(self, table, name):
+        """Writes header and body of a table to name, padding rows written before columns were added."""
+        table.body.close()
+        q = self.quotechar
+        with open(name, "w", newline="", buffering=1 << 20) as outf:
+            outf.write(self.separator.join([f"{q}{a}{q}" for a in table.columns]) + "\n")
+            with open(table.bodyName, newline="") as body:
+                first = 0
+                for last, width in table.widths:
+                    padding = (self.separator + q + q) * (len(table.columns) - width) + "\n"
+                    for _ in range(first, last):
+                        outf.write(body.readline()[:-1] + padding)
+                    first = last
+                shutil.copyfileobj(body, outf, 1 << 20)
+        os.remove(table.bodyName)
+
+
+def outputNames(roots, source, output):
+    """Returns the CSV file of each root, named like CSVWriter does."""
+    if len(roots) == 1:
+        if not output:
+            output = os.path.splitext(source[:-3] if source.endswith(".gz") else source)[0]
+        if not output.endswith(".csv"):
+            output += ".csv"
+        return {roots[0]: output}
+    base = output if output else os.path.splitext(source)[0]
+    return {root: f"{base}{root}.csv" for root in roots}
+
+
+def convertFast(source, output, split, separator, quotechar):
+    """Converts source with FastConverter, returns the list of written CSV files."""
+    if not output:
+        output = os.path.splitext(source[:-3] if source.endswith(".gz") else source)[0]
+    return FastConverter(split, separator, quotechar).convert(source, output)
+
+
+def writeParquet(csvFile, separator, quotechar):
+    """Writes a typed columnar copy (.parquet) of a CSV written by this script, returns its name."""
+    parquetFile = os.path.splitext(csvFile)[0] + ".parquet"
+    table = pyarrow.csv.read_csv(
+        csvFile,
+        parse_options=pyarrow.csv.ParseOptions(delimiter=separator, quote_char=quotechar or False),
+        convert_options=pyarrow.csv.ConvertOptions(strings_can_be_null=True),
+    )
+    pyarrow.parquet.write_table(table, parquetFile)
+    return parquetFile
+
+
+def convertOne(source, output, split, separator, quotechar, parquet):
+    """Fast conversion of one file (process pool entry point)."""
+    csvFiles = convertFast(source, output, split, separator, quotechar)
+    if parquet:
+        for csvFile in csvFiles:
+            writeParquet(csvFile, separator, quotechar)
+    return csvFiles
+
+
 def getSocketStream(port, mode="rb"):
     s = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
     s.bind(("localhost", port))
@@ -223,7 +420,7 @@ def getOutStream(output):
 
 
 def get_options():
-    optParser = OptionParser(usage=os.path.basename(sys.argv[0]) + " [<options>] <input_file_or_port>")
+    optParser = OptionParser(usage=os.path.basename(sys.argv[0]) + " [<options>] <input_file_or_port> [<input_file> ...]")
     optParser.add_option("-s", "--separator", default=";", help="separating character for fields")
     optParser.add_option("-q", "--quotechar", default="", help="quoting character for fields")
     optParser.add_option("-x", "--xsd", help="xsd schema to use")
@@ -231,11 +428,23 @@ def get_options():
     optParser.add_option(
         "-p", "--split", action="store_true", default=False, help="split in different files for the first hierarchy level"
     )
-    optParser.add_option("-o", "--output", help="base name for output")
+    optParser.add_option("-o", "--output", help="base name for output (output directory when converting several files)")
+    optParser.add_option("--parquet", action="store_true", default=False,
+                         help="also write a typed columnar copy of each CSV (.parquet, needs pyarrow)")
+    optParser.add_option("-j", "--jobs", type="int", default=1, help="number of files converted in parallel")
+    optParser.add_option("--sax", action="store_true", default=False,
+                         help="use the SAX converter even when the fast iterparse converter applies")
     options, args = optParser.parse_args()
-    if len(args) != 1:
+    if len(args) < 1 or (len(args) > 1 and any(a.isdigit() for a in args)):
         optParser.print_help()
         sys.exit()
+    options.sources = args
+    if len(args) > 1 and (options.xsd or options.validation or options.sax):
+        print("several input files can only be converted without schema and without --sax", file=sys.stderr)
+        sys.exit()
+    if options.parquet and not haveArrow:
+        print("pyarrow not available, parquet output is not possible", file=sys.stderr)
+        sys.exit()
     if options.validation and not haveLxml:
         print("lxml not available, skipping validation", file=sys.stderr)
         options.validation = False
@@ -254,6 +463,10 @@ def get_options():
 
 def main():
     options = get_options()
+    # the fast path covers everything but schema based conversion and streams
+    if not options.sax and not options.xsd and not options.validation and not args_are_streams(options):
+        convertMany(options)
+        return
     # get attributes
     attrFinder = AttrFinder(options.xsd, options.source, options.split)
     # write csv
@@ -265,6 +478,34 @@ def main():
         lxml.sax.saxify(tree, handler)
     else:
         xml.sax.parse(options.source, handler)
+    if options.parquet and not (options.output and options.output.isdigit()):
+        for outfile in handler.outfiles.values():
+            outfile.close()
+            writeParquet(outfile.name, options.separator, options.quotechar)
+
+
+def args_are_streams(options):
+    return not isinstance(options.source, str) or (options.output is not None and options.output.isdigit())
+
+
+def convertMany(options):
+    """Converts all sources with the fast path, on a process pool when --jobs > 1."""
+    outputs = [options.output] * len(options.sources)
+    if len(options.sources) > 1:
+        if options.output:
+            os.makedirs(options.output, exist_ok=True)
+        outputs = [
+            os.path.join(options.output, os.path.splitext(os.path.basename(s))[0]) if options.output else None
+            for s in options.sources
+        ]
+    jobs = [(source, output, options.split, options.separator, options.quotechar, options.parquet)
+            for source, output in zip(options.sources, outputs)]
+    if options.jobs > 1 and len(jobs) > 1:
+        with ProcessPoolExecutor(max_workers=options.jobs) as executor:
+            list(executor.map(convertOne, *zip(*jobs)))
+    else:
+        for job in jobs:
+            convertOne(*job)
 
 
 if __name__ == "__main__":
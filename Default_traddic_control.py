@@ -1,3 +1,4 @@
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -7,10 +8,12 @@ import csv
 import pandas as pd
 from typing import Callable, Optional, Tuple, Union, List
 
-# Configuration
-sumoBinary = sumolib.checkBinary('sumo-gui')
-sumoCmd = [sumoBinary, "-c", "network_trainning/single-intersection-real-scenario.sumocfg"]
-# sumoCmd = [sumoBinary, "-c", "network/osm.sumocfg"]
+from CustomGymEnvSetup.control.pacing import add_run_options, make_pacer, sumo_command
+
+# Configuration (headless and as fast as possible unless --gui / --real-time are given, see get_options)
+SUMO_CFG = "network_trainning/single-intersection-real-scenario.sumocfg"
+# SUMO_CFG = "network/osm.sumocfg"
+OUTPUT = "outputs_pretimed/default_control_17h-18h.csv"
 
 # Variables globales pour stocker les informations collectées
 vehicle_info = {}  # Structure: {vehicle_id: {"waitTime": value, "co2Emission": value, "fuelConsumption": value}}
@@ -24,19 +27,29 @@ total_fuel_consumption = 0.0  # Initialize total fuel consumption to 0
 halted_vehicles = set()
 max_steps = 3600
 
-def run_simulation():
+def get_options(args=None):
+    parser = argparse.ArgumentParser(description="Run the pre-timed (default) traffic light program and record its metrics")
+    add_run_options(parser, SUMO_CFG, OUTPUT)
+    return parser.parse_args(args=args)
+
+def run_simulation(options):
     global sim_step
-    traci.start(sumoCmd)
+    global max_steps
+    max_steps = options.max_steps
+    pacer = make_pacer(options)
+    traci.start(sumo_command(options))
     step = 0
     # while traci.simulation.getMinExpectedNumber() > 0:
     while step < max_steps:
         sim_step = traci.simulation.getTime()
         traci.simulationStep()
+        if pacer is not None:
+            pacer.wait(traci.simulation.getTime())
         _compute_info()
         step += 1
     traci.close()
 
-    save_csv("outputs_pretimed/default_control_17h-18h.csv", 0)
+    save_csv(options.output, 0)
     
 def get_total_queued(in_lanes) -> int:
         """Returns the total number of vehicles halting in the intersection."""
@@ -169,4 +182,4 @@ def save_csv(out_csv_name, episode):
 #     print(f"Total Vehicles: {total_vehicles}, Total Wait Time: {total_wait_time}, Total CO2 Emission: {total_co2_emission}, Total Fuel Consumption: {total_fuel_consumption}")
 
 if __name__ == "__main__":
-    run_simulation()
+    run_simulation(get_options())
@@ -0,0 +1,77 @@
+"""Validation of the detector arrival counts of the actuated controller (DetectorCounts).
+
+Runs the actuated scenario (8 lanearea detectors, 300 s period) with its default program and, at every
+step, compares the vehicles that entered and left each detector according to DetectorCounts (interval
+vehicle number and vehicle number, no vehicle ids) with those obtained from the vehicle ids on the detector
+(getLastStepVehicleIDs). A vehicle may be counted one step apart by the two methods, so the arrivals of each
+detector period (what extends the green phases) must agree within --tolerance; the script fails otherwise.
+The departures are only shown: they are derived from the change of the vehicles on the detector. The totals without the
+correction of the period restart (vehicles already on the detector counted again as arrivals) are shown
+for comparison.
+
+    python benchmarks/bench_detector_counts.py --seconds 1800
+"""
+
+import argparse
+import os
+import sys
+
+import numpy as np
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from CustomGymEnvSetup.control.actuated import DetectorCounts  # noqa: E402
+import sumolib  # noqa: E402
+import traci  # noqa: E402
+
+
+SUMOCFG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "network_trainning", "single-intersection-actionned.sumocfg")
+PERIOD = 300
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=1800, help="simulated seconds")
+    parser.add_argument("--seed", type=int, default=1, help="SUMO seed")
+    parser.add_argument("--tolerance", type=int, default=1, help="allowed difference of the totals of a period")
+    options = parser.parse_args()
+
+    traci.start([sumolib.checkBinary("sumo"), "-c", SUMOCFG, "--seed", str(options.seed), "--no-step-log"])
+    ids = sorted(traci.lanearea.getIDList())
+    counts = DetectorCounts(ids)
+    counts.subscribe()
+    previous = {det: set() for det in ids}
+    previous_interval = np.zeros(len(ids), dtype=np.int64)
+    periods = []
+    for step in range(1, options.seconds + 1):
+        if step % PERIOD == 1:
+            # entered/left by DetectorCounts, by vehicle ids, and entered without the restart correction
+            periods.append(np.zeros((5, len(ids)), dtype=np.int64))
+        traci.simulationStep()
+        counts.update()
+        current = {det: set(traci.lanearea.getLastStepVehicleIDs(det)) for det in ids}
+        totals = periods[-1]
+        totals[0] += counts.entered
+        totals[1] += counts.left
+        totals[2] += [len(current[det] - previous[det]) for det in ids]
+        totals[3] += [len(previous[det] - current[det]) for det in ids]
+        interval = counts._interval
+        totals[4] += np.where(interval < previous_interval, interval, interval - previous_interval)
+        previous, previous_interval = current, interval
+    traci.close()
+
+    failed = False
+    for index, totals in enumerate(periods):
+        ok = np.abs(totals[0] - totals[2]).max() <= options.tolerance
+        failed |= not ok
+        print(f"period {index * PERIOD:5d}-{min((index + 1) * PERIOD, options.seconds):5d} s {'ok' if ok else 'FAIL'}")
+        print(f"  entered (DetectorCounts) {totals[0]}")
+        print(f"  entered (vehicle ids)    {totals[2]}")
+        print(f"  entered (uncorrected)    {totals[4]}")
+        print(f"  left (DetectorCounts)    {totals[1]}")
+        print(f"  left (vehicle ids)       {totals[3]}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
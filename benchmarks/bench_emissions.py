@@ -0,0 +1,97 @@
+"""Validation and benchmark of the emission accounting (EmissionAccumulator, SumoEnvironment.emissions).
+
+Simulates the 17h-18h scenario with SUMO's emission-output written to a temporary file and, at every step,
+integrates the CO2 and fuel of the vehicles on the incoming lanes three ways:
+
+- EmissionAccumulator (lane and vehicle subscriptions, NumPy scatter-add);
+- per-vehicle polling: getLastStepVehicleIDs per lane, getCO2Emission and getFuelConsumption per vehicle;
+- the former sampling of get_vehicle_metrics_on_lanes: the rates of a vehicle taken once, when first seen.
+
+The per-lane totals of the accumulator must match those of the emission-output; the script reports the
+totals of each method and the time they take per simulated second.
+
+    python benchmarks/bench_emissions.py --seconds 3600
+"""
+
+import argparse
+import collections
+import os
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+
+import numpy as np
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from CustomGymEnvSetup.environment.emissions import EmissionAccumulator  # noqa: E402
+import sumolib  # noqa: E402  (SUMO tools are on the path once the environment package is imported)
+import traci  # noqa: E402
+
+
+SUMOCFG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "network_trainning", "single-intersection-real-scenario.sumocfg")
+LANES = ["n_t_0", "n_t_1", "e_t_0", "e_t_1", "s_t_0", "s_t_1", "w_t_0", "w_t_1"]
+
+
+def emission_output_totals(path, lanes):
+    """Per-lane (CO2, fuel) totals of an emission-output file (rates in mg/s, one-second steps)."""
+    totals = collections.defaultdict(lambda: np.zeros(2))
+    for _, element in ET.iterparse(path):
+        if element.tag == "vehicle" and element.get("lane") in lanes:
+            totals[element.get("lane")] += (float(element.get("CO2")), float(element.get("fuel")))
+        element.clear()
+    return {lane: totals[lane] for lane in lanes}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=3600, help="simulated seconds")
+    parser.add_argument("--seed", type=int, default=42, help="SUMO seed")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        output = os.path.join(tmp, "emissions.xml")
+        traci.start(
+            [sumolib.checkBinary("sumo"), "-c", SUMOCFG, "--seed", str(options.seed), "--no-step-log",
+             "--emission-output", output, "--emission-output.precision", "8"]
+        )
+        accumulator = EmissionAccumulator()
+        accumulator.start(traci, LANES)
+        polled = np.zeros(2)
+        sampled = np.zeros(2)
+        seen = set()
+        accumulator_time = polling_time = 0.0
+        for _ in range(options.seconds):
+            traci.simulationStep()
+            t0 = time.perf_counter()
+            accumulator.accumulate()
+            t1 = time.perf_counter()
+            for lane in LANES:
+                for vehicle in traci.lane.getLastStepVehicleIDs(lane):
+                    rates = (traci.vehicle.getCO2Emission(vehicle), traci.vehicle.getFuelConsumption(vehicle))
+                    polled += rates
+                    if vehicle not in seen:
+                        seen.add(vehicle)
+                        sampled += rates
+            polling_time += time.perf_counter() - t1
+            accumulator_time += t1 - t0
+        traci.close()
+        reference = emission_output_totals(output, LANES)
+
+    for lane, (co2, fuel) in accumulator.by_lane().items():
+        assert np.allclose((co2, fuel), reference[lane], rtol=1e-9), (lane, (co2, fuel), reference[lane])
+    expected = sum(reference.values())
+    print(f"{options.seconds} s simulated, {len(seen)} vehicles on the incoming lanes")
+    print(f"{'':24s} {'CO2 (g)':>12s} {'fuel (g)':>12s} {'ms per s':>9s}")
+    print(f"{'emission-output':24s} {expected[0] / 1e3:12.1f} {expected[1] / 1e3:12.1f}")
+    co2, fuel = accumulator.total()
+    print(f"{'EmissionAccumulator':24s} {co2 / 1e3:12.1f} {fuel / 1e3:12.1f} {accumulator_time / options.seconds * 1e3:9.3f}")
+    print(f"{'per-vehicle polling':24s} {polled[0] / 1e3:12.1f} {polled[1] / 1e3:12.1f} {polling_time / options.seconds * 1e3:9.3f}")
+    print(f"{'sampled when first seen':24s} {sampled[0] / 1e3:12.1f} {sampled[1] / 1e3:12.1f}")
+    for name, (co2, fuel) in accumulator.by_class().items():
+        print(f"  {name}: CO2 {co2 / 1e3:.1f} g, fuel {fuel / 1e3:.1f} g")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+"""Import-time budget of the package (python -X importtime).
+
+Imports each entry point in a fresh interpreter (fastest of --repeat runs, interpreter startup subtracted)
+and checks it against its budget and against the modules it must not load:
+
+- ``import CustomGymEnvSetup``: nothing heavy, SumoEnvironment is loaded on first access;
+- ``from CustomGymEnvSetup import SumoEnvironment``: gymnasium, NumPy and traci, but not pandas (only
+  needed to write the metrics .csv);
+- ``import CustomGymEnvSetup.cache``, ``CustomGymEnvSetup.control`` (pacing of the baseline scripts) and
+  ``CustomGymEnvSetup.demand``: tooling, without gymnasium and SUMO's tools;
+- ``import CustomGymEnvSetup.training.seeding``: without pandas and SUMO's tools.
+
+The interpreters run without SUMO_HOME (SUMO_HOME is optional, the installed traci/sumolib are used), so an
+import that requires it fails the check. Exits with status 1 if a budget is exceeded or a forbidden module is loaded, so startup regressions are
+caught. Budgets are in milliseconds and depend on the machine, scale them with --scale.
+
+    python benchmarks/bench_import_time.py --repeat 5 --top 10
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+
+# (statement, budget in ms, modules it must not load)
+ENTRY_POINTS = [
+    ("import CustomGymEnvSetup", 20, ["gymnasium", "numpy", "pandas", "traci", "sumolib"]),
+    ("from CustomGymEnvSetup import SumoEnvironment", 400, ["pandas"]),
+    ("import CustomGymEnvSetup.cache", 250, ["gymnasium", "pandas", "traci", "sumolib"]),
+    ("import CustomGymEnvSetup.control", 50, ["gymnasium", "numpy", "pandas", "traci", "sumolib"]),
+    ("import CustomGymEnvSetup.demand", 250, ["gymnasium", "pandas", "traci", "sumolib"]),
+    ("import CustomGymEnvSetup.training.seeding", 400, ["pandas", "traci", "sumolib"]),
+]
+
+
+def import_profile(statement):
+    """Runs statement with -X importtime in a fresh interpreter, without SUMO_HOME.
+
+    Returns:
+        Tuple[float, List[Tuple[float, str]], List[str]]: Total import time (ms) of the top-level imports,
+            (cumulative ms, module) of every import, modules loaded by the statement.
+    """
+    code = f"import sys; before = set(sys.modules); {statement}; print(' '.join(sorted(set(sys.modules) - before)))"
+    env = {name: value for name, value in os.environ.items() if name != "SUMO_HOME"}
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code], cwd=ROOT, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"fails without SUMO_HOME: {result.stderr.splitlines()[-1]}")
+    total = 0.0
+    imports = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line.split("|")
+        imports.append((int(cumulative) / 1e3, name.strip()))
+        if not name[1:].startswith(" "):  # top-level import (nested ones are indented)
+            total += int(cumulative) / 1e3
+    return total, imports, result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=5, help="runs per entry point (the fastest is kept)")
+    parser.add_argument("--scale", type=float, default=1.0, help="factor applied to the budgets")
+    parser.add_argument("--top", type=int, default=0, help="also print the slowest imports of each entry point")
+    options = parser.parse_args()
+
+    startup_runs = [import_profile("pass") for _ in range(options.repeat)]
+    startup = min(run[0] for run in startup_runs)
+    startup_modules = {name for _, name in startup_runs[0][1]}
+    failed = False
+    for statement, budget, forbidden in ENTRY_POINTS:
+        try:
+            runs = [import_profile(statement) for _ in range(options.repeat)]
+        except RuntimeError as e:
+            failed = True
+            print(f"FAIL {statement:48s} {e}")
+            continue
+        total, imports, loaded = min(runs, key=lambda run: run[0])
+        elapsed = total - startup
+        loaded_roots = {module.split(".")[0] for module in loaded}
+        leaked = [module for module in forbidden if module in loaded_roots]
+        ok = elapsed <= budget * options.scale and not leaked
+        failed |= not ok
+        print(f"{'ok  ' if ok else 'FAIL'} {statement:48s} {elapsed:7.1f} ms (budget {budget * options.scale:.0f} ms)")
+        if leaked:
+            print(f"     loads {', '.join(leaked)}")
+        imports = [(cumulative, name) for cumulative, name in imports if name not in startup_modules]
+        for cumulative, name in sorted(imports, reverse=True)[: options.top]:
+            print(f"     {cumulative:7.1f} ms  {name}")
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
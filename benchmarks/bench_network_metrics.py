@@ -0,0 +1,86 @@
+"""Benchmark of the network-wide info (SumoEnvironment add_system_info, see NetworkMetrics).
+
+Runs the 17h-18h scenario with the same actions without and with the system info and reports the time per
+decision step. At each decision it also times NetworkMetrics.read against the same metrics computed with
+per-vehicle TraCI calls (getIDList + getSpeed + getWaitingTime + getCO2Emission + getFuelConsumption, the
+former _get_system_info) and checks both agree. The per-vehicle cost grows with the traffic, the cost of
+NetworkMetrics with the number of edges only.
+
+    python benchmarks/bench_network_metrics.py --seconds 3600
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from CustomGymEnvSetup import SumoEnvironment  # noqa: E402
+
+
+SUMOCFG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "network_trainning", "single-intersection-real-scenario.sumocfg")
+
+
+def per_vehicle_info(sumo):
+    """Reference implementation: four TraCI calls per vehicle in the network."""
+    vehicles = sumo.vehicle.getIDList()
+    speeds = [sumo.vehicle.getSpeed(vehicle) for vehicle in vehicles]
+    waiting_times = [sumo.vehicle.getWaitingTime(vehicle) for vehicle in vehicles]
+    return {
+        "system_total_stopped": sum(int(speed < 0.1) for speed in speeds),
+        "system_total_waiting_time": sum(waiting_times),
+        "system_mean_waiting_time": 0.0 if len(vehicles) == 0 else np.mean(waiting_times),
+        "system_mean_speed": 0.0 if len(vehicles) == 0 else np.mean(speeds),
+        "system_co2_emission": sum(sumo.vehicle.getCO2Emission(vehicle) for vehicle in vehicles),
+        "system_fuel_consumption": sum(sumo.vehicle.getFuelConsumption(vehicle) for vehicle in vehicles),
+    }
+
+
+def run(seconds, system_info, actions, compare=False):
+    env = SumoEnvironment(SUMOCFG, num_seconds=seconds, sumo_seed=42, add_system_info=system_info)
+    env.reset()
+    metrics_time = reference_time = 0.0
+    decisions = 0
+    start = time.perf_counter()
+    for action in actions:
+        _, _, _, truncated, _ = env.step(action)
+        decisions += 1
+        if compare:
+            t0 = time.perf_counter()
+            info = env.network_metrics.read(env.sim_step)
+            t1 = time.perf_counter()
+            reference = per_vehicle_info(env.sumo)
+            t2 = time.perf_counter()
+            metrics_time += t1 - t0
+            reference_time += t2 - t1
+            for key, value in reference.items():
+                # the summary output writes the mean speed with two decimals
+                assert np.isclose(info[key], value, rtol=1e-6, atol=5e-3 if key == "system_mean_speed" else 1e-6), (key, info[key], value)
+        if truncated:
+            break
+    elapsed = time.perf_counter() - start
+    env.close()
+    return decisions, elapsed, metrics_time, reference_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=3600, help="simulated seconds")
+    options = parser.parse_args()
+
+    actions = np.random.default_rng(0).integers(0, 2, size=options.seconds).tolist()
+    decisions, base, _, _ = run(options.seconds, False, actions)
+    _, with_info, _, _ = run(options.seconds, True, actions)
+    _, _, metrics_time, reference_time = run(options.seconds, True, actions, compare=True)
+    print(f"{decisions} decisions")
+    print(f"episode without system info:    {base:8.2f} s")
+    print(f"episode with system info:       {with_info:8.2f} s ({(with_info - base) / decisions * 1e3:+.2f} ms per decision)")
+    print(f"summary output + subscriptions: {metrics_time / decisions * 1e3:8.3f} ms per decision")
+    print(f"per-vehicle calls:              {reference_time / decisions * 1e3:8.3f} ms per decision")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+"""Benchmark of the lane-cell occupancy observation (SumoEnvironment occupancy_grid).
+
+Runs the 17h-18h scenario with the same actions twice, without and with the grid, and reports the time
+per decision step. At each decision it also times the grid computation itself against the same grid built
+with per-vehicle TraCI calls (getLastStepVehicleIDs + getLanePosition + getSpeed) and checks both agree.
+
+    python benchmarks/bench_occupancy_grid.py --seconds 3600
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from CustomGymEnvSetup import SumoEnvironment  # noqa: E402
+
+
+SUMOCFG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "network_trainning", "single-intersection-real-scenario.sumocfg")
+
+
+def per_vehicle_grid(ts, cell_length, grid_length):
+    """Reference implementation: one TraCI call per lane and two per vehicle."""
+    occupancy = np.zeros((len(ts.lanes), ts.num_cells), dtype=np.float32)
+    speed = np.zeros_like(occupancy)
+    for i, lane in enumerate(ts.lanes):
+        max_speed = ts.sumo.lane.getMaxSpeed(lane)
+        for veh in ts.sumo.lane.getLastStepVehicleIDs(lane):
+            distance = ts.lanes_length[lane] - ts.sumo.vehicle.getLanePosition(veh)
+            if distance < grid_length:
+                cell = int(max(distance, 0.0) // cell_length)
+                occupancy[i, cell] += 1
+                speed[i, cell] += ts.sumo.vehicle.getSpeed(veh) / max_speed
+    np.divide(speed, occupancy, out=speed, where=occupancy > 0)
+    return occupancy, speed
+
+
+def run(seconds, grid, actions, compare=False):
+    env = SumoEnvironment(SUMOCFG, num_seconds=seconds, sumo_seed=42, occupancy_grid=grid)
+    env.reset()
+    grid_time = reference_time = 0.0
+    decisions = 0
+    start = time.perf_counter()
+    for action in actions:
+        _, _, _, truncated, _ = env.step(action)
+        decisions += 1
+        if compare:
+            ts = env.traffic_signal
+            t0 = time.perf_counter()
+            occupancy, speed = ts.get_occupancy_grid()
+            t1 = time.perf_counter()
+            ref_occupancy, ref_speed = per_vehicle_grid(ts, *grid)
+            t2 = time.perf_counter()
+            grid_time += t1 - t0
+            reference_time += t2 - t1
+            assert np.array_equal(occupancy, ref_occupancy) and np.allclose(speed, ref_speed, atol=1e-5)
+        if truncated:
+            break
+    elapsed = time.perf_counter() - start
+    env.close()
+    return decisions, elapsed, grid_time, reference_time
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=3600, help="simulated seconds")
+    parser.add_argument("--cell", type=float, default=10.0, help="cell length (m)")
+    parser.add_argument("--length", type=float, default=150.0, help="distance covered before the stop line (m)")
+    options = parser.parse_args()
+
+    actions = np.random.default_rng(0).integers(0, 2, size=options.seconds).tolist()
+    grid = (options.cell, options.length)
+    decisions, base, _, _ = run(options.seconds, None, actions)
+    _, with_grid, _, _ = run(options.seconds, grid, actions)
+    _, _, grid_time, reference_time = run(options.seconds, grid, actions, compare=True)
+    print(f"{decisions} decisions")
+    print(f"episode without grid:           {base:8.2f} s")
+    print(f"episode with grid:              {with_grid:8.2f} s ({(with_grid - base) / decisions * 1e3:+.2f} ms per decision)")
+    print(f"grid from context subscription: {grid_time / decisions * 1e3:8.3f} ms per decision")
+    print(f"grid from per-vehicle calls:    {reference_time / decisions * 1e3:8.3f} ms per decision")
+
+
+if __name__ == "__main__":
+    main()
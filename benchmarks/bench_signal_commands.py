@@ -0,0 +1,81 @@
+"""Benchmark of the buffered traffic light writes (SumoEnvironment.signal_commands).
+
+Runs episodes of the 17h-18h scenario with random actions and with a policy that mostly keeps its phase,
+and reports per episode the light states requested by the traffic signal, the setRedYellowGreenState calls
+actually sent to SUMO and the writes saved. Each episode is also run with a buffer sending every request
+(the behaviour without deduplication) to compare the time per decision (fastest of --repeat runs); both runs must give the same
+observations.
+
+    python benchmarks/bench_signal_commands.py --seconds 3600
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from CustomGymEnvSetup import SumoEnvironment  # noqa: E402
+from CustomGymEnvSetup.environment.signal_commands import SignalCommandBuffer  # noqa: E402
+
+
+SUMOCFG = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "network_trainning", "single-intersection-real-scenario.sumocfg")
+
+
+class UnbufferedCommands(SignalCommandBuffer):
+    """Sends every requested state, as the traffic signal did before the buffer."""
+
+    def set(self, ts_id, state):
+        super().set(ts_id, state)
+        self.current.pop(ts_id, None)
+
+
+def run(seconds, actions, buffer_class):
+    env = SumoEnvironment(SUMOCFG, num_seconds=seconds, sumo_seed=42)
+    env.signal_commands = buffer_class()
+    env.reset()
+    observations = []
+    start = time.perf_counter()
+    for action in actions:
+        obs, _, _, truncated, _ = env.step(action)
+        observations.append(np.concatenate([np.ravel(v) for v in obs.values()]))
+        if truncated:
+            break
+    elapsed = time.perf_counter() - start
+    commands = env.signal_commands
+    env.close()
+    return len(observations), elapsed, commands, np.array(observations)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=3600, help="simulated seconds per episode")
+    parser.add_argument("--keep", type=float, default=0.8, help="probability of keeping the phase in the second policy")
+    parser.add_argument("--repeat", type=int, default=3, help="runs of each episode (the fastest is reported)")
+    options = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    policies = {
+        "random actions": rng.integers(0, 2, size=options.seconds).tolist(),
+        f"keep phase p={options.keep}": (np.cumsum(rng.random(options.seconds) > options.keep) % 2).tolist(),
+    }
+    for name, actions in policies.items():
+        buffered = unbuffered = np.inf
+        for _ in range(options.repeat):
+            decisions, elapsed, commands, obs = run(options.seconds, actions, SignalCommandBuffer)
+            buffered = min(buffered, elapsed)
+            _, elapsed, plain, ref_obs = run(options.seconds, actions, UnbufferedCommands)
+            unbuffered = min(unbuffered, elapsed)
+            assert np.array_equal(obs, ref_obs), "buffered writes changed the simulation"
+        print(f"{name}: {decisions} decisions")
+        print(f"  states requested:  {commands.requests:6d}")
+        print(f"  writes sent:       {commands.writes:6d} (unbuffered: {plain.writes})")
+        print(f"  writes saved:      {commands.writes_saved:6d} ({commands.writes_saved / max(commands.requests, 1):.0%})")
+        print(f"  time per decision: {buffered / decisions * 1e3:6.3f} ms (unbuffered: {unbuffered / decisions * 1e3:.3f} ms)")
+
+
+if __name__ == "__main__":
+    main()
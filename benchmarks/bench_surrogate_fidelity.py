@@ -0,0 +1,104 @@
+"""Fidelity and speed of the surrogate queue model (CustomGymEnvSetup.surrogate) against SUMO.
+
+Runs the 17h-18h scenario in SUMO and in the surrogate (rates fitted to the same trip file) with the same
+open-loop action sequence, records the total queue (halting vehicles), the accumulated waiting time and the
+vehicles on the approaches at each decision, and compares the SUMO trace with the mean trace of --replicas
+surrogate intersections. Then times the surrogate with --batch intersections advanced together.
+
+    python benchmarks/bench_surrogate_fidelity.py --seconds 3600 --replicas 256 --batch 4096
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from CustomGymEnvSetup import SumoEnvironment  # noqa: E402
+from CustomGymEnvSetup.demand import read_trips  # noqa: E402
+from CustomGymEnvSetup.surrogate import SurrogateIntersections  # noqa: E402
+
+
+NETWORK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "network_trainning")
+SUMOCFG = os.path.join(NETWORK, "single-intersection-real-scenario.sumocfg")
+TRIPS = os.path.join(NETWORK, "osm-17h-18h-real-scenario.passenger.trips.xml")
+TRACES = ("queue", "waiting_time", "vehicles")
+
+
+def run_sumo(seconds, actions, seed):
+    env = SumoEnvironment(SUMOCFG, num_seconds=seconds, sumo_seed=seed)
+    env.reset()
+    ts = env.traffic_signal
+    traces = {key: [] for key in TRACES}
+    start = time.perf_counter()
+    for action in actions:
+        _, _, _, truncated, _ = env.step(action)
+        traces["queue"].append(sum(ts.sumo.lane.getLastStepHaltingNumber(lane) for lane in ts.lanes))
+        traces["waiting_time"].append(sum(ts.get_accumulated_waiting_time_per_lane(ts.lanes)))
+        traces["vehicles"].append(sum(ts.get_vehicles_count_per_lane()))
+        if truncated:
+            break
+    elapsed = time.perf_counter() - start
+    env.close()
+    return {key: np.array(value, dtype=np.float64) for key, value in traces.items()}, elapsed
+
+
+def run_surrogate(demand, num_envs, seconds, actions, seed, saturation_flow):
+    model = SurrogateIntersections(demand, num_envs, num_seconds=seconds, saturation_flow=saturation_flow, seed=seed)
+    traces = {key: [] for key in TRACES}
+    decisions = 0
+    start = time.perf_counter()
+    for action in actions:
+        model.set_next_phase(np.full(num_envs, action))
+        model.advance()
+        model.compute_observation()
+        model.compute_reward()
+        decisions += 1
+        traces["queue"].append(model.queue.sum(axis=1))
+        traces["waiting_time"].append(model.waiting_time.sum(axis=1))
+        traces["vehicles"].append(model.vehicles.sum(axis=1))
+        if model.time[0] >= seconds:
+            break
+    elapsed = time.perf_counter() - start
+    return {key: np.array(value, dtype=np.float64) for key, value in traces.items()}, decisions, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=int, default=3600, help="simulated seconds")
+    parser.add_argument("--replicas", type=int, default=256, help="surrogate intersections averaged for the comparison")
+    parser.add_argument("--batch", type=int, default=4096, help="surrogate intersections for the timing")
+    parser.add_argument("--saturation-flow", type=float, default=0.5, help="discharge rate of a green lane (veh/s)")
+    parser.add_argument("--seed", type=int, default=42)
+    options = parser.parse_args()
+
+    demand = read_trips(TRIPS)
+    actions = np.random.default_rng(0).integers(0, 2, size=options.seconds).tolist()
+    sumo, sumo_time = run_sumo(options.seconds, actions, options.seed)
+    surrogate, decisions, _ = run_surrogate(demand, options.replicas, options.seconds, actions, options.seed, options.saturation_flow)
+    n = min(len(sumo["queue"]), decisions)
+
+    print(f"{n} decisions, SUMO vs mean of {options.replicas} surrogate intersections")
+    print(f"{'trace':>14} {'SUMO mean':>10} {'surr. mean':>10} {'RMSE':>10} {'corr':>6} {'in 90% band':>12}")
+    for key in TRACES:
+        reference = sumo[key][:n]
+        replicas = surrogate[key][:n]
+        mean = replicas.mean(axis=1)
+        low, high = np.percentile(replicas, [5, 95], axis=1)
+        rmse = np.sqrt(np.mean((mean - reference) ** 2))
+        corr = np.corrcoef(mean, reference)[0, 1] if reference.std() > 0 and mean.std() > 0 else float("nan")
+        inside = np.mean((reference >= low) & (reference <= high))
+        print(f"{key:>14} {reference.mean():10.2f} {mean.mean():10.2f} {rmse:10.2f} {corr:6.2f} {inside:12.0%}")
+
+    _, batch_decisions, batch_time = run_surrogate(demand, options.batch, options.seconds, actions, options.seed, options.saturation_flow)
+    _, single_decisions, single_time = run_surrogate(demand, 1, options.seconds, actions, options.seed, options.saturation_flow)
+    print(f"SUMO:                         {n / sumo_time:12.0f} decisions/s")
+    print(f"surrogate, 1 intersection:    {single_decisions / single_time:12.0f} decisions/s")
+    print(f"surrogate, {options.batch} intersections: {options.batch * batch_decisions / batch_time:12.0f} decisions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""Benchmark of CustomGymEnvSetup/util/xml2csv.py on a large emission output.
+
+Writes a synthetic emission-output file (same elements and attributes as SUMO's --emission-output)
+of the requested size, then times the SAX converter, the iterparse converter and the iterparse
+converter with Parquet output.
+
+    python benchmarks/bench_xml2csv.py --size-mb 300
+"""
+
+import argparse
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+
+XML2CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "CustomGymEnvSetup", "util", "xml2csv.py")
+
+VEHICLE = (
+    '        <vehicle id="pas_west_{v}" eclass="HBEFA4/PC_petrol_Euro-4" CO2="{co2:.2f}" CO="1.23" HC="0.01" '
+    'NOx="0.45" PMx="0.02" fuel="{fuel:.2f}" electricity="0.00" noise="61.20" route="!pas_west_{v}" '
+    'type="pas_passenger" waiting="{wait:.2f}" lane="w_t_0" pos="{pos:.2f}" speed="{speed:.2f}" angle="90.00" '
+    'x="{pos:.2f}" y="153.30"/>\n'
+)
+
+
+def write_emission_output(path, size_mb, vehicles_per_step=40):
+    target = size_mb * 1024 * 1024
+    with open(path, "w") as outf:
+        outf.write('<?xml version="1.0" encoding="UTF-8"?>\n<emission-export>\n')
+        step = 0
+        while outf.tell() < target:
+            outf.write(f'    <timestep time="{step:.2f}">\n')
+            outf.writelines(
+                VEHICLE.format(v=v, co2=2000 + v, fuel=600 + v, wait=v % 7, pos=v * 3.5 % 150, speed=v % 14)
+                for v in range(vehicles_per_step)
+            )
+            outf.write("    </timestep>\n")
+            step += 1
+        outf.write("</emission-export>\n")
+
+
+def timed(args):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, XML2CSV] + args, check=True)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--size-mb", type=int, default=300, help="size of the synthetic emission output")
+    parser.add_argument("--input", help="use an existing emission output instead of a synthetic one")
+    options = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = options.input
+        if source is None:
+            source = os.path.join(tmp, "emission.xml")
+            write_emission_output(source, options.size_mb)
+        size = os.path.getsize(source) / 1024 / 1024
+        print(f"input: {source} ({size:.0f} MB)")
+
+        results = [
+            ("sax", timed(["--sax", source, "-o", os.path.join(tmp, "sax.csv")])),
+            ("iterparse", timed([source, "-o", os.path.join(tmp, "fast.csv")])),
+            ("iterparse+parquet", timed(["--parquet", source, "-o", os.path.join(tmp, "fast_pq.csv")])),
+        ]
+        for name, seconds in results:
+            print(f"{name:>18}: {seconds:7.2f} s  {size / seconds:6.1f} MB/s  (x{results[0][1] / seconds:.2f})")
+
+
+if __name__ == "__main__":
+    main()
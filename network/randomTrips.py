@@ -25,9 +25,16 @@ import sys
 import random
 import bisect
 import subprocess
+import copy
+import zlib
 from collections import defaultdict
 import math
 
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 if 'SUMO_HOME' in os.environ:
     sys.path.append(os.path.join(os.environ['SUMO_HOME'], 'tools'))
 import sumolib  # noqa
@@ -165,6 +172,16 @@ def get_options(args=None):
                     help="Whether to produce trip output that is already checked for connectivity")
     op.add_argument("-v", "--verbose", action="store_true", default=False,
                     help="tell me what you are doing")
+    op.add_argument("--batched", action="store_true", default=False,
+                    help="draw departures, origins and destinations in vectorized batches (requires numpy). " +
+                    "The output is deterministic per seed but differs from the default (per trip) mode")
+    op.add_argument("--batch-size", dest="batch_size", default=4096, type=int,
+                    help="number of trips drawn per batch when using --batched (default 4096)")
+    op.add_argument("--vehicle-classes", dest="vehicle_classes",
+                    help="comma separated list of CLASS[:PERIOD] generating one trip (and route) file per vehicle " +
+                    "class, e.g. 'passenger:1.5,bus:10,truck:8'. Each class gets its own seed derived from --seed")
+    op.add_argument("-j", "--jobs", default=1, type=int,
+                    help="number of processes used to generate the files of --vehicle-classes in parallel")
     # flow
     op.add_argument("-b", "--begin", category="flow", default=0, type=op.time,
                     help="begin time")
@@ -229,6 +246,23 @@ def get_options(args=None):
                     print("Warning: Option --binomial %s is too low for insertion period %s." % (options.binomial, p)
                           + " Insertions will not be randomized.", file=sys.stderr)
 
+    if options.batched:
+        if np is None:
+            raise ValueError("Option --batched requires numpy.")
+        if options.batch_size < 1:
+            raise ValueError("Option --batch-size must be positive.")
+
+    if options.vehicle_classes:
+        classes = []
+        for spec in options.vehicle_classes.split(','):
+            vclass, _, period = spec.partition(':')
+            if not is_vehicle_class(vclass):
+                raise ValueError("The string '%s' doesn't correspond to a legit vehicle class." % vclass)
+            classes.append((vclass, float(period) if period else None))
+        options.vehicle_classes = classes
+        if options.vehicle_class or options.pedestrians:
+            raise ValueError("Option --vehicle-classes cannot be used together with --vehicle-class or persons.")
+
     if options.jtrrouter and options.flows <= 0:
         raise ValueError("Option --jtrrouter must be used with option --flows.")
 
@@ -370,6 +404,19 @@ class RandomEdgeGenerator:
             f.write('</edgedata>\n')
 
 
+class BatchedEdgeGenerator(RandomEdgeGenerator):
+    """RandomEdgeGenerator drawing many edges per call from a cumulative weight array built once."""
+
+    def __init__(self, net, weight_fun):
+        RandomEdgeGenerator.__init__(self, net, weight_fun)
+        self.cumulative_array = np.array(self.cumulative_weights, dtype=np.float64)
+
+    def get_indices(self, rng, size):
+        # same semantics as bisect.bisect in RandomEdgeGenerator.get
+        r = rng.random(size) * self.total_weight
+        return np.searchsorted(self.cumulative_array, r, side="right")
+
+
 class RandomTripGenerator:
 
     def __init__(self, source_generator, sink_generator, via_generator, intermediate, pedestrians):
@@ -406,6 +453,85 @@ class RandomTripGenerator:
         raise Exception("Warning: no trip found after %s tries" % maxtries)
 
 
+class BatchedTripGenerator(RandomTripGenerator):
+    """RandomTripGenerator checking the distance constraints of a whole batch of candidate trips at once."""
+
+    def __init__(self, source_generator, sink_generator, via_generator, intermediate, pedestrians):
+        RandomTripGenerator.__init__(self, source_generator, sink_generator, via_generator, intermediate, pedestrians)
+        edges = source_generator.net._edges
+        self.edges = edges
+        nodes = {}
+        self.from_node = np.array([nodes.setdefault(e.getFromNode().getID(), len(nodes)) for e in edges])
+        self.to_node = np.array([nodes.setdefault(e.getToNode().getID(), len(nodes)) for e in edges])
+        self.from_coord = np.array([e.getFromNode().getCoord()[:2] for e in edges], dtype=np.float64)
+        self.to_coord = np.array([e.getToNode().getCoord()[:2] for e in edges], dtype=np.float64)
+        self.fringe = np.array([e.is_fringe() for e in edges], dtype=bool)
+
+    def _draw(self, rng, size):
+        sources = self.source_generator.get_indices(rng, size)
+        if self.intermediate:
+            vias = np.stack([self.via_generator.get_indices(rng, size) for _ in range(self.intermediate)], axis=1)
+        else:
+            vias = np.empty((size, 0), dtype=np.int64)
+        sinks = self.sink_generator.get_indices(rng, size)
+        return sources, vias, sinks
+
+    def _distance(self, sources, vias, sinks):
+        dest = self.from_coord[sinks] if self.pedestrians else self.to_coord[sinks]
+        points = [self.from_coord[sources]] + [self.from_coord[vias[:, k]] for k in range(vias.shape[1])] + [dest]
+        return sum(np.hypot(*(q - p).T) for p, q in zip(points[:-1], points[1:]))
+
+    def get_trips(self, rng, size, min_distance, max_distance, maxtries=100, junctionTaz=False, min_dist_fringe=None):
+        """Returns a list of size (source_edge, sink_edge, intermediate) tuples, None where no trip was found."""
+        sources = np.zeros(size, dtype=np.int64)
+        sinks = np.zeros(size, dtype=np.int64)
+        vias = np.zeros((size, self.intermediate), dtype=np.int64)
+        missing = np.arange(size)
+        for min_dist in [min_distance, min_dist_fringe]:
+            if min_dist is None:
+                break
+            for _ in range(maxtries):
+                if len(missing) == 0:
+                    break
+                cand_sources, cand_vias, cand_sinks = self._draw(rng, len(missing))
+                distance = self._distance(cand_sources, cand_vias, cand_sinks)
+                ok = distance >= min_dist
+                if min_dist == min_dist_fringe:
+                    ok &= self.fringe[cand_sources] & self.fringe[cand_sinks] & (not self.intermediate)
+                if junctionTaz:
+                    ok &= self.from_node[cand_sources] != self.to_node[cand_sinks]
+                if max_distance is not None:
+                    ok &= distance < max_distance
+                found = missing[ok]
+                sources[found] = cand_sources[ok]
+                sinks[found] = cand_sinks[ok]
+                vias[found] = cand_vias[ok]
+                missing = missing[~ok]
+        valid = np.ones(size, dtype=bool)
+        valid[missing] = False
+        edges = self.edges
+        return [(edges[s], edges[d], [edges[v] for v in via]) if is_valid else None
+                for s, d, via, is_valid in zip(sources.tolist(), sinks.tolist(), vias.tolist(), valid.tolist())]
+
+
+def batched_departures(rng, departureTime, arrivalTime, period, options):
+    """Vectorized counterpart of the departure time loops in main."""
+    if options.binomial is not None:
+        seconds = np.arange(departureTime, arrivalTime, 1.0)
+        counts = rng.binomial(options.binomial, 1.0 / period / options.binomial, size=len(seconds))
+        return np.repeat(seconds, counts)
+    count = int(math.ceil((arrivalTime - departureTime) / period))
+    if not options.randomDepart:
+        return departureTime + np.arange(count) * period
+    departures = rng.integers(int(departureTime), int(arrivalTime), size=count).astype(np.float64)
+    subsecond = math.fmod(period, 1)
+    if subsecond != 0:
+        # allow all multiples of subsecond to appear
+        extra = np.fmod(subsecond * rng.integers(int(departureTime), int(arrivalTime), size=count), 1)
+        departures = np.minimum(arrivalTime, departures + extra)
+    return np.sort(departures)
+
+
 def get_prob_fun(options, fringe_bonus, fringe_forbidden, max_length):
     # fringe_bonus None generates intermediate way points
     randomProbs = defaultdict(lambda: 1)
@@ -500,6 +626,8 @@ class LoadedProps:
 
 
 def buildTripGenerator(net, options):
+    edgeGenerator = BatchedEdgeGenerator if options.batched else RandomEdgeGenerator
+    tripGenerator = BatchedTripGenerator if options.batched else RandomTripGenerator
     try:
         max_length = 0
         for edge in net.getEdges():
@@ -507,16 +635,16 @@ def buildTripGenerator(net, options):
                 max_length = max(max_length, edge.getLength())
         forbidden_source_fringe = None if options.allow_fringe else "_outgoing"
         forbidden_sink_fringe = None if options.allow_fringe else "_incoming"
-        source_generator = RandomEdgeGenerator(
+        source_generator = edgeGenerator(
             net, get_prob_fun(options, "_incoming", forbidden_source_fringe, max_length))
-        sink_generator = RandomEdgeGenerator(
+        sink_generator = edgeGenerator(
             net, get_prob_fun(options, "_outgoing", forbidden_sink_fringe, max_length))
         if options.weightsprefix:
             if os.path.isfile(options.weightsprefix + SOURCE_SUFFIX):
-                source_generator = RandomEdgeGenerator(
+                source_generator = edgeGenerator(
                     net, LoadedProps(options.weightsprefix + SOURCE_SUFFIX))
             if os.path.isfile(options.weightsprefix + DEST_SUFFIX):
-                sink_generator = RandomEdgeGenerator(
+                sink_generator = edgeGenerator(
                     net, LoadedProps(options.weightsprefix + DEST_SUFFIX))
     except InvalidGenerator:
         print("Error: no valid edges for generating source or destination. Try using option --allow-fringe",
@@ -524,10 +652,10 @@ def buildTripGenerator(net, options):
         return None
 
     try:
-        via_generator = RandomEdgeGenerator(
+        via_generator = edgeGenerator(
             net, get_prob_fun(options, None, None, 1))
         if options.weightsprefix and os.path.isfile(options.weightsprefix + VIA_SUFFIX):
-            via_generator = RandomEdgeGenerator(
+            via_generator = edgeGenerator(
                 net, LoadedProps(options.weightsprefix + VIA_SUFFIX))
     except InvalidGenerator:
         if options.intermediate > 0:
@@ -536,7 +664,7 @@ def buildTripGenerator(net, options):
         else:
             via_generator = None
 
-    return RandomTripGenerator(
+    return tripGenerator(
         source_generator, sink_generator, via_generator, options.intermediate, options.pedestrians)
 
 
@@ -755,6 +883,28 @@ def main(options):
 
         return idx + 1
 
+    def generate_batched(idx):
+        rng = np.random.default_rng(None if options.random else options.seed)
+        for i in range(len(times)-1):
+            departureTime = parseTime(times[i])
+            arrivalTime = parseTime(times[i+1])
+            period = options.period[i]
+            if period == 0.0:
+                continue
+            departures = batched_departures(rng, departureTime, arrivalTime, period, options).tolist()
+            for start in range(0, len(departures), options.batch_size):
+                batch = departures[start:start + options.batch_size]
+                trips = trip_generator.get_trips(
+                    rng, len(batch), options.min_distance, options.max_distance, options.maxtries,
+                    options.junctionTaz, options.min_dist_fringe)
+                for time, trip in zip(batch, trips):
+                    if trip is None:
+                        print("Warning: no trip found after %s tries" % options.maxtries, file=sys.stderr)
+                        continue
+                    origin, destination, intermediate = trip
+                    idx = generate_one(idx, time, arrivalTime, period, origin, destination, intermediate)
+        return idx
+
     with open(options.tripfile, 'w') as fouttrips:
         sumolib.writeXMLHeader(fouttrips, "$Id$", "routes", options=options)
         if options.vehicle_class:
@@ -777,7 +927,9 @@ def main(options):
             personattrs += ' type="%s"' % options.vtypeID
 
         if trip_generator:
-            if options.flows == 0:
+            if options.flows == 0 and options.batched:
+                idx = generate_batched(idx)
+            elif options.flows == 0:
                 for i in range(len(times)-1):
                     time = departureTime = parseTime(times[i])
                     arrivalTime = parseTime(times[i+1])
@@ -924,9 +1076,65 @@ def main(options):
     return trip_generator is not None
 
 
+def class_file(fname, vclass, suffixes=(".trips.xml", ".rou.xml")):
+    """Inserts the vehicle class into a file name: osm.trips.xml -> osm.passenger.trips.xml"""
+    for suffix in suffixes:
+        if fname.endswith(suffix):
+            return "%s.%s%s" % (fname[:-len(suffix)], vclass, suffix)
+    root, ext = os.path.splitext(fname)
+    return "%s.%s%s" % (root, vclass, ext)
+
+
+def class_options(options, vclass, period):
+    """Returns a copy of options generating the trips of a single vehicle class"""
+    classOptions = copy.copy(options)
+    classOptions.vehicle_classes = None
+    classOptions.vehicle_class = vclass
+    classOptions.vclass = vclass
+    classOptions.tripprefix = options.tripprefix + vclass
+    classOptions.vtypeID = "%s_%s" % (classOptions.tripprefix, vclass)
+    # stable per class (unlike hash()) and independent of the order of --vehicle-classes
+    classOptions.seed = (options.seed + zlib.crc32(vclass.encode())) % 2**31
+    classOptions.tripfile = class_file(options.tripfile, vclass)
+    if options.routefile:
+        classOptions.routefile = class_file(options.routefile, vclass)
+    if options.vtypeout:
+        classOptions.vtypeout = class_file(options.vtypeout, vclass)
+    if options.weights_outprefix:
+        classOptions.weights_outprefix = "%s.%s" % (options.weights_outprefix, vclass)
+    if period is not None:
+        classOptions.period = [intIfPossible(period)]
+    return classOptions
+
+
+def _main_class(args, vclass, period):
+    # runs in a worker process, the net is loaded again there instead of being pickled
+    return main(class_options(get_options(args), vclass, period))
+
+
+def main_vehicle_classes(options, args=None):
+    """Generates one trip file per entry of --vehicle-classes, in parallel when --jobs > 1.
+
+    Every class (including its duarouter call) runs independently, results only depend on --seed.
+    """
+    if options.jobs <= 1:
+        return all([main(class_options(options, vclass, period)) for vclass, period in options.vehicle_classes])
+    from concurrent.futures import ProcessPoolExecutor
+    if args is None:
+        args = sys.argv[1:]
+    with ProcessPoolExecutor(max_workers=options.jobs) as executor:
+        futures = [executor.submit(_main_class, args, vclass, period) for vclass, period in options.vehicle_classes]
+        return all([future.result() for future in futures])
+
+
 if __name__ == "__main__":
     try:
-        if not main(get_options()):
+        options = get_options()
+        if options.vehicle_classes:
+            success = main_vehicle_classes(options)
+        else:
+            success = main(options)
+        if not success:
             print("Error: Trips couldn't be generated as requested. "
                   "Try the --verbose option to output more details on the failure.", file=sys.stderr)
             sys.exit(1)